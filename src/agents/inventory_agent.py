@@ -1,41 +1,96 @@
-import vertexai
-from vertexai.generative_models import GenerativeModel, SafetySetting
 import sys
+import os
 import argparse
+import asyncio
 import csv
+import hashlib
+import itertools
 import json
 import time
-from typing import List, Dict
+
+# Adiciona o diretório raiz ao path para importar módulos
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from src.core.config import get_settings
+from src.llm.backend import create_llm_backend
+from src.services.sku_analysis_cache import SkuAnalysisCache
 
 # --- CONFIGURAÇÕES DE INFRAESTRUTURA ---
-PROJECT_ID = "amazing-firefly-475113-p3"
-LOCATION = "us-central1"
-GLOBAL_ENDPOINT = "aiplatform.googleapis.com"
+# Projeto, região, backend de LLM e cache vêm do Settings (src/core/config.py);
+# o modelo é próprio do inventário (análise técnica, não o chat de televendas)
 MODEL_ID = "gemini-3-pro-preview"
 
-# Inicialização
-vertexai.init(project=PROJECT_ID, location=LOCATION, api_endpoint=GLOBAL_ENDPOINT)
+GENERATION_CONFIG = {
+    "max_output_tokens": 8192,
+    "temperature": 0.2,
+    "top_p": 0.95,
+    "response_mime_type": "application/json" # Força saída JSON estruturada
+}
+
+# --- LOTE ---
+# Chamadas simultâneas ao LLM e limite de taxa (cota da API Preview)
+BATCH_CONCURRENCY = 8
+BATCH_RATE_PER_SECOND = 4.0
+BATCH_MAX_RETRIES = 3
+PROGRESS_SECONDS = 5.0
 
 class InventoryAgent:
-    def __init__(self):
+    def __init__(self, cache_db: str = None):
         self.system_instruction = """
         Você é um Analista Sênior de Inventário e Logística. 
         Sua missão é analisar SKUs técnicos, identificar especificações críticas e categorizar produtos.
         Seja direto, técnico e use terminologia padrão da indústria.
         Se a informação for ambígua, declare a ambiguidade.
         """
+        settings = get_settings()
         try:
-            self.model = GenerativeModel(
-                model_name=MODEL_ID,
-                system_instruction=self.system_instruction
+            self.model = create_llm_backend(
+                settings.LLM_BACKEND,
+                model_id=MODEL_ID,
+                system_instruction=self.system_instruction,
+                project=settings.PROJECT_ID,
+                location=settings.LOCATION,
+                safety_block_threshold="BLOCK_ONLY_HIGH",
+                script_path=settings.FAKE_LLM_SCRIPT,
+                latency_ms=settings.FAKE_LLM_LATENCY_MS,
+                tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
             )
         except Exception as e:
             print(f"ERRO DE INICIALIZAÇÃO: {e}")
             sys.exit(1)
 
-    def analyze_sku(self, sku_code: str, context_data: str = "") -> str:
-        """Processa um único SKU e retorna texto puro."""
-        prompt = f"""
+        # Versão do prompt = hash do texto: editar o prompt invalida o cache sozinho
+        template = self.system_instruction + self._build_prompt("{sku}", "{contexto}") + json.dumps(GENERATION_CONFIG)
+        self.prompt_version = hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+        cache_db = settings.SKU_ANALYSIS_CACHE_DB if cache_db is None else cache_db
+        max_bytes = int(settings.SKU_ANALYSIS_CACHE_MAX_MB * 1024 * 1024)
+        self.cache = SkuAnalysisCache(cache_db, max_bytes=max_bytes) if cache_db else None
+
+    def _cached(self, sku_code: str, context_data: str):
+        """Análise em cache (erro no cache conta como miss: o lote segue chamando o LLM)."""
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(sku_code, context_data, MODEL_ID, self.prompt_version)
+        except Exception as e:
+            print(f"AVISO: falha ao ler o cache de análises ({sku_code}): {e}")
+            return None
+
+    def _store(self, sku_code: str, context_data: str, analysis_json: str):
+        """Guarda só respostas JSON válidas (erro/texto solto é refeito na próxima vez)."""
+        if self.cache is None:
+            return
+        try:
+            json.loads(analysis_json)
+        except (TypeError, ValueError):
+            return
+        try:
+            self.cache.put(sku_code, context_data, MODEL_ID, self.prompt_version, analysis_json)
+        except Exception as e:
+            # A análise já foi paga: não deixa o erro do cache virar retry no LLM
+            print(f"AVISO: falha ao gravar no cache de análises ({sku_code}): {e}")
+
+    def _build_prompt(self, sku_code: str, context_data: str = "") -> str:
+        return f"""
         TAREFA: Analise o SKU: {sku_code}
         CONTEXTO: {context_data}
         
@@ -47,81 +102,329 @@ class InventoryAgent:
             "ambiguidade_detectada": true/false
         }}
         """
-        
-        generation_config = {
-            "max_output_tokens": 8192,
-            "temperature": 0.2,
-            "top_p": 0.95,
-            "response_mime_type": "application/json" # Força saída JSON estruturada
-        }
-
-        safety_settings = [
-            SafetySetting(category=SafetySetting.HarmCategory.HARM_CATEGORY_HATE_SPEECH, threshold=SafetySetting.HarmBlockThreshold.BLOCK_ONLY_HIGH),
-            SafetySetting(category=SafetySetting.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT, threshold=SafetySetting.HarmBlockThreshold.BLOCK_ONLY_HIGH),
-            SafetySetting(category=SafetySetting.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT, threshold=SafetySetting.HarmBlockThreshold.BLOCK_ONLY_HIGH),
-            SafetySetting(category=SafetySetting.HarmCategory.HARM_CATEGORY_HARASSMENT, threshold=SafetySetting.HarmBlockThreshold.BLOCK_ONLY_HIGH),
-        ]
 
+    def analyze_sku(self, sku_code: str, context_data: str = "") -> str:
+        """Processa um único SKU e retorna texto puro."""
+        cached = self._cached(sku_code, context_data)
+        if cached is not None:
+            return cached
+        # Safety settings (BLOCK_ONLY_HIGH) configurados no backend
         try:
             response = self.model.generate_content(
-                prompt, 
-                generation_config=generation_config,
-                safety_settings=safety_settings
+                self._build_prompt(sku_code, context_data),
+                generation_config=GENERATION_CONFIG
             )
-            return response.text
         except Exception as e:
             return json.dumps({"erro": str(e)})
+        self._store(sku_code, context_data, response.text)
+        return response.text
 
-    def process_batch(self, input_file: str, output_file: str):
-        """Lê CSV, processa SKUs e salva JSONL."""
+    async def analyze_sku_async(self, sku_code: str, context_data: str = "") -> str:
+        """Versão assíncrona de `analyze_sku` (exceções sobem para o chamador decidir o retry)."""
+        cached = self._cached(sku_code, context_data)
+        if cached is not None:
+            return cached
+        return await self._generate_async(sku_code, context_data)
+
+    async def _generate_async(self, sku_code: str, context_data: str) -> str:
+        """Chamada ao modelo (sem consultar o cache); guarda a resposta válida."""
+        response = await self.model.generate_content_async(
+            self._build_prompt(sku_code, context_data), generation_config=GENERATION_CONFIG
+        )
+        self._store(sku_code, context_data, response.text)
+        return response.text
+
+    def process_batch(self, input_file: str, output_file: str, concurrency: int = BATCH_CONCURRENCY,
+                      rate_per_second: float = BATCH_RATE_PER_SECOND, resume: bool = True,
+                      parquet_file: str = None) -> dict:
+        """Lê CSV, processa SKUs e salva JSONL (ver `process_batch_async`)."""
+        return asyncio.run(self.process_batch_async(
+            input_file, output_file, concurrency, rate_per_second, resume, parquet_file
+        ))
+
+    async def process_batch_async(self, input_file: str, output_file: str, concurrency: int = BATCH_CONCURRENCY,
+                                  rate_per_second: float = BATCH_RATE_PER_SECOND, resume: bool = True,
+                                  parquet_file: str = None) -> dict:
+        """
+        Processamento em lote em streaming:
+        - O CSV é lido linha a linha (fila limitada: memória não cresce com o arquivo);
+          SKUs repetidos (mesmo sku + contexto) são analisados uma vez.
+        - `concurrency` chamadas ao LLM em paralelo, limitadas a `rate_per_second` (token bucket).
+        - Cada resultado é gravado no JSONL assim que fica pronto (uma linha por SKU).
+        - O próprio JSONL é o checkpoint: com `resume`, SKUs já analisados com sucesso
+          são pulados; o arquivo `<saída>.checkpoint.json` guarda o progresso.
+        - `parquet_file` (opcional, requer pyarrow): resumo colunar ao final.
+        Retorna as estatísticas da execução.
+        """
         print(f"--- Iniciando Processamento em Lote: {input_file} ---")
-        
-        results = []
+        if not os.path.exists(input_file):
+            print(f"ERRO: Arquivo {input_file} não encontrado.")
+            return {}
+
+        rows = iter_sku_rows(input_file)
         try:
-            with open(input_file, mode='r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                
-                # Validação básica de colunas
-                if 'sku' not in reader.fieldnames:
-                    print("ERRO: O arquivo CSV deve ter uma coluna chamada 'sku'.")
+            first = next(rows, None)
+        except ValueError as e:
+            print(f"ERRO: {e}")
+            return {}
+
+        done = _load_checkpoint(output_file) if resume else set()
+        if not resume and os.path.exists(output_file):
+            os.remove(output_file)
+        if done:
+            print(f">>> Retomando: {len(done)} SKUs já analisados em {output_file}.")
+
+        stats = {"read": 0, "processed": 0, "errors": 0, "duplicates": 0, "skipped": 0}
+        started = time.perf_counter()
+        limiter = AsyncRateLimiter(rate_per_second, burst=concurrency)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        checkpoint = CheckpointWriter(output_file + ".checkpoint.json", input_file, stats, started)
+
+        async def worker(out):
+            while True:
+                item = await queue.get()
+                if item is None:
                     return
+                line, sku, context = item
+                # Qualquer erro vira linha de erro: um worker morto travaria o produtor em queue.put
+                try:
+                    record = await self._analyze_with_retry(sku, context, limiter)
+                except Exception as e:
+                    record = {"sku": sku, "input_context": context, "status": "error", "analysis": {"erro": str(e)}}
+                record["line"] = line
+                try:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                except Exception as e:
+                    print(f"ERRO ao gravar o resultado de {sku} (linha {line}): {e}")
+                    record["status"] = "error"
+                stats["processed"] += 1
+                if record["status"] != "ok":
+                    stats["errors"] += 1
+                if checkpoint.due():
+                    checkpoint.write(report=True)
 
-                rows = list(reader)
-                total = len(rows)
-                
-                print(f">>> {total} itens encontrados na fila.")
-
-                for i, row in enumerate(rows):
-                    sku = row['sku']
-                    context = row.get('contexto', '') # Coluna opcional
-                    
-                    print(f"[{i+1}/{total}] Processando: {sku}...")
-                    
-                    analysis_json = self.analyze_sku(sku, context)
-                    
-                    try:
-                        parsed_data = json.loads(analysis_json)
-                    except:
-                        parsed_data = {"raw_text": analysis_json, "error": "Falha no parse JSON"}
-
-                    result_record = {
-                        "sku": sku,
-                        "input_context": context,
-                        "analysis": parsed_data
-                    }
-                    results.append(result_record)
-                    
-                    # Rate limiting preventivo para não estourar a cota da API Preview
-                    time.sleep(1) 
-
-            # Salvar resultado
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, ensure_ascii=False)
-            
-            print(f"\n>>> SUCESSO! Resultados salvos em: {output_file}")
-
-        except FileNotFoundError:
-            print(f"ERRO: Arquivo {input_file} não encontrado.")
+        with open(output_file, 'a', encoding='utf-8') as out:
+            workers = [asyncio.create_task(worker(out)) for _ in range(max(1, concurrency))]
+            seen = set()  # Hashes de 16 bytes: memória não cresce com o tamanho das linhas
+            for line, sku, context in itertools.chain([first] if first else [], rows):
+                stats["read"] += 1
+                key = _sku_key(sku, context)
+                if key in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(key)
+                if key in done:
+                    stats["skipped"] += 1
+                    continue
+                await queue.put((line, sku, context))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        checkpoint.write(report=True, finished=True)
+        if parquet_file:
+            stats["parquet_rows"] = write_parquet_summary(output_file, parquet_file)
+        if self.cache is not None:
+            cache_stats = self.cache.stats()
+            stats["cache_hits"] = cache_stats["hits"]
+            print(f">>> Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                  f"{cache_stats['entries']} entradas ({cache_stats['bytes'] / 1024 / 1024:.1f} MB)")
+        print(f"\n>>> SUCESSO! Resultados salvos em: {output_file}")
+        return dict(stats, elapsed_s=round(time.perf_counter() - started, 2))
+
+    async def _analyze_with_retry(self, sku: str, context: str, limiter: "AsyncRateLimiter") -> dict:
+        """
+        Analisa com retry e backoff exponencial (cota/instabilidade da API).
+        O cache é consultado antes do rate limiter: hits não consomem cota.
+        """
+        error = None
+        analysis_json = self._cached(sku, context)
+        if analysis_json is None:
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                if attempt:
+                    await asyncio.sleep(min(30.0, 2 ** (attempt - 1)))
+                await limiter.acquire()
+                try:
+                    analysis_json = await self._generate_async(sku, context)
+                    break
+                except Exception as e:
+                    error = str(e)
+            else:
+                return {"sku": sku, "input_context": context, "status": "error", "analysis": {"erro": error}}
+
+        try:
+            parsed_data = json.loads(analysis_json)
+        except (TypeError, ValueError):
+            parsed_data = {"raw_text": analysis_json, "error": "Falha no parse JSON"}
+        return {"sku": sku, "input_context": context, "status": "ok", "analysis": parsed_data}
+
+
+class AsyncRateLimiter:
+    """Token bucket para asyncio (chamadas por segundo, com rajada de até `burst`)."""
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CheckpointWriter:
+    """Progresso do lote em `<saída>.checkpoint.json` e no console (a cada PROGRESS_SECONDS)."""
+
+    def __init__(self, path: str, input_file: str, stats: dict, started: float):
+        self.path = path
+        self.input_file = input_file
+        self.stats = stats
+        self.started = started
+        self._last = started
+
+    def due(self) -> bool:
+        return time.perf_counter() - self._last >= PROGRESS_SECONDS
+
+    def write(self, report: bool = False, finished: bool = False):
+        self._last = time.perf_counter()
+        elapsed = self._last - self.started
+        rate = self.stats["processed"] / elapsed if elapsed > 0 else 0.0
+        state = dict(self.stats, input_file=self.input_file, finished=finished,
+                     elapsed_s=round(elapsed, 1), items_per_second=round(rate, 2), updated_at=time.time())
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+        if report:
+            print(
+                f"[{self.stats['processed']} analisados | {self.stats['skipped']} retomados | "
+                f"{self.stats['duplicates']} duplicados | {self.stats['errors']} erros] {rate:.1f} SKUs/s"
+            )
+
+
+def iter_sku_rows(input_file: str):
+    """
+    Lê o CSV de entrada sob demanda: (linha, sku, contexto) por SKU não vazio.
+    Levanta ValueError se faltar a coluna 'sku'.
+    """
+    with open(input_file, mode='r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        # Validação básica de colunas
+        if 'sku' not in (reader.fieldnames or []):
+            raise ValueError("O arquivo CSV deve ter uma coluna chamada 'sku'.")
+        for line, row in enumerate(reader, start=2):
+            sku = (row.get('sku') or '').strip()
+            if sku:
+                yield line, sku, (row.get('contexto') or '').strip()  # Coluna opcional
+
+
+def write_parquet_summary(jsonl_file: str, parquet_file: str, chunk_rows: int = 5000) -> int:
+    """
+    Resumo colunar (Parquet) do JSONL para analytics, escrito em row groups de
+    `chunk_rows` linhas (memória constante). Um SKU refeito após retomada
+    aparece uma vez (vale o último registro). Requer pyarrow (opcional).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("AVISO: pyarrow não instalado; resumo Parquet não gerado.")
+        return 0
+
+    schema = pa.schema([
+        ("sku", pa.string()), ("input_context", pa.string()), ("status", pa.string()), ("line", pa.int64()),
+        ("categoria", pa.string()), ("especificacoes", pa.int32()), ("riscos", pa.int32()),
+        ("ambiguidade_detectada", pa.bool_()), ("erro", pa.string()),
+    ])
+
+    # 1ª passada: posição do último registro de cada SKU
+    last = {}
+    for index, record in enumerate(_iter_jsonl(jsonl_file)):
+        last[_sku_key(record["sku"], record.get("input_context", ""))] = index
+
+    written = 0
+    tmp = parquet_file + ".tmp"
+    with pq.ParquetWriter(tmp, schema) as writer:
+        chunk = []
+        for index, record in enumerate(_iter_jsonl(jsonl_file)):
+            if last.get(_sku_key(record["sku"], record.get("input_context", ""))) != index:
+                continue
+            chunk.append(_summary_row(record))
+            if len(chunk) >= chunk_rows:
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            written += len(chunk)
+    os.replace(tmp, parquet_file)
+    print(f">>> Resumo Parquet: {written} SKUs em {parquet_file}")
+    return written
+
+
+def _iter_jsonl(path: str):
+    with open(path, encoding='utf-8') as f:
+        for raw in f:
+            if raw.strip():
+                yield json.loads(raw)
+
+
+def _summary_row(record: dict) -> dict:
+    analysis = record.get("analysis") or {}
+    if not isinstance(analysis, dict):
+        analysis = {}
+    ambiguous = analysis.get("ambiguidade_detectada")
+    return {
+        "sku": record["sku"],
+        "input_context": record.get("input_context", ""),
+        "status": record.get("status"),
+        "line": record.get("line"),
+        "categoria": analysis.get("categoria"),
+        "especificacoes": len(analysis.get("especificacoes") or []),
+        "riscos": len(analysis.get("riscos") or []),
+        "ambiguidade_detectada": ambiguous if isinstance(ambiguous, bool) else None,
+        "erro": analysis.get("erro") or analysis.get("error"),
+    }
+
+
+def _sku_key(sku: str, context: str) -> bytes:
+    return hashlib.blake2b(f"{sku.upper()}\x1f{context}".encode("utf-8"), digest_size=16).digest()
+
+
+def _load_checkpoint(output_file: str) -> set:
+    """
+    SKUs já analisados com sucesso no JSONL de saída. Uma última linha cortada
+    (processo interrompido no meio da escrita) é descartada do arquivo.
+    """
+    done = set()
+    if not os.path.exists(output_file):
+        return done
+    valid_bytes = 0
+    with open(output_file, 'rb') as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            valid_bytes += len(raw)
+            if record.get("status") == "ok":
+                done.add(_sku_key(record["sku"], record.get("input_context", "")))
+    if valid_bytes < os.path.getsize(output_file):
+        with open(output_file, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return done
 
 # --- CLI ---
 if __name__ == "__main__":
@@ -133,11 +436,16 @@ if __name__ == "__main__":
     group.add_argument("--file", type=str, help="Arquivo CSV de entrada (colunas: sku, contexto)")
     
     parser.add_argument("--context", type=str, default="", help="Contexto (apenas para modo SKU único)")
-    parser.add_argument("--out", type=str, default="resultado_analise.json", help="Arquivo de saída (apenas para modo arquivo)")
+    parser.add_argument("--out", type=str, default="resultado_analise.jsonl", help="Arquivo de saída JSONL (apenas para modo arquivo)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Chamadas simultâneas ao LLM")
+    parser.add_argument("--rate", type=float, default=BATCH_RATE_PER_SECOND, help="Limite de chamadas por segundo (0 = sem limite)")
+    parser.add_argument("--no-resume", action="store_true", help="Ignora resultados anteriores e recomeça do zero")
+    parser.add_argument("--no-cache", action="store_true", help="Não usa o cache de análises em disco")
+    parser.add_argument("--parquet", type=str, default=None, help="Resumo colunar (Parquet) para analytics; requer pyarrow")
     
     args = parser.parse_args()
     
-    agent = InventoryAgent()
+    agent = InventoryAgent(cache_db="" if args.no_cache else None)
     
     if args.sku:
         # Modo Debug (Single Shot)
@@ -145,4 +453,5 @@ if __name__ == "__main__":
         print(agent.analyze_sku(args.sku, args.context))
     elif args.file:
         # Modo Produção (Batch)
-        agent.process_batch(args.file, args.out)
\ No newline at end of file
+        agent.process_batch(args.file, args.out, concurrency=args.concurrency,
+                            rate_per_second=args.rate, resume=not args.no_resume, parquet_file=args.parquet)
\ No newline at end of file
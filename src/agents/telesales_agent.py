@@ -2,192 +2,421 @@ import sys
 import os
 import json
 import argparse
+import asyncio
 from typing import Dict, List, Optional, AsyncGenerator
 import pandas as pd
-import vertexai
-from vertexai.generative_models import GenerativeModel, SafetySetting, Tool, FunctionDeclaration, Part, Content
 import re
+import threading
+import time
 from cachetools import cached, TTLCache
 
 # Adiciona o diretório raiz ao path para importar módulos
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from src.database.connector import DatabaseConnector
+from src.llm.backend import create_llm_backend
+from src.core.metrics import STREAM_TTFT, cache_lookup
+from src.core.structured_logging import get_logger
+from src.services import sales_trend
+from src.utils.sku import format_sku_column
 
-# Configurações Vertex AI
+# Configurações (Vertex AI / LLM)
 from src.core.config import get_settings
 settings = get_settings()
+logger = get_logger("agent")
 
-GLOBAL_ENDPOINT = "aiplatform.googleapis.com"
+# Tools (Function Calling) em formato neutro: {"name", "description", "parameters"}
+TOOL_DECLARATIONS = [
+    {
+        "name": "get_customer_history_markdown",
+        "description": "Busca histórico de compras recente de um cliente. Use para entender o padrão de compra.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "card_code": {"type": "string", "description": "Código do Cliente (Ex: C00123)"},
+                "limit": {"type": "integer", "description": "Número máximo de pedidos para retornar (Padrão: 10)."}
+            },
+            "required": ["card_code"]
+        },
+    },
+    {
+        "name": "get_customer_details_json_string",
+        "description": "Busca informações de cadastro do cliente (Nome, Endereço, Contato).",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "card_code": {"type": "string", "description": "Código do Cliente (Ex: C00123)"}
+            },
+            "required": ["card_code"]
+        },
+    },
+    {
+        "name": "get_sales_insights_markdown",
+        "description": "Busca insights gerais de vendas e clientes ativos na carteira do vendedor.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "days": {"type": "integer", "description": "Dias para análise (Padrão: 30)"}
+            }
+        },
+    },
+    {
+        "name": "run_sales_analysis_query",
+        "description": "Executa uma consulta SQL personalizada para responder perguntas analíticas complexas sobre vendas (Ex: Rankings, Médias, Agrupamentos).",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "t_sql_query": {"type": "string", "description": "A consulta T-SQL (SELECT apenas) na tabela FAL_IA_Dados_Vendas_Televendas."},
+                "explanation": {"type": "string", "description": "Explicação breve do que a query busca."}
+            },
+            "required": ["t_sql_query"]
+        },
+    },
+    {
+        "name": "get_inactive_customers_markdown",
+        "description": "Busca clientes INATIVOS (risco de churn) na carteira.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "days_without_purchase": {"type": "integer", "description": "Dias sem comprar (Padrão: 30)"}
+            }
+        },
+    },
+    {
+        "name": "get_top_products",
+        "description": "Busca os produtos mais vendidos (Catálogo/Ranking).",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "days": {"type": "integer", "description": "Período de dias (Padrão: 90)"}
+            }
+        },
+    },
+    {
+        "name": "get_company_kpis",
+        "description": "Busca KPIs globais da empresa (Faturamento, Totais) para Diretores.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "days": {"type": "integer", "description": "Período de dias (Padrão: 30)"}
+            }
+        },
+    },
+    {
+        "name": "get_top_sellers",
+        "description": "Busca ranking de melhores vendedores.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "days": {"type": "integer", "description": "Período de dias (Padrão: 30)"}
+            }
+        },
+    },
+    {
+        "name": "get_mix_recommendations_markdown",
+        "description": "Sugere produtos para ampliar o mix de um cliente: SKUs mais comprados junto com os itens que ele já compra e que ele não leva há 60 dias.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "card_code": {"type": "string", "description": "Código do Cliente (Ex: C00123)"},
+                "top_k": {"type": "integer", "description": "Quantidade de sugestões (Padrão: 5)"}
+            },
+            "required": ["card_code"]
+        },
+    }
+]
+
+SYSTEM_INSTRUCTION = """
+    Você é um Assistente Especialista em Televendas (B2B) da empresa Fantástico Alimentos.
+    Sua missão é ajudar vendedores e diretores com dados e insights.
+    
+    FERRAMENTAS DISPONÍVEIS:
+    Você tem acesso a ferramentas reais para buscar dados do banco de dados (SAP B1).
+    
+    *** NOVO: ANÁLISE AUTÔNOMA DE DADOS (SQL) ***
+    Para perguntas complexas onde as ferramentas padrões não bastam (ex: "Qual a média de fardos?", "Quem comprou mais Item X?"), 
+    VOCÊ DEVE CRIAR UMA QUERY SQL usando a ferramenta `run_sales_analysis_query`.
+    
+    ESQUEMA DA TABELA DISPONÍVEL (`FAL_IA_Dados_Vendas_Televendas`):
+    - `Data_Emissao` (Date): Data da venda.
+    - `Numero_Documento` (Int): Número do pedido.
+    - `SKU` (String): Código do produto (formato 0005).
+    - `Nome_Produto` (String): Nome do item.
+    - `Quantidade` (Decimal): Quantidade em Fardos/Unidades.
+    - `Valor_Liquido` (Decimal): Valor total do item (R$).
+    - `Nome_Cliente` (String): Razão Social.
+    - `Codigo_Cliente` (String): CardCode (Ex: C00123).
+    - `Vendedor_Atual` (String): Nome do vendedor (Use para filtrar carteira se necessário).
+    - `Cidade` (String): Cidade do cliente.
+    - `Estado` (String): UF.
+    - `Categoria_Produto` (String): Categoria principal (ARROZ, FEIJAO, etc).
+
+    DIRETRIZES GERAIS:
+    1. Contexto: Você fala com vendedores na rua (mobile). Seja BREVE e PRÁTICO.
+    2. Formatação: Use Markdown (negrito, listas) para facilitar a leitura.
+    3. Proatividade: Se a análise for complexa, explique o que você calculou antes de mostrar os dados.
+    4. Clientes: Quando falar de um cliente, sempre cite o Código (CardCode).
+    5. SQL Seguro: APENAS SELECT. Nunca tente alterar dados.
+    
+    Para sugerir produtos novos para um cliente (mix / pulverização), use `get_mix_recommendations_markdown`.
+    Lembre-se: Use `run_sales_analysis_query` sempre que precisar de um ranking, agrupamento ou métrica que não exista nas tools prontas.
+    """
 
 class TelesalesAgent:
+    # Estados de prontidão dos componentes (ver `readiness`)
+    PENDING, WARMING, READY, FAILED = "pending", "warming", "ready", "failed"
+    # Tempo mínimo entre tentativas de reinicializar um componente que falhou
+    RETRY_COOLDOWN_SECONDS = 60
+
     def __init__(self):
-        print("DEBUG: Iniciando Vertex AI Agent com Tools...", flush=True)
+        """
+        Construção leve: nada de Vertex AI nem banco aqui.
+        Modelo e DatabaseConnector são criados sob demanda (ou em background via
+        `start_warm_up`), para que a API responda imediatamente no cold start.
+        """
+        self._model = None
+        self._db = None
+        self._copurchase_index = None
+        self._cadence_model = None
+        self._sales_rollup = None
+        self._item_master = None
+        self._init_lock = threading.RLock()
+        self._failed_at = {}
+
+        self.readiness = {"model": self.PENDING, "db": self.PENDING, "warm_up": self.PENDING}
+        # Breakdown de tempo de inicialização (segundos por etapa)
+        self.startup_timings = {}
+
+        # Cache para perfis de clientes (Média FD de 6 meses) - 24h de TTL
+        self.profile_cache = TTLCache(maxsize=2000, ttl=3600 * 24)
+        # Diretório de vendedores (OSLP) e snapshot da empresa usado no pitch
+        self._vendor_directory = TTLCache(maxsize=1, ttl=3600)
+        self._company_snapshot = TTLCache(maxsize=1, ttl=600)
+
+    # --- Inicialização Lazy ---
+
+    def _timed_init(self, component: str, factory):
+        """Executa `factory` registrando tempo e estado de prontidão do componente."""
+        self.readiness[component] = self.WARMING
+        started = time.perf_counter()
         try:
-            vertexai.init(project=settings.PROJECT_ID, location=settings.LOCATION, api_endpoint=GLOBAL_ENDPOINT)
-            
-            # --- Definição das Tools (Function Calling) ---
-            
-            get_customer_history_func = FunctionDeclaration(
-                name="get_customer_history_markdown",
-                description="Busca histórico de compras recente de um cliente. Use para entender o padrão de compra.",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "card_code": {"type": "string", "description": "Código do Cliente (Ex: C00123)"},
-                        "limit": {"type": "integer", "description": "Número máximo de pedidos para retornar (Padrão: 10)."}
-                    },
-                    "required": ["card_code"]
-                },
-            )
+            value = factory()
+            self.readiness[component] = self.READY
+            return value
+        except Exception:
+            self.readiness[component] = self.FAILED
+            self._failed_at[component] = time.monotonic()
+            raise
+        finally:
+            self.startup_timings[component] = round(time.perf_counter() - started, 3)
 
-            get_customer_details_func = FunctionDeclaration(
-                name="get_customer_details_json_string",
-                description="Busca informações de cadastro do cliente (Nome, Endereço, Contato).",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "card_code": {"type": "string", "description": "Código do Cliente (Ex: C00123)"}
-                    },
-                    "required": ["card_code"]
-                },
-            )
+    def _can_retry(self, component: str) -> bool:
+        failed_at = self._failed_at.get(component)
+        return failed_at is None or time.monotonic() - failed_at > self.RETRY_COOLDOWN_SECONDS
 
-            get_sales_insights_func = FunctionDeclaration(
-                name="get_sales_insights_markdown",
-                description="Busca insights gerais de vendas e clientes ativos na carteira do vendedor.",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "days": {"type": "integer", "description": "Dias para análise (Padrão: 30)"}
-                    }
-                },
-            )
+    @property
+    def model(self):
+        """GenerativeModel criado na primeira utilização (None se a Vertex AI estiver indisponível)."""
+        if self._model is None and self._can_retry("model"):
+            with self._init_lock:
+                if self._model is None and self._can_retry("model"):
+                    try:
+                        self._model = self._timed_init("model", self._build_model)
+                    except Exception as e:
+                        logger.warning("Falha ao iniciar o LLM backend: %s", e)
+        return self._model
 
-            run_sales_analysis_query_func = FunctionDeclaration(
-                name="run_sales_analysis_query",
-                description="Executa uma consulta SQL personalizada para responder perguntas analíticas complexas sobre vendas (Ex: Rankings, Médias, Agrupamentos).",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "t_sql_query": {"type": "string", "description": "A consulta T-SQL (SELECT apenas) na tabela FAL_IA_Dados_Vendas_Televendas."},
-                        "explanation": {"type": "string", "description": "Explicação breve do que a query busca."}
-                    },
-                    "required": ["t_sql_query"]
-                },
-            )
+    @property
+    def db(self) -> DatabaseConnector:
+        """DatabaseConnector criado na primeira utilização."""
+        if self._db is None:
+            with self._init_lock:
+                if self._db is None:
+                    logger.info("Iniciando DatabaseConnector...")
+                    self._db = self._timed_init("db", DatabaseConnector)
+        return self._db
 
-            get_inactive_customers_func = FunctionDeclaration(
-                name="get_inactive_customers_markdown",
-                description="Busca clientes INATIVOS (risco de churn) na carteira.",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "days_without_purchase": {"type": "integer", "description": "Dias sem comprar (Padrão: 30)"}
-                    }
-                },
-            )
+    @property
+    def db_engine(self):
+        """Engine SQLAlchemy se o banco já foi inicializado (sem disparar a inicialização)."""
+        return self._db.engine if self._db is not None else None
 
-            get_top_products_func = FunctionDeclaration(
-                name="get_top_products",
-                description="Busca os produtos mais vendidos (Catálogo/Ranking).",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "days": {"type": "integer", "description": "Período de dias (Padrão: 90)"}
-                    }
-                },
-            )
-            
-            get_company_kpis_func = FunctionDeclaration(
-                name="get_company_kpis",
-                description="Busca KPIs globais da empresa (Faturamento, Totais) para Diretores.",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "days": {"type": "integer", "description": "Período de dias (Padrão: 30)"}
-                    }
-                },
-            )
-            
-            get_top_sellers_func = FunctionDeclaration(
-                name="get_top_sellers",
-                description="Busca ranking de melhores vendedores.",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "days": {"type": "integer", "description": "Período de dias (Padrão: 30)"}
-                    }
-                },
-            )
+    @property
+    def copurchase_index(self):
+        """Índice de co-compra (SKU × Documento) para oportunidades de mix."""
+        if self._copurchase_index is None:
+            # Import tardio: scipy só é carregado quando o índice é usado
+            from src.services.copurchase_index import get_copurchase_index
+            self._copurchase_index = get_copurchase_index(self.db)
+        return self._copurchase_index
 
-            # Agrupa as tools
-            telesales_tools = Tool(
-                function_declarations=[
-                    get_customer_history_func,
-                    get_customer_details_func,
-                    get_sales_insights_func,
-                    run_sales_analysis_query_func, # NOVA TOOL
-                    get_inactive_customers_func,
-                    get_top_products_func,
-                    get_company_kpis_func,
-                    get_top_sellers_func
-                ]
-            )
+    @property
+    def cadence_model(self):
+        """Cadência de recompra por cliente (ranking do /inactive e alertas)."""
+        if self._cadence_model is None:
+            from src.services.cadence_model import get_cadence_model
+            self._cadence_model = get_cadence_model(self.db)
+        return self._cadence_model
 
-            self.model = GenerativeModel(
-                model_name=settings.MODEL_ID,
-                system_instruction="""
-                Você é um Assistente Especialista em Televendas (B2B) da empresa Fantástico Alimentos.
-                Sua missão é ajudar vendedores e diretores com dados e insights.
-                
-                FERRAMENTAS DISPONÍVEIS:
-                Você tem acesso a ferramentas reais para buscar dados do banco de dados (SAP B1).
-                
-                *** NOVO: ANÁLISE AUTÔNOMA DE DADOS (SQL) ***
-                Para perguntas complexas onde as ferramentas padrões não bastam (ex: "Qual a média de fardos?", "Quem comprou mais Item X?"), 
-                VOCÊ DEVE CRIAR UMA QUERY SQL usando a ferramenta `run_sales_analysis_query`.
-                
-                ESQUEMA DA TABELA DISPONÍVEL (`FAL_IA_Dados_Vendas_Televendas`):
-                - `Data_Emissao` (Date): Data da venda.
-                - `Numero_Documento` (Int): Número do pedido.
-                - `SKU` (String): Código do produto (formato 0005).
-                - `Nome_Produto` (String): Nome do item.
-                - `Quantidade` (Decimal): Quantidade em Fardos/Unidades.
-                - `Valor_Liquido` (Decimal): Valor total do item (R$).
-                - `Nome_Cliente` (String): Razão Social.
-                - `Codigo_Cliente` (String): CardCode (Ex: C00123).
-                - `Vendedor_Atual` (String): Nome do vendedor (Use para filtrar carteira se necessário).
-                - `Cidade` (String): Cidade do cliente.
-                - `Estado` (String): UF.
-                - `Categoria_Produto` (String): Categoria principal (ARROZ, FEIJAO, etc).
-
-                DIRETRIZES GERAIS:
-                1. Contexto: Você fala com vendedores na rua (mobile). Seja BREVE e PRÁTICO.
-                2. Formatação: Use Markdown (negrito, listas) para facilitar a leitura.
-                3. Proatividade: Se a análise for complexa, explique o que você calculou antes de mostrar os dados.
-                4. Clientes: Quando falar de um cliente, sempre cite o Código (CardCode).
-                5. SQL Seguro: APENAS SELECT. Nunca tente alterar dados.
-                
-                Lembre-se: Use `run_sales_analysis_query` sempre que precisar de um ranking, agrupamento ou métrica que não exista nas tools prontas.
-                """,
-                tools=[telesales_tools]
-            )
-            print("DEBUG: Vertex AI Model + Tools OK.", flush=True)
+    @property
+    def item_master(self):
+        """Cadastro de itens (OITM) em memória: NumInSale para conversão em fardos."""
+        if self._item_master is None:
+            from src.services.item_master import get_item_master
+            self._item_master = get_item_master(self.db)
+        return self._item_master
 
+    @property
+    def sales_rollup(self):
+        """Rollup mensal cliente × categoria × SKU (tendência, média de fardos)."""
+        if self._sales_rollup is None:
+            from src.services.sales_rollup import get_sales_rollup
+            self._sales_rollup = get_sales_rollup(self.db)
+        return self._sales_rollup
+
+    def _rollup_since(self, since):
+        """Rollup pronto para servir a janela que começa em `since` (None -> usar SQL direto)."""
+        try:
+            rollup = self.sales_rollup
+            rollup.ensure_fresh()
+            return rollup if rollup.covers(since) else None
         except Exception as e:
-            print(f"AVISO: Falha ao iniciar Vertex AI ({e}).", flush=True)
-            self.model = None
-            
-        print("DEBUG: Iniciando DatabaseConnector...", flush=True)
-        self.db = DatabaseConnector()
-        # Cache para perfis de clientes (Média FD de 6 meses) - 24h de TTL
-        self.profile_cache = TTLCache(maxsize=2000, ttl=3600 * 24)
-        print("DEBUG: Init concluído.", flush=True)
+            logger.warning("Rollup mensal indisponível: %s", e)
+            return None
+
+    async def _get_model_async(self):
+        """Versão para rotas async: se o modelo ainda não existe, inicializa fora do event loop."""
+        if self._model is not None:
+            return self._model
+        return await asyncio.to_thread(lambda: self.model)
+
+    def _build_model(self):
+        """Cria o backend de LLM configurado (Vertex AI ou stand-in local)."""
+        logger.info("Iniciando LLM backend '%s' com Tools...", settings.LLM_BACKEND)
+        try:
+            model = create_llm_backend(
+                settings.LLM_BACKEND,
+                model_id=settings.MODEL_ID,
+                system_instruction=SYSTEM_INSTRUCTION,
+                tools=TOOL_DECLARATIONS,
+                project=settings.PROJECT_ID,
+                location=settings.LOCATION,
+                script_path=settings.FAKE_LLM_SCRIPT,
+                latency_ms=settings.FAKE_LLM_LATENCY_MS,
+                tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+            )
+            logger.info("LLM backend + Tools OK.")
+            return model
+        except Exception as e:
+            raise RuntimeError(f"LLM indisponível: {e}") from e
+
+    # --- Warm-up ---
+
+    @property
+    def is_ready(self) -> bool:
+        return self.readiness["warm_up"] == self.READY
+
+    def start_warm_up(self) -> threading.Thread:
+        """Dispara o warm-up em background (não bloqueia o startup da API)."""
+        thread = threading.Thread(target=self.warm_up, name="telesales-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def warm_up(self):
+        """
+        Aquece os recursos usados pelas primeiras requisições: modelo (em
+        paralelo), pool do banco, diretório OSLP, snapshot da empresa, índice
+        de co-compra, cadência de recompra, cadastro de itens e rollup mensal. Cada etapa fica registrada em `startup_timings`.
+        """
+        self.readiness["warm_up"] = self.WARMING
+        started = time.perf_counter()
+        model_thread = threading.Thread(target=lambda: self.model, name="telesales-model-init", daemon=True)
+        model_thread.start()
+
+        steps = [
+            ("db_pool", self._warm_db_pool),
+            ("vendor_directory", self._get_vendor_directory),
+            ("company_snapshot", self.get_company_snapshot),
+            ("copurchase_index", lambda: self.copurchase_index.ensure_fresh()),
+            ("cadence_model", lambda: self.cadence_model.ensure_fresh()),
+            ("item_master", lambda: self.item_master.ensure_fresh()),
+            ("sales_rollup", lambda: self.sales_rollup.ensure_fresh()),
+        ]
+        failed = False
+        for name, step in steps:
+            step_started = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                failed = True
+                logger.warning("Warm-up '%s' falhou: %s", name, e)
+            finally:
+                self.startup_timings[name] = round(time.perf_counter() - step_started, 3)
+
+        model_thread.join()
+        failed = failed or self._model is None
+        self.startup_timings["warm_up_total"] = round(time.perf_counter() - started, 3)
+        self.readiness["warm_up"] = self.FAILED if failed else self.READY
+        logger.info(
+            "Warm-up concluído (%s)", self.readiness['warm_up'],
+            extra={"fields": {"startup_timings": dict(self.startup_timings)}},
+        )
+
+    def _warm_db_pool(self):
+        """Cria a engine e abre a primeira conexão do pool."""
+        self.db.get_dataframe("SELECT 1 as ok")
+
+    def _get_vendor_directory(self) -> dict:
+        """Diretório de vendedores da OSLP em memória (SlpCode -> SlpName, Email -> SlpCode)."""
+        directory = self._vendor_directory.get("oslp")
+        cache_lookup("vendor_directory", directory is not None)
+        if directory is None:
+            df = self.db.get_dataframe("SELECT SlpCode, SlpName, Email FROM OSLP")
+            directory = {"names": {}, "emails": {}}
+            if not df.empty:
+                for code, name, email in zip(df['SlpCode'], df['SlpName'], df['Email']):
+                    directory["names"][int(code)] = name
+                    if email:
+                        directory["emails"][str(email).strip().lower()] = int(code)
+                # Só cacheia se a OSLP respondeu (erro de banco retorna DataFrame vazio)
+                self._vendor_directory["oslp"] = directory
+        return directory
+
+    def get_slp_code_by_email(self, email: str) -> Optional[int]:
+        """
+        Retorna o SlpCode vinculado ao email (diretório OSLP em memória, com
+        fallback para a tabela OSLP).
+        """
+        email = email.strip().lower()
+        slp_code = self._get_vendor_directory()["emails"].get(email)
+        if slp_code is not None:
+            return slp_code
+
+        # Vendedor novo (ainda fora do diretório) ou OSLP indisponível na carga: busca direto
+        df = self.db.get_dataframe("SELECT SlpCode FROM OSLP WHERE Email = :email", params={"email": email})
+        if df.empty or 'SlpCode' not in df.columns:
+            return None
+        return int(df.iloc[0]['SlpCode'])
+
+    def get_company_snapshot(self) -> dict:
+        """
+        Contexto da empresa que é igual para todos os pitches (Top Produtos e
+        Insights de Volume), cacheado por alguns minutos.
+        """
+        snapshot = self._company_snapshot.get("company")
+        cache_lookup("company_snapshot", snapshot is not None)
+        if snapshot is None:
+            snapshot = {
+                "top_products": self.get_top_products(days=90),
+                "volume_insights": self.get_volume_insights(days=90),
+            }
+            self._company_snapshot["company"] = snapshot
+        return snapshot
 
     def _resolve_vendor_filter(self, vendor_filter: str) -> str:
         """
         Resolve o filtro de vendedor.
-        Se receber um ID numérico (SlpCode), busca o nome (SlpName) na tabela OSLP.
+        Se receber um ID numérico (SlpCode), busca o nome (SlpName) no diretório
+        OSLP em memória (com fallback para a tabela OSLP).
         Se receber texto, assume que já é o nome.
         """
         if not vendor_filter:
@@ -197,37 +426,29 @@ class TelesalesAgent:
         if str(vendor_filter).isdigit():
             try:
                 slp_code = int(vendor_filter)
-                # Tenta buscar pelo SlpCode na tabela oficial de vendedores
+                resolved_name = self._get_vendor_directory()["names"].get(slp_code)
+                if resolved_name is not None:
+                    return resolved_name
+
+                # Vendedor novo (ainda fora do diretório): busca direto na OSLP
                 query = "SELECT SlpName FROM OSLP WHERE SlpCode = :code"
                 df = self.db.get_dataframe(query, params={"code": slp_code})
                 
                 if not df.empty and 'SlpName' in df.columns:
                     resolved_name = df.iloc[0]['SlpName']
-                    print(f"DEBUG: SlpCode {slp_code} resolvido para '{resolved_name}'")
+                    logger.debug("SlpCode %s resolvido para '%s'", slp_code, resolved_name)
                     return resolved_name
                 else:
-                    print(f"AVISO: SlpCode {slp_code} não encontrado na OSLP.")
+                    logger.warning("SlpCode %s não encontrado na OSLP.", slp_code)
                     return str(vendor_filter) # Retorna o ID mesmo, talvez a view aceite ou falhe graciosamente
             except Exception as e:
-                print(f"Erro ao resolver SlpCode: {e}")
+                logger.exception("Erro ao resolver SlpCode")
                 return str(vendor_filter)
         
         return vendor_filter
 
     # --- Métodos de Negócio (Implementação das Tools) ---
 
-    @staticmethod
-    def _format_sku(val):
-        """Padroniza SKU para ter pelo menos 4 dígitos inteiros (ex: 5 -> 0005, 201.1 -> 0201.1)."""
-        if val is None: return ""
-        s = str(val).strip()
-        if '.' in s:
-            parts = s.split('.')
-            return parts[0].zfill(4) + '.' + parts[1]
-        else:
-            return s.zfill(4)
-
-
     def get_customer_history_markdown(self, card_code: str, limit: int = 10, vendor_filter: str = None) -> str:
         """Busca histórico de pedidos (Versão Chat/Markdown)."""
         try:
@@ -262,9 +483,7 @@ class TelesalesAgent:
         ORDER BY Data_Emissao DESC
         """
         df = self.db.get_dataframe(query, params={"card_code": card_code, "limit": limit})
-        if not df.empty and 'SKU' in df.columns:
-            df['SKU'] = df['SKU'].apply(self._format_sku)
-        return df
+        return format_sku_column(df)
 
     def get_customer_details_json_string(self, card_code: str, vendor_filter: str = None) -> str:
         """Busca detalhes do cliente (Versão Chat/JSON String)."""
@@ -293,67 +512,32 @@ class TelesalesAgent:
             return df.iloc[0].to_dict()
         except: return {}
 
-    def get_sales_trend(self, card_code: str, months: int = 6) -> dict:
-        """Busca tendência de vendas para o gráfico (Versão API)."""
+    def get_sales_trend(self, card_code: str, months: int = 6, granularity: str = "month",
+                        periods: Optional[int] = None, categories: Optional[str] = None,
+                        include_other: bool = False) -> dict:
+        """
+        Busca tendência de vendas para o gráfico (Versão API).
+        `granularity`: week | month | quarter; `periods`: quantidade de períodos
+        (padrão: `months` para mês); `categories`: "Nome=PALAVRA,..." (padrão TREND_CATEGORIES).
+        Mês/trimestre saem do rollup mensal; semana consulta as notas.
+        """
+        periods = periods or (months if granularity == "month" else sales_trend.DEFAULT_PERIODS.get(granularity, 6))
+        # Granularidade inválida é erro do chamador (ValueError), não vira gráfico vazio
+        since = sales_trend.window_start(granularity, periods)
         try:
-            # SQL Server Query
-            query = f"""
-            SELECT 
-                FORMAT(Data_Emissao, 'MM/yy') as Mes,
-                CASE 
-                    WHEN Categoria_Produto LIKE '%ARROZ%' THEN 'Arroz'
-                    WHEN Categoria_Produto LIKE '%FEIJAO%' THEN 'Feijão'
-                    WHEN Categoria_Produto LIKE '%MASSA%' THEN 'Massas'
-                    ELSE 'Outros'
-                END as Categoria,
-                SUM(COALESCE(Valor_Liquido, Valor_Total_Linha, 0)) as Total,
-                MIN(Data_Emissao) as SortDate
-            FROM FAL_IA_Dados_Vendas_Televendas 
-            WHERE Codigo_Cliente = :card_code 
-              AND Data_Emissao >= DATEADD(month, -{months}, GETDATE())
-            GROUP BY FORMAT(Data_Emissao, 'MM/yy'),
-                     CASE 
-                        WHEN Categoria_Produto LIKE '%ARROZ%' THEN 'Arroz'
-                        WHEN Categoria_Produto LIKE '%FEIJAO%' THEN 'Feijão'
-                        WHEN Categoria_Produto LIKE '%MASSA%' THEN 'Massas'
-                        ELSE 'Outros'
-                     END
-            ORDER BY SortDate ASC
-            """
-            df = self.db.get_dataframe(query, params={"card_code": card_code})
-            
-            if df.empty:
-                return {"labels": [], "datasets": []}
-
-            # Garantir ordenação correta e labels únicos
-            ordered_months = df.sort_values('SortDate')['Mes'].unique().tolist()
-            
-            categories = ['Arroz', 'Feijão', 'Massas']
-            colors = {
-                'Arroz': '#1A2F5A',
-                'Feijão': '#22C55E',
-                'Massas': '#F97316'
-            }
-            
-            datasets = []
-            for cat in categories:
-                cat_data = []
-                for m in ordered_months:
-                    val = df[(df['Mes'] == m) & (df['Categoria'] == cat)]['Total'].sum()
-                    cat_data.append(float(val))
-                
-                datasets.append({
-                    "name": cat,
-                    "data": cat_data,
-                    "color": colors.get(cat)
-                })
-                
-            return {
-                "labels": ordered_months,
-                "datasets": datasets
-            }
+            rollup = self._rollup_since(since) if granularity != "week" else None
+            if rollup is not None:
+                df = rollup.trend_frame(card_code, since)
+            else:
+                df = self.db.get_dataframe(
+                    sales_trend.TREND_QUERY, params={"card_code": card_code, "since": since.strftime("%Y-%m-%d")}
+                )
+            return sales_trend.build_trend(
+                df, sales_trend.parse_categories(categories or settings.TREND_CATEGORIES),
+                granularity=granularity, periods=periods, include_other=include_other,
+            )
         except Exception as e:
-            print(f"Erro em get_sales_trend: {str(e)}")
+            logger.exception("Erro em get_sales_trend")
             return {"labels": [], "datasets": []}
 
         """Busca vendas recentes carteira (Versão Chat/Markdown)."""
@@ -393,7 +577,7 @@ class TelesalesAgent:
             final_query = t_sql_query
             
             if vendor_filter:
-                print(f"DEBUG: Security enforcement enabled for vendor: {vendor_filter}")
+                logger.debug("Security enforcement enabled for vendor: %s", vendor_filter)
                 # Simple parser injection
                 # Finds the first WHERE or adds it after FROM ... Table
                 # Robust approach: Wrap query? No, T-SQL subqueries need alias and context.
@@ -455,7 +639,8 @@ class TelesalesAgent:
                              final_query += f" WHERE Vendedor_Atual = '{vendor_filter}'"
             
             # 3. Execução
-            print(f"DEBUG: Executing AI SQL (Secured): {final_query}")
+            # SQL completo só em DEBUG; em produção vai o fingerprint (ver instrumentação de SQL)
+            logger.debug("Executing AI SQL (Secured): %s", final_query)
             df = self.db.get_dataframe(final_query)
             
             if df.empty:
@@ -473,12 +658,24 @@ class TelesalesAgent:
     def get_customer_profile_average(self, card_code: str, last_purchase_date) -> float:
         """
         Calcula a média de fardos totais por pedido nos 180 dias ANTERIORES à última compra.
-        Usa cache manual para evitar reprocessamento constante.
+        Fonte única: a tabela de cadência (Media_Fardos, janela exata de 180 dias).
+        Quando ela não serve a data pedida, consulta as notas com a mesma regra,
+        com cache manual para evitar reprocessamento constante.
         """
+        try:
+            average = self.cadence_model.profile_average(card_code, last_purchase_date)
+        except Exception as e:
+            logger.warning("Tabela de cadência indisponível: %s", e)
+            average = None
+        if average is not None:
+            return average
+
         # Chave composta para garantir que se a data mudar, o cache invalida
         cache_key = f"profile_{card_code}_{last_purchase_date}"
-        if cache_key in self.profile_cache:
-            return self.profile_cache[cache_key]
+        cached_value = self.profile_cache.get(cache_key)
+        cache_lookup("profile_cache", cached_value is not None)
+        if cached_value is not None:
+            return cached_value
 
         try:
             # Garante que a data está em formato string ISO para o SQL se necessário
@@ -487,12 +684,12 @@ class TelesalesAgent:
             query = f"""
             SELECT ROUND(AVG(CAST(SumQ.Total_Fardos_Pedido AS FLOAT)), 1) as Media_Hist
             FROM (
-                SELECT Numero_Documento, SUM(Quantidade) as Total_Fardos_Pedido
+                SELECT Tipo_Documento, Numero_Documento, SUM(Quantidade) as Total_Fardos_Pedido
                 FROM FAL_IA_Dados_Vendas_Televendas
                 WHERE Codigo_Cliente = :card_code
                   AND Data_Emissao >= DATEADD(day, -180, :date_ref)
                   AND Data_Emissao <= :date_ref
-                GROUP BY Numero_Documento
+                GROUP BY Tipo_Documento, Numero_Documento
             ) SumQ
             """
             df = self.db.get_dataframe(query, params={"card_code": card_code, "date_ref": date_ref})
@@ -506,7 +703,7 @@ class TelesalesAgent:
             # print(f"DEBUG: Profile Average for {card_code}: {result} (Date Ref: {date_ref})")
             return result
         except Exception as e:
-            print(f"Erro ao calcular média de perfil para {card_code}: {e}")
+            logger.warning("Erro ao calcular média de perfil para %s: %s", card_code, e)
             return 0.0
 
         """Busca vendas agregadas por cliente (Versão Dashboard/DataFrame)."""
@@ -545,30 +742,31 @@ class TelesalesAgent:
 
     def get_bales_breakdown(self, card_code: str, days: int = 180) -> pd.DataFrame:
         """Busca a média de fardos por SKU para um cliente específico."""
+        rollup = self._rollup_since(pd.Timestamp.now() - pd.Timedelta(days=days))
+        if rollup is not None:
+            df = rollup.bales_breakdown(card_code, days)
+            return format_sku_column(df)
+
+        # NumInSale é constante por SKU: média da quantidade no SQL, conversão em fardos no pandas
         query = f"""
         SELECT 
             SKU,
             MAX(Nome_Produto) as Produto,
-            ROUND(AVG(
-                CASE 
-                    WHEN ISNULL(o.NumInSale, 0) > 1 THEN v.Quantidade / o.NumInSale 
-                    ELSE v.Quantidade 
-                END
-            ), 1) as Media_SKU,
+            AVG(CAST(Quantidade AS FLOAT)) as Media_Quantidade,
             COUNT(Numero_Documento) as Vezes_Comprado
-        FROM FAL_IA_Dados_Vendas_Televendas v
-        LEFT JOIN OITM o ON o.ItemCode = v.SKU COLLATE DATABASE_DEFAULT
+        FROM FAL_IA_Dados_Vendas_Televendas
         WHERE Codigo_Cliente = :card_code 
           AND Data_Emissao >= DATEADD(day, -{days}, GETDATE())
-          AND v.Unidade_Medida NOT IN ('KG', 'TN') -- Exclui Farelo/Granel
+          AND Unidade_Medida NOT IN ('KG', 'TN') -- Exclui Farelo/Granel
         GROUP BY SKU
-        ORDER BY Media_SKU DESC
         """
 
         df = self.db.get_dataframe(query, params={"card_code": card_code})
-        if not df.empty and 'SKU' in df.columns:
-            df['SKU'] = df['SKU'].apply(self._format_sku)
-        return df
+        if df.empty:
+            return df
+        df['Media_SKU'] = self.item_master.to_bales(df.pop('Media_Quantidade'), df['SKU']).round(1)
+        df = format_sku_column(df).sort_values('Media_SKU', ascending=False)
+        return df[['SKU', 'Produto', 'Media_SKU', 'Vezes_Comprado']].reset_index(drop=True)
 
     def get_inactive_customers_markdown(self, days_without_purchase: int = 30, vendor_filter: str = None) -> str:
         """Clientes inativos (Versão Chat/Markdown)."""
@@ -637,50 +835,25 @@ class TelesalesAgent:
 
     def get_inactive_customers(self, min_days: int = 30, max_days: int = 365, vendor_filter: str = None) -> pd.DataFrame:
         """Busca clientes inativos (sem compras no período) para o dashboard.
-           Ordenação: Maior Média de Fardos e Valor.
+           Ordenação: maior Risco (dias inativo / ciclo de recompra do próprio
+           cliente), depois Média de Fardos e Valor. Servido da tabela de
+           cadência em memória, sem SQL por requisição.
         """
-        
-        # Filtro de vendedor
         vendor_filter = self._resolve_vendor_filter(vendor_filter)
-        vendor_clause = f" AND Vendedor_Atual = '{vendor_filter}'" if vendor_filter else ""
-        
-        query = f"""
-        WITH Base_Inativos AS (
-            SELECT 
-                Codigo_Cliente,
-                MAX(Nome_Cliente) as Nome_Cliente,
-                MAX(Cidade) as Cidade,
-                MAX(Estado) as Estado,
-                MAX(Data_Emissao) as Ultima_Compra,
-                -- Valor total histórico (ou no período analítico disponível na view)
-                SUM(Valor_Total_Linha) as Valor_Total_Historico
-            FROM FAL_IA_Dados_Vendas_Televendas 
-            WHERE 1=1 {vendor_clause}
-            GROUP BY Codigo_Cliente
-            HAVING MAX(Data_Emissao) < DATEADD(day, -{min_days}, GETDATE())
-               AND MAX(Data_Emissao) >= DATEADD(day, -{max_days}, GETDATE())
-        )
-        SELECT * FROM Base_Inativos
-        """
-        
-        df = self.db.get_dataframe(query)
-        
-        if not df.empty:
-            # Calcular Media_Fardos (idealmente seria no SQL, mas mantendo lógica existente por compatibilidade)
-            # Para evitar N queries se houver muitos, idealmente cache ajuda.
-            # Se for muito lento, considerar mover logica para SQL.
-            df['Media_Fardos'] = df.apply(
-                lambda row: self.get_customer_profile_average(row['Codigo_Cliente'], row['Ultima_Compra']), 
-                axis=1
-            )
-            
-            # Ordenação solicitada: Maior Media de Fardos e Valor
-            df = df.sort_values(by=['Media_Fardos', 'Valor_Total_Historico'], ascending=[False, False])
-        else:
-            # Garante colunas mesmo vazio
-            df['Media_Fardos'] = 0.0
-            
-        return df
+        model = self.cadence_model
+        if max_days > model.history_days:
+            # Janela maior que o histórico em memória: tabela de cadência avulsa só para
+            # esta consulta (mesmas colunas e ordenação; inclui os 180 dias da média de fardos)
+            from src.services.cadence_model import CustomerCadenceModel
+            model = CustomerCadenceModel(self.db, history_days=max_days + model.profile_days)
+            model.build()
+
+        df = model.inactive(min_days=min_days, max_days=max_days, vendor=vendor_filter)
+        df['Proxima_Compra_Esperada'] = df['Proxima_Compra_Esperada'].dt.strftime('%Y-%m-%d')
+        return df[[
+            'Codigo_Cliente', 'Nome_Cliente', 'Cidade', 'Estado', 'Ultima_Compra', 'Valor_Total_Historico',
+            'Media_Fardos', 'Intervalo_Mediano', 'Proxima_Compra_Esperada', 'Dias_Inativo', 'Dias_Atraso', 'Risco',
+        ]]
 
     def get_top_products(self, days: int = 90, vendor_filter: str = None) -> str:
         vendor_filter = self._resolve_vendor_filter(vendor_filter)
@@ -693,11 +866,34 @@ class TelesalesAgent:
             query += f" AND Vendedor_Atual = '{vendor_filter}'"
             
         query += " GROUP BY SKU ORDER BY Total DESC"
-        df = self.db.get_dataframe(query)
-        if not df.empty and 'SKU' in df.columns:
-            df['SKU'] = df['SKU'].apply(self._format_sku)
+        df = format_sku_column(self.db.get_dataframe(query))
         return df.to_markdown(index=False)
 
+    def get_mix_recommendations(self, card_code: str, top_k: int = 5, recency_days: int = 60) -> pd.DataFrame:
+        """
+        SKUs mais co-comprados com a cesta do cliente que ele não comprou nos
+        últimos `recency_days` dias (Versão API/DataFrame).
+        Consulta o índice de co-compra em memória, sem SQL por requisição.
+        """
+        df = self.copurchase_index.recommend(card_code, top_k=top_k, recency_days=recency_days)
+        return format_sku_column(df)
+
+    def get_mix_recommendations_markdown(self, card_code: str, top_k: int = 5, vendor_filter: str = None) -> str:
+        """Oportunidades de mix por co-compra (Versão Chat/Markdown)."""
+        try:
+            vendor_filter = self._resolve_vendor_filter(vendor_filter)
+            if vendor_filter:
+                # Security Check: carteira verificada pelo próprio índice (sem SQL). Mesma regra
+                # do /inactive: vale qualquer vendedor do histórico; cliente desconhecido é negado
+                if vendor_filter not in self.copurchase_index.customer_vendors(card_code):
+                    return "Acesso Negado: Este cliente não pertence à sua carteira de vendas."
+
+            df = self.get_mix_recommendations(card_code, top_k=int(top_k))
+            if df.empty:
+                return "Nenhuma oportunidade de mix encontrada para este cliente."
+            return df.to_markdown(index=False)
+        except Exception as e: return f"Erro ao buscar oportunidades de mix: {str(e)}"
+
     def get_company_kpis(self, days: int = 30) -> str:
         query = f"""
         SELECT 
@@ -726,34 +922,25 @@ class TelesalesAgent:
         mas a lógica de colunas e filtros é estática.
         """
         query = f"""
-        SELECT TOP 15 
+        SELECT 
             SKU,
             MAX(Nome_Produto) as Produto,
-            SUM(
-                CASE 
-                    WHEN ISNULL(o.NumInSale, 0) > 1 THEN v.Quantidade / o.NumInSale 
-                    ELSE v.Quantidade 
-                END
-            ) as Volume_Total,
+            SUM(Quantidade) as Quantidade,
             COUNT(DISTINCT Codigo_Cliente) as Clientes_Ativos,
             ROUND(AVG(Valor_Liquido), 2) as Ticket_Medio,
             MAX(Categoria_Produto) as Categoria
-        FROM FAL_IA_Dados_Vendas_Televendas v
-        LEFT JOIN OITM o ON o.ItemCode = v.SKU COLLATE DATABASE_DEFAULT
+        FROM FAL_IA_Dados_Vendas_Televendas
         WHERE Data_Emissao >= DATEADD(day, :days, GETDATE())
-          AND v.Unidade_Medida NOT IN ('KG', 'TN') -- Exclui Farelo no Volume de Fardos
+          AND Unidade_Medida NOT IN ('KG', 'TN') -- Exclui Farelo no Volume de Fardos
         GROUP BY SKU
-        HAVING SUM(
-            CASE 
-                WHEN ISNULL(o.NumInSale, 0) > 1 THEN v.Quantidade / o.NumInSale 
-                ELSE v.Quantidade 
-            END
-        ) > 100 -- Ajustado limite para fardos (antes 3000 unidades)
-        ORDER BY Volume_Total DESC
         """
         df = self.db.get_dataframe(query, params={"days": -days})
-        if not df.empty and 'SKU' in df.columns:
-            df['SKU'] = df['SKU'].apply(self._format_sku)
+        if not df.empty:
+            # Fardos = Quantidade / NumInSale (cadastro em memória, sem JOIN com OITM)
+            df['Volume_Total'] = self.item_master.to_bales(df.pop('Quantidade'), df['SKU'])
+            df = df[df['Volume_Total'] > 100]  # Ajustado limite para fardos (antes 3000 unidades)
+            df = df.nlargest(15, 'Volume_Total')
+            df = format_sku_column(df)[['SKU', 'Produto', 'Volume_Total', 'Clientes_Ativos', 'Ticket_Medio', 'Categoria']]
         
         if df.empty:
             return "Nenhum dado de volume significativo encontrado no período."
@@ -805,30 +992,9 @@ class TelesalesAgent:
             CASE WHEN v.Codigo_Cliente IS NOT NULL THEN 1 ELSE 0 END as Positivado,
             ISNULL(v.Total_Vendas, 0) as Total_Vendas,
             v.Ultima_Compra,
-            v.Dias_Desde_Compra,
-            ISNULL(m.Media_Fardos, 0) as Media_Fardos
+            v.Dias_Desde_Compra
         FROM Carteira_Completa c
         LEFT JOIN Vendas_Periodo v ON c.Codigo_Cliente = v.Codigo_Cliente
-        OUTER APPLY (
-            SELECT TOP 1 
-                AVG(CAST(sub.Qtd_Fardos AS DECIMAL(10,2))) as Media_Fardos
-            FROM (
-                SELECT 
-                    v_inner.Data_Emissao, 
-                    SUM(
-                        CASE 
-                            WHEN ISNULL(o.NumInSale, 0) > 1 THEN v_inner.Quantidade / o.NumInSale 
-                            ELSE v_inner.Quantidade 
-                        END
-                    ) as Qtd_Fardos
-                FROM FAL_IA_Dados_Vendas_Televendas v_inner
-                LEFT JOIN OITM o ON o.ItemCode = v_inner.SKU COLLATE DATABASE_DEFAULT
-                WHERE v_inner.Codigo_Cliente = c.Codigo_Cliente
-                  AND v_inner.Data_Emissao >= DATEADD(month, -6, GETDATE()) -- Média dos últimos 6 meses
-                  AND v_inner.Unidade_Medida NOT IN ('KG', 'TN') -- Exclui Farelo da Média
-                GROUP BY v_inner.Data_Emissao
-            ) sub
-        ) m
         ORDER BY Positivado DESC, Total_Vendas DESC
         """
         
@@ -850,6 +1016,10 @@ class TelesalesAgent:
         positivated = df[df['Positivado'] == 1].shape[0]
         non_positivated = total - positivated
         rate = (positivated / total * 100) if total > 0 else 0
+
+        # Média de fardos por dia de compra (6 meses, exclui KG/TN) vem do rollup mensal
+        rollup = self._rollup_since(pd.Timestamp.now() - pd.DateOffset(months=6))
+        avg_bales = rollup.average_bales(df['Codigo_Cliente'], months=6) if rollup is not None else None
         
         # Formatar clientes
         clients = []
@@ -862,7 +1032,8 @@ class TelesalesAgent:
                 "is_positivated": bool(row['Positivado']),
                 "total_sales": float(row['Total_Vendas']),
                 "last_purchase": row['Ultima_Compra'].isoformat() if pd.notna(row['Ultima_Compra']) else None,
-                "days_since_purchase": int(row['Dias_Desde_Compra']) if pd.notna(row['Dias_Desde_Compra']) else None
+                "days_since_purchase": int(row['Dias_Desde_Compra']) if pd.notna(row['Dias_Desde_Compra']) else None,
+                "avg_bales": float(avg_bales[row['Codigo_Cliente']]) if avg_bales is not None else None
             })
         
         return {
@@ -882,91 +1053,44 @@ class TelesalesAgent:
         """
         Gera resposta em stream, lidando automaticamente com chamadas de função.
         """
-        if not self.model:
+        stream_started = time.perf_counter()
+        first_token_pending = True
+        model = await self._get_model_async()
+        if not model:
             yield "O modelo de IA não está disponível."
             return
 
-        chat = self.model.start_chat() 
-        # Nota: Vertex AI SDK gerencia o histórico na sessão 'chat', mas como recebemos history do frontend (stateless), 
-        # idealmente deveríamos reconstruir o history do chat object. 
-        # Para simplificar e performar, enviaremos o history como contexto na mensagem ou reconstruiremos.
-        # Reconstruindo histórico básico:
-        
+        # O frontend é stateless: reconstruímos o histórico básico a cada chamada
         history_instruction = []
         if history:
             for msg in history[-6:]: # Limit history
                 role = "user" if msg.get('sender') == 'user' else "model"
-                part = Part.from_text(msg.get('text'))
-                history_instruction.append(Content(role=role, parts=[part]))
+                history_instruction.append({"role": role, "text": msg.get('text') or ""})
         
-        chat = self.model.start_chat(history=history_instruction)
+        chat = model.start_chat(history=history_instruction)
 
         # Envia instrução de sistema dinâmica para o vendedor atual
         resolved_vendor = self._resolve_vendor_filter(vendor_filter)
         vendor_context = f"\n\nCONTEXTO DO USUÁRIO:\nVocê está conversando com: {resolved_vendor or 'Vendedor'}.\nLembre-se: Use as ferramentas de busca e elas automaticamente filtrarão os dados para a sua carteira, se necessário."
         
-        # Envia mensagem inicial
-        response_stream = await chat.send_message_async(user_message + vendor_context, stream=True)
-        
-        # Itera sobre chunks. O SDK cuida da execução automática de tools? 
-        # R: Não automaticamente no modo stream async simples sem orquestração. 
-        # Precisamos detectar o FunctionCall, executar e devolver o FunctionResponse.
-        
-        # OBSERVAÇÃO CRÍTICA SOBRE VERTEX AI PYTHON SDK + STREAM + TOOLS:
-        # A implementação padrão de `send_message_async(stream=True)` retorna chunks.
-        # Se a IA decidir chamar uma func, o primeiro chunk conterá `function_call`.
-        # Precisamos checar isso.
-        
-        # Para simplificar neste primeiro passo de otimização, devido à complexidade de loop manual de function calling com stream,
-        # vamos usar uma abordagem híbrida ou a Feature "Automatic Function Calling" se disponível na versão da lib.
-        # Assumindo loop manual padrão:
-        
-        collected_chunks = []
+        # Loop manual de function calling: o backend devolve texto OU uma
+        # function_call no stream; se vier function_call, executamos a tool e
+        # devolvemos o FunctionResponse para o modelo gerar a resposta final.
         function_call_detected = None
         
         try:
-            async for chunk in response_stream:
-                try:
-                    # Inspeção manual profunda para evitar erros de propriedade do SDK
-                    # Acessar propriedades de 'chunk' que não existem pode gerar erro, então protegemos tudo
-                    
-                    found_fn = False
-                    if hasattr(chunk, 'candidates') and chunk.candidates:
-                        for candidate in chunk.candidates:
-                            if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                                for part in candidate.content.parts:
-                                    # Verifica se tem function_call (pode ser método ou propriedade dependendo do SDK)
-                                    # Tentamos acesso seguro
-                                    fn = getattr(part, 'function_call', None)
-                                    if fn:
-                                        function_call_detected = fn
-                                        found_fn = True
-                                        break
-                            if found_fn: break
-                    
-                    if found_fn or function_call_detected:
-                        break # Sai do loop de stream
-                    
-                    # Extração Manual de Texto (Evita chunk.text que lança ValueError)
-                    extracted_text = ""
-                    if hasattr(chunk, 'candidates') and chunk.candidates:
-                         for candidate in chunk.candidates:
-                             if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                                 for part in candidate.content.parts:
-                                     # Tenta pegar texto de forma segura
-                                     pt = getattr(part, 'text', "")
-                                     if pt: extracted_text += pt
-                    
-                    if extracted_text:
-                        yield extracted_text
-                        
-                except Exception as inner_e:
-                    # Loga mas não quebra o stream
-                    # print(f"DEBUG: Erro ao processar chunk individual: {inner_e}")
-                    continue
+            async for chunk in chat.send_message_stream(user_message + vendor_context):
+                if chunk.function_call:
+                    function_call_detected = chunk.function_call
+                    break # Sai do loop de stream
+                if chunk.text:
+                    if first_token_pending:
+                        STREAM_TTFT.observe(time.perf_counter() - stream_started)
+                        first_token_pending = False
+                    yield chunk.text
                     
         except Exception as stream_e:
-            print(f"DEBUG: Erro fatal no stream (possivel function call malformada): {stream_e}")
+            logger.exception("Erro fatal no stream (possivel function call malformada)")
             yield f"\n\n[Sistema] Erro no processamento inicial: {str(stream_e)}"
                 
         if function_call_detected:
@@ -974,7 +1098,7 @@ class TelesalesAgent:
             func_name = function_call_detected.name
             func_args = function_call_detected.args
             
-            print(f"DEBUG: Tool Call Detectada: {func_name} Args: {func_args}")
+            logger.info("Tool call: %s", func_name, extra={"fields": {"tool": func_name, "args": dict(func_args)}})
             
             # Keep-alive notification for user
             yield f"\n\n_Consultando dados para {func_name}..._\n\n"
@@ -984,8 +1108,7 @@ class TelesalesAgent:
             # Mapeamento dinâmico
             if hasattr(self, func_name):
                 method = getattr(self, func_name)
-                # Converte args (proto map) para dict python
-                kwargs = {k: v for k, v in func_args.items()}
+                kwargs = dict(func_args)
                 
                 # Injeta vendor_filter se o método aceitar
                 import inspect
@@ -998,51 +1121,24 @@ class TelesalesAgent:
                 except Exception as e:
                     tool_result = f"Erro ao executar {func_name}: {e}"
             
-            print(f"DEBUG: Tool Result size: {len(str(tool_result))}")
-            
-            # Envia resposta da tool de volta para o modelo gerar a resposta final (agora sim com stream de texto)
+            logger.debug("Tool result size: %d", len(str(tool_result)))
             
-            part_func_response = Part.from_function_response(
-                name=func_name,
-                response={"content": tool_result}
-            )
-
             # Continua a conversa com o resultado da função
             try:
-                # WORKAROUND: Stream após Tool Calling pode ser instável no Vertex AI SDK.
-                # Mudamos para stream=False (resposta completa) para garantir que o texto chegue.
-                final_response = await chat.send_message_async(
-                    [part_func_response],
-                    stream=False
-                )
-                
-                # Debug response details - RESTORED
-                print(f"DEBUG: Final Response Object: {final_response}")
-                if hasattr(final_response, 'candidates') and final_response.candidates:
-                     print(f"DEBUG: Finish Reason: {final_response.candidates[0].finish_reason}")
-                     if hasattr(final_response.candidates[0], 'safety_ratings'):
-                         print(f"DEBUG: Safety Ratings: {final_response.candidates[0].safety_ratings}")
-
-                # Verificação segura do texto final
-                final_text = ""
-                try:
-                    if hasattr(final_response, 'text') and final_response.text:
-                        final_text = final_response.text
-                except Exception:
-                    # Fallback manual se .text falhar
-                     if hasattr(final_response, 'candidates') and final_response.candidates:
-                         for cand in final_response.candidates:
-                             for part in cand.content.parts:
-                                 if hasattr(part, 'text') and part.text:
-                                     final_text += part.text
+                final_response = await chat.send_function_response(func_name, {"content": tool_result})
+                logger.debug("Finish reason: %s", final_response.finish_reason)
+
+                final_text = final_response.text
 
                 if final_text:
+                    if first_token_pending:
+                        STREAM_TTFT.observe(time.perf_counter() - stream_started)
+                        first_token_pending = False
                     yield final_text
                 else:
                     # Fallback Inteligente: Tenta formatar o JSON em Markdown se o model falhar
                     formatted_fallback = ""
                     try:
-                        import json
                         data = json.loads(tool_result)
                         if isinstance(data, dict):
                             formatted_fallback += "### Dados Encontrados:\n"
@@ -1070,7 +1166,7 @@ class TelesalesAgent:
 
             except Exception as e:
                 # Se falhar aqui, não tem muito o que fazer, mas não crasheamos o stream
-                print(f"DEBUG: Erro no stream pós-tool: {e}")
+                logger.exception("Erro no stream pós-tool")
                 yield f"\n\n[Sistema] Erro ao gerar resposta final: {str(e)}"
     
     # Manter método legado para evitar quebrar endpoints antigos por enquanto (se necessário) ou redirecionar
@@ -1095,8 +1191,14 @@ class TelesalesAgent:
         # 1. Recupera dados de contexto
         details = self.get_customer_details(card_code)
         hist = self.get_customer_history(card_code, limit=20)
-        top_selling = self.get_top_products(days=90) # Top produtos gerais como sugestão
-        volume_insights = self.get_volume_insights(days=90) # Nova ferramenta de Pulverização
+        snapshot = self.get_company_snapshot() # Contexto da empresa (cacheado/aquecido no startup)
+        top_selling = snapshot["top_products"] # Top produtos gerais como sugestão
+        volume_insights = snapshot["volume_insights"] # Nova ferramenta de Pulverização
+        try:
+            mix = self.get_mix_recommendations(card_code, top_k=8) # Co-compra personalizada do cliente
+        except Exception as e:
+            logger.warning("Erro ao consultar índice de co-compra: %s", e)
+            mix = pd.DataFrame()
         
         customer_name = details.get('CardName', card_code)
         
@@ -1118,6 +1220,11 @@ class TelesalesAgent:
         INSIGHTS DE VOLUME (ÚLTIMOS 90 DIAS):
         {volume_insights}
 
+        OPORTUNIDADES DE MIX DESTE CLIENTE (CO-COMPRA):
+        SKUs mais comprados junto com os itens que este cliente já compra e que ele NÃO comprou nos últimos 60 dias.
+        Score = nº de pedidos em que o SKU aparece junto com a cesta do cliente.
+        {mix.to_markdown(index=False) if not mix.empty else "Sem dados de co-compra para este cliente."}
+
         TAREFAS E REGRAS DE NEGÓCIO:
         1. **Perfil de Compra**: Resuma o que o cliente compra (ex: Foco em Arroz, itens de cesta básica).
         2. **Frequência**: Avalie a recorrência e dias desde o último pedido faturado.
@@ -1128,7 +1235,8 @@ class TelesalesAgent:
            a) **1 Item Âncora** (20-30% da quantidade): O SKU recorrente principal do cliente (giro garantido).
            
            b) **2-3 Itens de Pulverização** (50-60% da quantidade - FOCO PRINCIPAL):
-              - Selecione produtos dos INSIGHTS DE VOLUME que o cliente NÃO comprou nos últimos 60 dias
+              - Priorize os SKUs das OPORTUNIDADES DE MIX DESTE CLIENTE (maior Score primeiro)
+              - Complete com produtos dos INSIGHTS DE VOLUME que o cliente NÃO comprou nos últimos 60 dias
               - PRIORIZE itens com maior Volume_Total da lista
               - DIVERSIFIQUE categorias (se compra Arroz, sugira Feijão + Massas + Óleo)
               - Foque em produtos com alta rotatividade e giro rápido garantido
@@ -1167,7 +1275,8 @@ class TelesalesAgent:
         """
         
         try:
-            response = await self.model.generate_content_async(
+            model = await self._get_model_async()
+            response = await model.generate_content_async(
                 prompt, 
                 generation_config={"response_mime_type": "application/json"}
             )
@@ -1180,7 +1289,7 @@ class TelesalesAgent:
             
             return data
         except Exception as e:
-            print(f"Erro em generate_pitch: {e}")
+            logger.exception("Erro em generate_pitch")
             return {
                 "pitch_text": "Olá! Notei que faz um tempo que não repomos o estoque de Arroz e Feijão Fantástico. Que tal aproveitar o pedido hoje?",
                 "profile_summary": "Cliente recorrente de produtos básicos.",
@@ -1,18 +1,34 @@
-from fastapi import FastAPI, HTTPException
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Security, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from fastapi.security.api_key import APIKeyHeader
+from starlette.middleware.base import BaseHTTPMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
 import sys
 import os
+import uuid
+import logging
 import pandas as pd
 import numpy as np
 from decimal import Decimal
 from datetime import datetime, timedelta
-import hashlib
 
 # Adiciona o diretório raiz ao path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from src.agents.telesales_agent import TelesalesAgent
+from src.core.config import get_settings
+from src.utils.logger import log_pitch_usage, log_pitch_feedback, close_pitch_log
+from src.services.pitch_analytics import get_pitch_analytics
+from src.api.middleware import MetricsMiddleware, SQLInstrumentationMiddleware
+from src.core.metrics import cache_lookup, register_db_pool, render as render_metrics
+from src.core.structured_logging import get_logger, shutdown_logging
+
+settings = get_settings()
+logger = get_logger("api")
 
 app = FastAPI(title="MariIA API", description="API para Inteligência de Vendas")
 
@@ -36,9 +52,6 @@ _cache = {}
 CACHE_TTL = 60  # segundos
 
 # --- Middleware de Segurança ---
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request, call_next):
         response = await call_next(request)
@@ -56,14 +69,17 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(SecurityHeadersMiddleware)
 
-# --- Segurança (API Key) ---
-from fastapi import Security, Depends
-from fastapi.security.api_key import APIKeyHeader
+# Instrumentação de SQL por requisição (Server-Timing, log JSON e orçamento de queries)
+app.add_middleware(
+    SQLInstrumentationMiddleware,
+    budgets=settings.SQL_QUERY_BUDGETS,
+    log=settings.SQL_INSTRUMENTATION_LOG,
+)
 
-# --- Configurações ---
-from src.core.config import get_settings
-settings = get_settings()
+# Métricas Prometheus (latência por rota e requisições em andamento) - mais externo
+app.add_middleware(MetricsMiddleware)
 
+# --- Segurança (API Key) ---
 API_KEY = settings.API_KEY
 api_key_header = APIKeyHeader(name="x-api-key", auto_error=False)
 
@@ -73,14 +89,30 @@ async def get_api_key(api_key_header: str = Security(api_key_header)):
     raise HTTPException(status_code=403, detail="Acesso Negado: API Key inválida ou ausente.")
 
 # Instância global do agente (para reuso de conexão)
-# Instância global do agente (para reuso de conexão)
+# Construção leve: modelo e banco são inicializados no warm-up em background
 agent = TelesalesAgent()
+register_db_pool(lambda: agent.db_engine)
+
+@app.on_event("startup")
+def start_agent_warm_up():
+    """Não bloqueia o startup: o uvicorn já responde enquanto o agente aquece."""
+    agent.startup_timings["app_import"] = _APP_IMPORT_SECONDS
+    agent.start_warm_up()
+    # Fila de pedidos e push importados sob demanda: puxam requests e o cliente do SAP
+    from src.services.order_queue import resume_order_queue
+    resume_order_queue()
+
+@app.on_event("shutdown")
+def stop_logging():
+    """Para os workers de pedidos e esvazia as filas de logs antes de encerrar o processo."""
+    from src.services.order_queue import stop_order_queue
+    stop_order_queue()
+    close_pitch_log()
+    shutdown_logging()
 
 # Configuração de Vendedor Atual (Dinâmico via Header)
 # CURRENT_VENDOR removed
 
-from fastapi import Header
-
 async def get_current_vendor(x_user_id: Optional[str] = Header(None, alias="x-user-id")):
     if x_user_id:
         return x_user_id
@@ -126,7 +158,21 @@ def clean_data(df):
 
 @app.get("/", dependencies=[Depends(get_api_key)])
 def health_check():
-    return {"status": "online", "agent": "TelesalesAgent"}
+    return {"status": "online", "agent": "TelesalesAgent", "ready": agent.is_ready}
+
+@app.get("/health/ready", dependencies=[Depends(get_api_key)])
+def readiness_check():
+    """Estado de prontidão dos componentes e breakdown do tempo de inicialização."""
+    return {
+        "ready": agent.is_ready,
+        "components": agent.readiness,
+        "startup_timings": agent.startup_timings
+    }
+
+@app.get("/metrics", dependencies=[Depends(get_api_key)])
+def metrics():
+    """Métricas no formato Prometheus (scrape)."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/auth/sap-id", dependencies=[Depends(get_api_key)])
 def get_sap_id(email: str):
@@ -135,18 +181,15 @@ def get_sap_id(email: str):
         if not email:
             raise HTTPException(status_code=400, detail="E-mail é obrigatório.")
         
-        # 🛡️ SECURITY: Use safe parameterization (already implemented in get_dataframe)
-        query = "SELECT SlpCode FROM OSLP WHERE Email = :email"
-        df = agent.db.get_dataframe(query, params={"email": email.strip().lower()})
+        # Diretório OSLP em memória (aquecido no startup), com fallback para a OSLP
+        slp_code = agent.get_slp_code_by_email(email)
         
-        if df.empty:
+        if slp_code is None:
             return {"slpCode": None, "message": f"Nenhum vendedor encontrado para o e-mail: {email}"}
         
-        # O SlpCode pode ser retornado como int
-        slp_code = int(df.iloc[0]['SlpCode'])
         return {"slpCode": slp_code}
     except Exception as e:
-        sys.stderr.write(f"ERRO /auth/sap-id: {str(e)}\n")
+        logger.exception("Erro em get_sap_id")
         raise HTTPException(status_code=500, detail="Erro interno ao consultar SAP.")
 
 @app.get("/insights")
@@ -160,21 +203,23 @@ def get_insights(min_days: int = 0, max_days: int = 30, vendor_filter: str = Dep
         if cache_key in _cache:
             cached_data, cached_time = _cache[cache_key]
             if datetime.now() - cached_time < timedelta(seconds=CACHE_TTL):
-                sys.stderr.write(f"DEBUG: Cache HIT para {cache_key}\n")
+                logger.debug("Cache HIT para %s", cache_key)
+                cache_lookup("insights", True)
                 return cached_data
+        cache_lookup("insights", False)
                 
-        sys.stderr.write(f"DEBUG: Cache MISS - get_insights REQUEST - min={min_days} max={max_days} vendor={vendor_filter}\n")
         df = agent.get_sales_insights(min_days=min_days, max_days=max_days, vendor_filter=vendor_filter)
-        sys.stderr.write(f"DEBUG: get_insights RESULT from Agent - Lines={len(df)}\n")
         
-        if not df.empty:
-            sys.stderr.write(f"DEBUG: Sample Data:\n{df.head(2).to_markdown()}\n")
+        # Amostra dos dados só com DEBUG ligado (to_markdown é caro)
+        if not df.empty and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("get_insights sample:\n%s", df.head(2).to_markdown())
         
         df = clean_data(df)
-        sys.stderr.write(f"DEBUG: get_insights AFTER CLEAN - Lines={len(df)}\n")
-        
         data = df.to_dict(orient="records")
-        sys.stderr.write(f"DEBUG: Final JSON Items: {len(data)}\n")
+        logger.debug(
+            "Cache MISS para %s", cache_key,
+            extra={"fields": {"min_days": min_days, "max_days": max_days, "vendor": vendor_filter, "rows": len(data)}},
+        )
         
         result = {"data": data}
         
@@ -183,8 +228,7 @@ def get_insights(min_days: int = 0, max_days: int = 30, vendor_filter: str = Dep
         
         return result
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro em get_insights")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/inactive")
@@ -199,8 +243,7 @@ def get_inactive(min_days: int = 30, max_days: int = 365, vendor_filter: str = D
         df = clean_data(df)
         return {"data": df.to_dict(orient="records")}
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro em get_inactive")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/customer/{card_code}/bales_breakdown", dependencies=[Depends(get_api_key)])
@@ -212,8 +255,7 @@ def get_bales_breakdown(card_code: str, days: int = 180):
             return []
         return clean_data(df).to_dict(orient="records")
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro em get_bales_breakdown")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/customer/{card_code}", dependencies=[Depends(get_api_key)])
@@ -288,40 +330,94 @@ def get_customer(card_code: str):
             "history": grouped_history
         }
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro em get_customer")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/trends/{card_code}", dependencies=[Depends(get_api_key)])
-def get_customer_trends_alias(card_code: str):
+def get_customer_trends_alias(card_code: str, granularity: str = "month", periods: Optional[int] = None,
+                              categories: Optional[str] = None):
     """Alias para retornar tendência de vendas (evita conflito de rota)."""
-    return get_customer_trends(card_code)
+    return get_customer_trends(card_code, granularity, periods, categories)
 
 @app.get("/customer/{card_code}/trends", dependencies=[Depends(get_api_key)])
-def get_customer_trends(card_code: str):
-    """Retorna tendência de vendas para o gráfico."""
+def get_customer_trends(card_code: str, granularity: str = "month", periods: Optional[int] = None,
+                        categories: Optional[str] = None):
+    """
+    Retorna tendência de vendas para o gráfico.
+    granularity: week | month | quarter; periods: nº de períodos (padrão 6 meses);
+    categories: "Nome=PALAVRA,..." (padrão: Arroz, Feijão, Massas).
+    """
     try:
-        # Busca tendência de 6 meses
-        trends = agent.get_sales_trend(card_code, months=6)
-        return trends
+        return agent.get_sales_trend(card_code, months=6, granularity=granularity, periods=periods,
+                                     categories=categories)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro em get_customer_trends")
         raise HTTPException(status_code=500, detail=str(e))
 
-from src.utils.logger import log_pitch_usage, log_pitch_feedback
-import uuid
-
 class PitchRequest(BaseModel):
     card_code: str
     target_sku: str
     user_id: Optional[str] = None
 
+class RegisterTokenRequest(BaseModel):
+    token: str
+    user_id: str
+    platform: Optional[str] = None
+
+class OrderRequest(BaseModel):
+    order: dict  # Payload do pedido no formato do Service Layer (CardCode, DocumentLines, ...)
+    idempotency_key: Optional[str] = None
+
 class FeedbackRequest(BaseModel):
     pitch_id: str
     feedback_type: str # 'useful' | 'sold'
     user_id: Optional[str] = None
 
+@app.post("/notifications/register-token", dependencies=[Depends(get_api_key)])
+def register_push_token(request: RegisterTokenRequest):
+    """Registra o token Expo de um dispositivo do vendedor."""
+    from src.services.notification_service import save_token
+    try:
+        save_token(request.user_id, request.token, request.platform)
+        return {"status": "ok"}
+    except Exception as e:
+        logger.exception("Erro em register_push_token")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/orders", status_code=202, dependencies=[Depends(get_api_key)])
+def submit_order(
+    request: OrderRequest,
+    vendor_filter: str = Depends(get_current_vendor),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Enfileira o pedido para envio ao SAP e responde na hora (202). O app
+    acompanha o envio em GET /orders/{order_id}; reenviar com a mesma
+    Idempotency-Key devolve o mesmo pedido; a mesma chave com outro pedido
+    responde 409.
+    """
+    from src.services.order_queue import OrderConflictError, get_order_queue
+    try:
+        return get_order_queue().enqueue(
+            request.order, idempotency_key=idempotency_key or request.idempotency_key, vendor=vendor_filter,
+        )
+    except OrderConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.exception("Erro em submit_order")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/orders/{order_id}", dependencies=[Depends(get_api_key)])
+def get_order_status(order_id: str, vendor_filter: str = Depends(get_current_vendor)):
+    """Status do envio: queued, processing, retrying, submitted (com DocEntry/DocNum) ou failed."""
+    from src.services.order_queue import get_order_queue
+    order = get_order_queue().get(order_id)
+    if order is None or order["vendor"] != vendor_filter:
+        raise HTTPException(status_code=404, detail="Pedido não encontrado.")
+    return order
+
 @app.post("/pitch")
 async def generate_pitch(request: PitchRequest, vendor_filter: str = Depends(get_current_vendor)):
     """Gera um pitch de vendas usando IA."""
@@ -356,17 +452,17 @@ async def generate_pitch(request: PitchRequest, vendor_filter: str = Depends(get
                 target_sku=request.target_sku,
                 pitch_generated=pitch.get("pitch_text", ""),
                 pitch_id=pitch_id,
-                user_id=request.user_id
+                user_id=request.user_id,
+                metadata={"vendor": vendor_filter}
             )
         except Exception as log_err:
-            print(f"Erro ao logar uso do pitch: {log_err}")
+            logger.warning("Erro ao logar uso do pitch: %s", log_err)
         
         # Retorna dicionário aninhado conforme esperado pelo PitchCard.jsx (result.pitch)
         # Retorna dicionário aninhado conforme esperado pelo PitchCard.jsx (result.pitch)
         return {"pitch": pitch, "pitch_id": pitch_id}
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro em generate_pitch")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/pitch/feedback", dependencies=[Depends(get_api_key)])
@@ -380,8 +476,32 @@ def pitch_feedback(request: FeedbackRequest):
         )
         return {"status": "ok"}
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro em pitch_feedback")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/analytics/pitch/conversion", dependencies=[Depends(get_api_key)])
+def get_pitch_conversion(
+    group_by: str = "sku",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 100,
+    vendor_filter: str = Depends(get_current_vendor),
+):
+    """
+    Conversão dos pitches do vendedor (gerados / úteis / vendidos) por sku,
+    vendor, week ou card_code. A ingestão do log roda em background: a
+    resposta traz o que já foi ingerido.
+    """
+    try:
+        store = get_pitch_analytics()
+        return {
+            "summary": store.summary(vendor_filter),
+            "data": store.conversion(group_by, start, end, vendor_filter, limit),
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Erro em get_pitch_conversion")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/chat")
@@ -391,12 +511,9 @@ async def chat_with_agent(request: ChatRequest, vendor_filter: str = Depends(get
         response = await agent.chat(request.message, request.history, vendor_filter=vendor_filter)
         return {"response": response}
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro em chat_with_agent")
         raise HTTPException(status_code=500, detail=str(e))
 
-from fastapi.responses import StreamingResponse
-
 @app.post("/chat/stream")
 async def chat_stream_endpoint(request: ChatRequest, vendor_filter: str = Depends(get_current_vendor)):
     """Conversa com o assistente via Streaming (Server-Sent Events style)."""
@@ -405,6 +522,7 @@ async def chat_stream_endpoint(request: ChatRequest, vendor_filter: str = Depend
             async for chunk in agent.chat_stream(request.message, request.history, vendor_filter=vendor_filter):
                 yield chunk
         except Exception as e:
+            logger.exception("Erro em chat_stream_endpoint")
             yield f"Erro no stream: {e}"
 
     return StreamingResponse(event_generator(), media_type="text/plain")
@@ -416,10 +534,11 @@ def get_portfolio(vendor_filter: str = Depends(get_current_vendor)):
         result = agent.get_portfolio_analysis(vendor_filter=vendor_filter)
         return result
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro em get_portfolio")
         raise HTTPException(status_code=500, detail=str(e))
 
+_APP_IMPORT_SECONDS = round(time.perf_counter() - _IMPORT_STARTED, 3)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8005)
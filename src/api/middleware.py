@@ -0,0 +1,105 @@
+"""Middlewares ASGI da API."""
+import time
+
+from src.core.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_LATENCY
+from src.core.structured_logging import get_logger
+from src.database.instrumentation import end_request, start_request
+
+logger = get_logger("sql")
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Abre o contexto de instrumentação de SQL de cada requisição.
+
+    - Adiciona `Server-Timing` (tempo de banco, nº de queries e linhas até o
+      envio dos headers; em streams, as queries feitas depois não entram).
+    - Ao fim da resposta, emite um log estruturado (JSON) com os totais e as
+      queries agrupadas por fingerprint.
+    - Avisa quando o endpoint excede o orçamento de queries configurado.
+
+    ASGI puro (e não BaseHTTPMiddleware) para não bufferizar o StreamingResponse.
+    """
+
+    def __init__(self, app, budgets: dict = None, log: bool = True):
+        self.app = app
+        self.budgets = budgets or {}
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = start_request(scope.get("path", ""))
+        status_code = None
+
+        def route_path():
+            # O roteador do FastAPI grava a rota no scope: usamos o template (/customer/{card_code})
+            route = scope.get("route")
+            return getattr(route, "path", None) or scope.get("path", "")
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - stats.started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing(total_ms).encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
+            stats.endpoint = route_path()
+            self._report(scope, stats, status_code)
+
+    def _report(self, scope, stats, status_code):
+        budget = self.budgets.get(stats.endpoint)
+        over_budget = budget is not None and stats.query_count > budget
+        if over_budget:
+            logger.warning(
+                "%s excedeu o orçamento de queries (%d > %d)", stats.endpoint, stats.query_count, budget,
+                extra={"fields": {"endpoint": stats.endpoint, "queries": stats.query_count, "query_budget": budget}},
+            )
+        if self.log and stats.query_count:
+            fields = {"event": "sql_request", "method": scope.get("method"), "status": status_code}
+            fields.update(stats.summary())
+            if budget is not None:
+                fields["query_budget"] = budget
+                fields["over_budget"] = over_budget
+            logger.info("sql_request", extra={"fields": fields})
+
+
+class MetricsMiddleware:
+    """Latência por rota (template, não o path cru) e requisições em andamento."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Rotas inexistentes agrupadas para não explodir a cardinalidade
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_LATENCY.labels(
+                method=scope.get("method", ""), route=route, status=str(status_code)
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,379 @@
+"""
+Benchmark end-to-end da API (latência, throughput, TTFB e queries por requisição).
+
+Sobe a API num uvicorn local (thread em background) apontando para os
+stand-ins offline — base SQLite sintética (`DB_BACKEND=sqlite`) e LLM
+roteirizado (`LLM_BACKEND=fake`) — e dispara os cenários com concorrência
+configurável via httpx. Para cada cenário reporta p50/p95/p99, throughput,
+time-to-first-byte e número de queries SQL por requisição, e compara com o
+baseline versionado para pegar regressões.
+
+Uso:
+    python -m src.benchmarks.api_benchmark                       # roda e imprime relatório
+    python -m src.benchmarks.api_benchmark --write               # atualiza relatório + baseline
+    python -m src.benchmarks.api_benchmark --check               # falha se regrediu
+    python -m src.benchmarks.api_benchmark --scenarios portfolio,inactive --concurrency 16
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+sys.path.append(ROOT_DIR)
+from src.database.instrumentation import end_request, start_request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_FILE = os.path.join(BENCH_DIR, "reports", "api_benchmark.txt")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baselines", "api_benchmark.json")
+FAKE_LLM_SCRIPT = os.path.join(BENCH_DIR, "fake_llm_script.json")
+DEFAULT_DB_PATH = os.path.join(ROOT_DIR, "data", "benchmark_sales.db")
+
+API_KEY = "benchmark"
+
+# (nome, método, rota, corpo) — {card}, {sku} e {message} são preenchidos por requisição
+SCENARIOS = {
+    "insights": ("GET", "/insights?max_days=30", None),
+    "inactive": ("GET", "/inactive?min_days=30&max_days=365", None),
+    "portfolio": ("GET", "/portfolio", None),
+    "customer": ("GET", "/customer/{card}", None),
+    "trends": ("GET", "/trends/{card}", None),
+    "pitch": ("POST", "/pitch", {"card_code": "{card}", "target_sku": "{sku}"}),
+    "chat_stream": ("POST", "/chat/stream", {"message": "{message}", "history": []}),
+}
+
+CHAT_MESSAGES = [
+    "Olá, quem é você?",
+    "Me mostre o histórico do cliente",
+    "Quais clientes estão inativos na minha carteira?",
+    "Quais oportunidades de mix para este cliente?",
+]
+
+class QueryCountingMiddleware:
+    """
+    Middleware ASGI que guarda o nº de queries SQL de cada requisição (chave:
+    header x-bench-id). Abre o contexto de `src.database.instrumentation` por
+    fora da app; o SQLInstrumentationMiddleware da API reaproveita o mesmo
+    RequestStats, então a contagem é a mesma do log `sql_request`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.counts: Dict[str, int] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        bench_id = dict(scope["headers"]).get(b"x-bench-id")
+        stats, token = start_request(scope.get("path", ""))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end_request(token)
+            if bench_id:
+                self.counts[bench_id.decode()] = stats.query_count
+
+
+def configure_environment(db_path: str, llm_latency_ms: float, llm_tokens_per_second: float):
+    """Aponta a aplicação para os stand-ins offline (precisa rodar antes de importar a API)."""
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["DB_SQLITE_PATH"] = db_path
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_SCRIPT"] = FAKE_LLM_SCRIPT
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(llm_latency_ms)
+    os.environ["FAKE_LLM_TOKENS_PER_SECOND"] = str(llm_tokens_per_second)
+    os.environ["API_KEY"] = API_KEY
+    # Logs por requisição ficam de fora da medição (só avisos e erros)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Pitches gerados pelo benchmark não entram no log de uso real
+    os.environ.setdefault("PITCH_LOG_FILE", os.path.join(tempfile.gettempdir(), "mariia_bench_pitch_usage.jsonl"))
+
+
+def load_samples(db_path: str, n_customers: int = 50) -> List[dict]:
+    """Clientes ativos com vendedor (SlpCode) e um SKU já comprado, para montar as requisições."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            """
+            SELECT v.Codigo_Cliente, s.SlpCode, MAX(v.SKU)
+            FROM FAL_IA_Dados_Vendas_Televendas v
+            JOIN OSLP s ON s.SlpName = v.Vendedor_Atual
+            WHERE v.Data_Emissao >= date('now', '-90 day')
+            GROUP BY v.Codigo_Cliente, s.SlpCode
+            ORDER BY v.Codigo_Cliente
+            LIMIT ?
+            """,
+            (n_customers,),
+        ).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        raise RuntimeError(f"Base {db_path} sem vendas recentes para amostrar.")
+    return [{"card": card, "vendor": str(slp_code), "sku": sku} for card, slp_code, sku in rows]
+
+
+class LocalServer:
+    """uvicorn numa thread em background, numa porta livre de 127.0.0.1."""
+
+    def __init__(self, app):
+        import uvicorn
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.time() + 30
+        while not self.server.started:
+            if time.time() > deadline or not self.thread.is_alive():
+                raise RuntimeError("Servidor de benchmark não subiu.")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def _build_request(scenario: str, sample: dict, message: str) -> tuple:
+    method, path, body = SCENARIOS[scenario]
+    fill = {"card": sample["card"], "sku": sample["sku"], "message": message}
+    path = path.format(**fill)
+    if body is not None:
+        body = {k: v.format(**fill) if isinstance(v, str) else v for k, v in body.items()}
+    headers = {"x-api-key": API_KEY, "x-user-id": sample["vendor"]}
+    return method, path, body, headers
+
+
+async def run_scenario(client, middleware: QueryCountingMiddleware, scenario: str, samples: List[dict],
+                       requests: int, concurrency: int, warmup: int) -> dict:
+    """Dispara `requests` requisições com `concurrency` workers e agrega as métricas."""
+    sample_cycle = itertools.cycle(samples)
+    message_cycle = itertools.cycle(CHAT_MESSAGES)
+    latencies, ttfbs, queries, errors = [], [], [], 0
+
+    async def one(measure: bool):
+        nonlocal errors
+        method, path, body, headers = _build_request(scenario, next(sample_cycle), next(message_cycle))
+        bench_id = uuid.uuid4().hex
+        headers["x-bench-id"] = bench_id
+        started = time.perf_counter()
+        ttfb = None
+        try:
+            async with client.stream(method, path, json=body, headers=headers) as response:
+                async for _ in response.aiter_raw():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - started
+                status = response.status_code
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - started
+        # O middleware grava a contagem ao fim do handler (pode chegar logo após o último byte)
+        for _ in range(200):
+            if bench_id in middleware.counts:
+                break
+            await asyncio.sleep(0.001)
+        n_queries = middleware.counts.pop(bench_id, None)
+        if not measure:
+            return
+        if status != 200:
+            errors += 1
+            return
+        latencies.append(elapsed)
+        ttfbs.append(ttfb if ttfb is not None else elapsed)
+        if n_queries is not None:
+            queries.append(n_queries)
+
+    for _ in range(warmup):
+        await one(measure=False)
+
+    remaining = itertools.count()
+
+    async def worker():
+        while next(remaining) < requests:
+            await one(measure=True)
+
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_started
+
+    def pct(values, q):
+        return round(float(np.percentile(values, q)) * 1000, 1) if values else None
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": pct(latencies, 50),
+        "p95_ms": pct(latencies, 95),
+        "p99_ms": pct(latencies, 99),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 1) if latencies else None,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+        "ttfb_p50_ms": pct(ttfbs, 50),
+        "ttfb_p95_ms": pct(ttfbs, 95),
+        "queries_per_request": round(float(np.mean(queries)), 2) if queries else None,
+        "queries_max": int(max(queries)) if queries else None,
+    }
+
+
+async def _run_all(base_url: str, middleware, scenarios, samples, requests, concurrency, warmup) -> dict:
+    import httpx
+    results = {}
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        # Aguarda o warm-up do agente (modelo, pool, diretórios e índices em memória)
+        deadline = time.time() + 300
+        while time.time() < deadline:
+            ready = (await client.get("/health/ready", headers={"x-api-key": API_KEY})).json()
+            if ready["ready"] or ready["components"].get("warm_up") in ("ready", "failed"):
+                break
+            await asyncio.sleep(0.2)
+        for scenario in scenarios:
+            results[scenario] = await run_scenario(client, middleware, scenario, samples, requests, concurrency, warmup)
+    return results
+
+
+def run_benchmark(db_path: str, scenarios: List[str], requests: int, concurrency: int, warmup: int,
+                  llm_latency_ms: float, llm_tokens_per_second: float, verbose: bool = False) -> dict:
+    configure_environment(db_path, llm_latency_ms, llm_tokens_per_second)
+    samples = load_samples(db_path)
+
+    # A API loga bastante em stdout/stderr; fora do modo verbose o ruído é descartado
+    sink = contextlib.nullcontext() if verbose else contextlib.ExitStack()
+    with sink as stack:
+        if stack is not None:
+            stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+            stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
+
+        from src.api.app import app
+
+        middleware = QueryCountingMiddleware(app)
+        with LocalServer(middleware) as server:
+            results = asyncio.run(_run_all(server.base_url, middleware, scenarios, samples, requests, concurrency, warmup))
+
+    rows = sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM FAL_IA_Dados_Vendas_Televendas").fetchone()[0]
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "dataset_rows": rows,
+        "requests": requests,
+        "concurrency": concurrency,
+        "llm_latency_ms": llm_latency_ms,
+        "llm_tokens_per_second": llm_tokens_per_second,
+        "scenarios": results,
+    }
+
+
+def format_report(result: dict) -> str:
+    lines = [
+        f"# API benchmark: {result['dataset_rows']:,} linhas, {result['requests']} req/cenário, "
+        f"concorrência {result['concurrency']}, LLM fake {result['llm_latency_ms']}ms "
+        f"@ {result['llm_tokens_per_second'] or '∞'} tok/s (Python {result['python']})",
+        f"# Gerado em {result['generated_at']}",
+        f"{'cenário':<12} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8} {'ttfb50':>8} {'ttfb95':>8} {'queries':>8} {'erros':>6}",
+    ]
+    for name, m in result["scenarios"].items():
+        lines.append(
+            f"{name:<12} {str(m['p50_ms']):>8} {str(m['p95_ms']):>8} {str(m['p99_ms']):>8} "
+            f"{m['throughput_rps']:>8} {str(m['ttfb_p50_ms']):>8} {str(m['ttfb_p95_ms']):>8} "
+            f"{str(m['queries_per_request']):>8} {m['errors']:>6}"
+        )
+    lines.append("# latências em ms; queries = média de queries SQL por requisição")
+    return "\n".join(lines) + "\n"
+
+
+def check(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Lista de regressões: erros, p95 ou queries por requisição acima do baseline (+tolerância)."""
+    problems = []
+    for name, m in result["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if m["errors"]:
+            problems.append(f"{name}: {m['errors']} requisições com erro")
+        if not base:
+            continue
+        if base["p95_ms"] and m["p95_ms"] and m["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {m['p95_ms']}ms excede o baseline {base['p95_ms']}ms (+{tolerance:.0%})")
+        if base["queries_per_request"] is not None and m["queries_per_request"] is not None \
+                and m["queries_per_request"] > base["queries_per_request"] * (1 + tolerance) + 0.5:
+            problems.append(
+                f"{name}: {m['queries_per_request']} queries/req (baseline {base['queries_per_request']})"
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end da API com stand-ins offline")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Base SQLite (gerada se não existir)")
+    parser.add_argument("--rows", type=int, default=200_000, help="Linhas da base gerada")
+    parser.add_argument("--customers", type=int, default=4_000)
+    parser.add_argument("--vendors", type=int, default=20)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Lista separada por vírgula")
+    parser.add_argument("--requests", type=int, default=50, help="Requisições medidas por cenário")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=3, help="Requisições descartadas por cenário")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200)
+    parser.add_argument("--write", action="store_true", help="Atualiza relatório e baseline versionados")
+    parser.add_argument("--check", action="store_true", help="Compara com o baseline e falha se regrediu")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Regressão aceita no p95 (0.5 = +50%%)")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs da API")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    if not os.path.exists(args.db):
+        from src.database.synthetic_data import generate
+        print(f"Gerando base sintética em {args.db}...")
+        generate(path=args.db, rows=args.rows, customers=args.customers, vendors=args.vendors, verbose=False)
+
+    result = run_benchmark(
+        args.db, scenarios, args.requests, args.concurrency, args.warmup,
+        args.llm_latency_ms, args.llm_tokens_per_second, verbose=args.verbose,
+    )
+    report = format_report(result)
+    print(report)
+
+    if args.write:
+        os.makedirs(os.path.dirname(REPORT_FILE), exist_ok=True)
+        os.makedirs(os.path.dirname(BASELINE_FILE), exist_ok=True)
+        with open(REPORT_FILE, "w", encoding="utf-8") as f:
+            f.write(report)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f">>> Relatório salvo em {REPORT_FILE}")
+
+    if args.check:
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = check(result, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSÃO: {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
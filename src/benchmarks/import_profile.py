@@ -0,0 +1,166 @@
+"""
+Profiling de tempo de import (cold start) do backend.
+
+Roda `python -X importtime -c "import <modulo>"` em subprocessos limpos,
+agrega o resultado (mediana de N execuções) e gera um relatório reproduzível
+no estilo `-X importtime`, além de um baseline JSON para detectar regressões.
+
+Uso:
+    python -m src.benchmarks.import_profile                  # imprime relatório
+    python -m src.benchmarks.import_profile --write          # atualiza relatório + baseline
+    python -m src.benchmarks.import_profile --check          # falha se regrediu
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_FILE = os.path.join(BENCH_DIR, "reports", "import_time.txt")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baselines", "import_time.json")
+
+DEFAULT_TARGET = "src.api.app"
+
+# Módulos pesados que NÃO devem ser carregados no import da API
+# (são importados sob demanda nos caminhos que os usam)
+DEFERRED_MODULES = ["vertexai", "google.cloud.aiplatform", "sqlalchemy", "pyodbc", "scipy", "tabulate", "requests"]
+# Módulos pesados acompanhados no relatório
+WATCHED_MODULES = ["pandas", "numpy", "fastapi", "pydantic_settings", "cachetools"] + DEFERRED_MODULES
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def run_importtime(target: str) -> List[dict]:
+    """Executa um import em processo novo e retorna as linhas parseadas do -X importtime."""
+    env = dict(os.environ)
+    # A API valida configurações no import (fail fast); um placeholder basta aqui
+    env.setdefault("API_KEY", "import-profile")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {target}:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                "module": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(indent) - 1) // 2,
+            })
+    return entries
+
+
+def profile(target: str = DEFAULT_TARGET, runs: int = 5) -> dict:
+    """Mediana de `runs` execuções: total, filhos diretos do alvo e módulos observados."""
+    samples = [run_importtime(target) for _ in range(runs)]
+
+    totals = []
+    cumulative: Dict[str, List[int]] = {}
+    children: Dict[str, List[int]] = {}
+    for entries in samples:
+        pending = []
+        for entry in entries:
+            cumulative.setdefault(entry["module"], []).append(entry["cumulative_us"])
+            # O -X importtime imprime os filhos (profundidade +1) antes do pai
+            if entry["depth"] == 1:
+                pending.append(entry)
+            elif entry["depth"] == 0:
+                if entry["module"] == target:
+                    totals.append(entry["cumulative_us"])
+                    for child in pending:
+                        children.setdefault(child["module"], []).append(child["cumulative_us"])
+                pending = []
+
+    median = {name: int(statistics.median(values)) for name, values in cumulative.items()}
+    top_level = {name: int(statistics.median(values)) for name, values in children.items()}
+    return {
+        "target": target,
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "total_us": int(statistics.median(totals)) if totals else 0,
+        "top_level": dict(sorted(top_level.items(), key=lambda kv: kv[1], reverse=True)),
+        "watched": {name: median.get(name) for name in WATCHED_MODULES},
+    }
+
+
+def format_report(result: dict, top: int = 20) -> str:
+    """Relatório texto no formato do -X importtime (microssegundos)."""
+    lines = [
+        f"# Import profile: {result['target']} (mediana de {result['runs']} execuções, Python {result['python']})",
+        f"# Gerado em {result['generated_at']}",
+        f"import time: {'cumulative':>10} | module",
+        f"import time: {result['total_us']:>10} | {result['target']}",
+    ]
+    for name, us in list(result["top_level"].items())[:top]:
+        lines.append(f"import time: {us:>10} |   {name}")
+    lines.append("")
+    lines.append("# Módulos observados (None = não carregado no import)")
+    for name, us in result["watched"].items():
+        marker = " (deferred)" if name in DEFERRED_MODULES else ""
+        lines.append(f"{name:<28} {str(us):>10}{marker}")
+    return "\n".join(lines) + "\n"
+
+
+def check(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Lista de regressões em relação ao baseline."""
+    problems = []
+    for name in DEFERRED_MODULES:
+        if result["watched"].get(name) is not None:
+            problems.append(f"{name} voltou a ser importado no startup de {result['target']}")
+
+    limit = baseline["total_us"] * (1 + tolerance)
+    if result["total_us"] > limit:
+        problems.append(
+            f"Import total {result['total_us'] / 1e6:.3f}s excede o baseline "
+            f"{baseline['total_us'] / 1e6:.3f}s (+{tolerance:.0%})"
+        )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profiling de tempo de import do backend")
+    parser.add_argument("--target", default=DEFAULT_TARGET, help="Módulo a importar")
+    parser.add_argument("--runs", type=int, default=5, help="Número de execuções (mediana)")
+    parser.add_argument("--write", action="store_true", help="Atualiza relatório e baseline versionados")
+    parser.add_argument("--check", action="store_true", help="Compara com o baseline e falha se regrediu")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Regressão aceita no total (0.5 = +50%%)")
+    args = parser.parse_args()
+
+    result = profile(args.target, runs=args.runs)
+    report = format_report(result)
+    print(report)
+
+    if args.write:
+        os.makedirs(os.path.dirname(REPORT_FILE), exist_ok=True)
+        os.makedirs(os.path.dirname(BASELINE_FILE), exist_ok=True)
+        with open(REPORT_FILE, "w", encoding="utf-8") as f:
+            f.write(report)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f">>> Relatório salvo em {REPORT_FILE}")
+
+    if args.check:
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = check(result, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSÃO: {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -12,6 +13,16 @@ class Settings(BaseSettings):
     LOCATION: str = "us-central1"
     MODEL_ID: str = "gemini-1.5-flash-001" # Otimizado para latência e custo
 
+    # Backend de LLM: "vertex" (produção) ou "fake" (stand-in local p/ benchmarks offline)
+    LLM_BACKEND: str = "vertex"
+    FAKE_LLM_SCRIPT: Optional[str] = None # JSON com respostas roteirizadas (ver src/llm/fake_backend.py)
+    FAKE_LLM_LATENCY_MS: float = 0
+    FAKE_LLM_TOKENS_PER_SECOND: float = 0 # 0 = sem limite
+
+    # Cache de análises do InventoryAgent (SKU + contexto + modelo + prompt); vazio desativa
+    SKU_ANALYSIS_CACHE_DB: str = "data/sku_analysis_cache.db"
+    SKU_ANALYSIS_CACHE_MAX_MB: float = 200
+
     # Segurança
     API_KEY: str
     
@@ -19,6 +30,78 @@ class Settings(BaseSettings):
     APP_TITLE: str = "MariIA - Sales Intelligence"
     APP_VERSION: str = "1.0.0"
     
+    # Índice de co-compra (Oportunidades de Mix)
+    COPURCHASE_WINDOW_DAYS: int = 365
+    COPURCHASE_REFRESH_SECONDS: int = 900
+
+    # Cadência de recompra por cliente (ranking do /inactive e alertas de churn)
+    CADENCE_HISTORY_DAYS: int = 730
+    CADENCE_REFRESH_SECONDS: int = 900
+
+    # Gráfico de tendência: "Nome=PALAVRA_CHAVE" separados por vírgula (busca em Categoria_Produto)
+    TREND_CATEGORIES: str = "Arroz=ARROZ,Feijão=FEIJAO,Massas=MASSA"
+
+    # Rollup mensal cliente × categoria × SKU (tendência, médias de fardos)
+    SALES_ROLLUP_HISTORY_MONTHS: int = 24
+    SALES_ROLLUP_REFRESH_SECONDS: int = 900
+
+    # Cadastro de itens (OITM) em memória: NumInSale para conversão em fardos
+    ITEM_MASTER_REFRESH_SECONDS: int = 3600
+
+    # Logging estruturado (ver src/core/structured_logging.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    # Amostragem por nível, ex: '{"DEBUG": 0.05}' (WARNING/ERROR nunca são amostrados)
+    LOG_SAMPLE_RATES: Dict[str, float] = {}
+
+    # Instrumentação de SQL por requisição (Server-Timing + log JSON)
+    SQL_INSTRUMENTATION_LOG: bool = True
+    # Orçamento de queries por endpoint (rota), ex: '{"/inactive": 3, "/portfolio": 1}'
+    SQL_QUERY_BUDGETS: Dict[str, int] = {}
+
+    # Log de uso do Pitch IA (JSON Lines gravado em lote numa thread; ver src/utils/log_sink.py)
+    PITCH_LOG_FILE: str = "logs/pitch_usage.jsonl"
+    PITCH_LOG_FLUSH_SECONDS: float = 1.0
+    PITCH_LOG_FSYNC_SECONDS: float = 5.0
+    PITCH_LOG_MAX_BYTES: int = 50 * 1024 * 1024
+    PITCH_LOG_ROTATE_DAILY: bool = True
+    # Analytics de conversão dos pitches (SQLite alimentado incrementalmente pelo log)
+    PITCH_ANALYTICS_DB: str = "data/pitch_analytics.db"
+    PITCH_ANALYTICS_REFRESH_SECONDS: float = 30.0
+
+    # Tokens de push (Expo) por usuário/dispositivo
+    PUSH_TOKEN_DB: str = "data/push_tokens.db"
+    # Envio em lote (Expo Push API); a URL base pode apontar para um stand-in local
+    EXPO_PUSH_URL: str = "https://exp.host"
+    EXPO_ACCESS_TOKEN: Optional[str] = None
+    PUSH_BATCH_SIZE: int = 100
+    PUSH_CONCURRENCY: int = 4
+    PUSH_RATE_PER_SECOND: float = 500
+    PUSH_TIMEOUT_SECONDS: float = 10.0
+
+    # SAP B1 Service Layer (criação de pedidos)
+    SAP_SL_URL: str = "https://localhost:50000/b1s/v1"
+    SAP_DB: str = ""
+    SAP_USER: str = ""
+    SAP_PASSWORD: str = ""
+    SAP_VERIFY_SSL: bool = True
+    SAP_TIMEOUT_SECONDS: float = 30.0
+    # Timeout da B1SESSION (o Login informa o valor real) e margem para renovar antes
+    SAP_SESSION_TIMEOUT_MINUTES: int = 30
+    SAP_SESSION_REFRESH_MARGIN_SECONDS: int = 60
+    SAP_MAX_CONCURRENCY: int = 4
+    # Operações por requisição OData $batch (pedidos em lote, consultas de estoque)
+    SAP_BATCH_MAX_OPERATIONS: int = 50
+    # Fila de pedidos: aceite imediato, envio em background com retry
+    SAP_ORDER_QUEUE_DB: str = "data/sap_orders.db"
+    SAP_ORDER_WORKERS: int = 4
+    # Pedidos prontos enviados juntos num $batch por worker
+    SAP_ORDER_BATCH_SIZE: int = 20
+    SAP_ORDER_MAX_ATTEMPTS: int = 8
+    # Opcional: campo do pedido (UDF, ex: U_MariIA_Key) que recebe o order_id para deduplicar
+    # reenvios incertos no SAP. O UDF precisa existir em ORDR; vazio desativa a deduplicação
+    SAP_ORDER_KEY_FIELD: str = ""
+
     # Database (Placeholder para futuro)
     # DB_CONNECTION_STRING: str
     
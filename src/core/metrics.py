@@ -0,0 +1,113 @@
+"""
+Métricas da aplicação no formato Prometheus (expostas em /metrics).
+
+Todas as métricas ficam num registry próprio (e não no global do
+prometheus_client) para o endpoint expor só o que é da MariIA. Operações de
+observação são O(1) e thread-safe; o custo por requisição é de microssegundos.
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+# Buckets em segundos: de cache hit (ms) até chamadas de LLM (dezenas de s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SQL_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "mariia_http_request_duration_seconds", "Latência das requisições HTTP por rota",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "mariia_http_requests_in_flight", "Requisições HTTP em andamento", registry=REGISTRY,
+)
+CACHE_REQUESTS = Counter(
+    "mariia_cache_requests_total", "Consultas aos caches em memória (hit ratio = hit / total)",
+    ["cache", "result"], registry=REGISTRY,
+)
+SQL_LATENCY = Histogram(
+    "mariia_sql_query_duration_seconds", "Latência das queries SQL",
+    ["operation"], buckets=SQL_BUCKETS, registry=REGISTRY,
+)
+SQL_ERRORS = Counter(
+    "mariia_sql_query_errors_total", "Queries SQL com erro", ["operation"], registry=REGISTRY,
+)
+LLM_LATENCY = Histogram(
+    "mariia_llm_request_duration_seconds", "Latência das chamadas ao LLM",
+    ["backend", "operation"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+LLM_TOKENS = Counter(
+    "mariia_llm_tokens_total", "Tokens consumidos no LLM", ["backend", "kind"], registry=REGISTRY,
+)
+STREAM_TTFT = Histogram(
+    "mariia_stream_time_to_first_token_seconds", "Tempo até o primeiro token do /chat/stream",
+    buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+PUSH_SENT = Counter(
+    "mariia_push_notifications_total", "Notificações push enviadas", ["result"], registry=REGISTRY,
+)
+SAP_ORDERS = Counter(
+    "mariia_sap_orders_total", "Tentativas de envio de pedidos ao SAP", ["result"], registry=REGISTRY,
+)
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+@contextmanager
+def observe_llm(backend: str, operation: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        LLM_LATENCY.labels(backend=backend, operation=operation).observe(time.perf_counter() - started)
+
+
+def record_llm_usage(backend: str, usage: dict):
+    for kind in ("prompt_tokens", "output_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.labels(backend=backend, kind=kind.replace("_tokens", "")).inc(usage[kind])
+
+
+class DBPoolCollector:
+    """Lê o estado do pool do SQLAlchemy na hora do scrape (engine só existe após a 1ª conexão)."""
+
+    def __init__(self, engine_getter: Callable[[], Optional[object]]):
+        self.engine_getter = engine_getter
+
+    def collect(self):
+        engine = self.engine_getter()
+        pool = getattr(engine, "pool", None)
+        if pool is None:
+            return
+        for name, attr, doc in (
+            ("mariia_db_pool_size", "size", "Tamanho configurado do pool"),
+            ("mariia_db_pool_checked_out", "checkedout", "Conexões em uso"),
+            ("mariia_db_pool_checked_in", "checkedin", "Conexões ociosas no pool"),
+            ("mariia_db_pool_overflow", "overflow", "Conexões além do tamanho do pool"),
+        ):
+            method = getattr(pool, attr, None)
+            if callable(method):
+                yield GaugeMetricFamily(name, doc, value=method())
+
+    def describe(self):
+        return []
+
+
+_pool_collector_registered = False
+
+
+def register_db_pool(engine_getter: Callable[[], Optional[object]]):
+    global _pool_collector_registered
+    if not _pool_collector_registered:
+        REGISTRY.register(DBPoolCollector(engine_getter))
+        _pool_collector_registered = True
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
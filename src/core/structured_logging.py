@@ -0,0 +1,151 @@
+"""
+Logging estruturado (JSON), com níveis, amostragem e escrita fora do caminho da requisição.
+
+Os handlers de logging padrão escrevem no stream de forma síncrona, segurando
+a thread da requisição (ou o event loop) durante o I/O. Aqui os loggers da
+aplicação só enfileiram o LogRecord (QueueHandler, O(1)); a formatação JSON e
+a escrita em stdout acontecem numa thread dedicada (QueueListener).
+
+Uso:
+    from src.core.structured_logging import get_logger
+    logger = get_logger("api")
+    logger.info("cache miss", extra={"fields": {"cache_key": key}})
+
+Mensagens caras (ex: DataFrame.to_markdown) devem ficar atrás de
+`logger.isEnabledFor(logging.DEBUG)` para não custar nada em produção.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+ROOT_LOGGER = "mariia"
+
+# Atributos padrão do LogRecord (o resto vem de `extra` e vira campo do JSON)
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "fields"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por evento: ts, level, logger, msg + campos extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            entry.update(fields)
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Amostragem por nível: {"DEBUG": 0.1} mantém ~10% dos DEBUG. Níveis sem
+    taxa passam sempre (WARNING/ERROR nunca devem ser amostrados).
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rates = {logging.getLevelName(level.upper()): rate for level, rate in (rates or {}).items()}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno)
+        return rate is None or rate >= 1 or random.random() < rate
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Fila cheia descarta o evento (log nunca bloqueia a requisição)."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def prepare(self, record):
+        # A formatação acontece na thread do listener; só congela a mensagem
+        # (os args podem mudar depois) e descarta o traceback já renderizado.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+def setup_logging(
+    level: str = "INFO",
+    json_output: bool = True,
+    sample_rates: Optional[Dict[str, float]] = None,
+    queue_size: int = 10_000,
+    stream=None,
+) -> logging.Logger:
+    """Configura o logger raiz da aplicação (idempotente)."""
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+        root.handlers.clear()
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        if json_output:
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+        handler = _DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        handler.addFilter(SamplingFilter(sample_rates))
+        root.addHandler(handler)
+        root.setLevel(level.upper())
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=False)
+        _listener.start()
+    return root
+
+
+def shutdown_logging():
+    """Esvazia a fila e para a thread de escrita (chamado no shutdown da API / atexit)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger filho de `mariia` (ex: get_logger("api") -> mariia.api)."""
+    root = logging.getLogger(ROOT_LOGGER)
+    if not root.handlers:
+        # Configuração padrão a partir das Settings, se ninguém configurou ainda
+        from src.core.config import get_settings
+        try:
+            settings = get_settings()
+            setup_logging(settings.LOG_LEVEL, settings.LOG_JSON, settings.LOG_SAMPLE_RATES)
+        except Exception:
+            setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -1,14 +1,34 @@
 import os
+import time
 import pandas as pd
-from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import urllib.parse
 
+from src.core.metrics import SQL_ERRORS, SQL_LATENCY
+from src.database.instrumentation import estimate_bytes, record_query
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
+# Backend embarcado (SQLite) para testes de performance offline com dados sintéticos
+# (ver src/database/synthetic_data.py)
+DEFAULT_SQLITE_PATH = "data/synthetic_sales.db"
+
 class DatabaseConnector:
     def __init__(self):
+        self.backend = os.getenv("DB_BACKEND", "mssql").lower()
+        self.engine = None
+
+        if self.backend == "sqlite":
+            self.sqlite_path = os.getenv("DB_SQLITE_PATH", DEFAULT_SQLITE_PATH)
+            if not os.path.exists(self.sqlite_path):
+                raise ValueError(
+                    f"Base SQLite não encontrada em '{self.sqlite_path}'. "
+                    "Gere com: python -m src.database.synthetic_data"
+                )
+            self.connection_string = f"sqlite:///{self.sqlite_path}"
+            return
+
         self.server = os.getenv("DB_SERVER")
         self.database = os.getenv("DB_DATABASE")
         self.username = os.getenv("DB_USER")
@@ -35,14 +55,22 @@ class DatabaseConnector:
 
         # String de conexão SQLAlchemy usando o formato 'mssql+pyodbc:///?odbc_connect=...'
         self.connection_string = f"mssql+pyodbc:///?odbc_connect={params}"
-        
-        self.engine = None
 
     def get_engine(self):
         """Retorna a engine SQLAlchemy (Singleton)."""
         if self.engine is None:
+            # Import tardio: SQLAlchemy (e o driver pyodbc) só carregam na primeira conexão
+            from sqlalchemy import create_engine, event
             try:
-                self.engine = create_engine(self.connection_string)
+                if self.backend == "sqlite":
+                    from src.database.tsql_sqlite import install_tsql_functions
+                    self.engine = create_engine(
+                        self.connection_string,
+                        connect_args={"check_same_thread": False},
+                    )
+                    event.listen(self.engine, "connect", install_tsql_functions)
+                else:
+                    self.engine = create_engine(self.connection_string)
             except Exception as e:
                 print(f"Erro ao criar engine de banco de dados: {e}")
                 raise
@@ -53,29 +81,54 @@ class DatabaseConnector:
         Executa uma query SQL e retorna um DataFrame do Pandas.
         Suporta parâmetros para evitar SQL Injection.
         """
+        from sqlalchemy import text
         engine = self.get_engine()
+        sql = query
+        if self.backend == "sqlite":
+            from src.database.tsql_sqlite import translate_tsql
+            sql = translate_tsql(query)
+        started = time.perf_counter()
         try:
             with engine.connect() as connection:
                 # Se houver parâmetros, usa a sintaxe segura do SQLAlchemy
                 if params:
-                    df = pd.read_sql(text(query), connection, params=params)
+                    df = pd.read_sql(text(sql), connection, params=params)
                 else:
-                    df = pd.read_sql(text(query), connection)
+                    df = pd.read_sql(text(sql), connection)
+            if self.backend == "sqlite":
+                from src.database.tsql_sqlite import parse_date_columns
+                df = parse_date_columns(df)
+            elapsed = time.perf_counter() - started
+            SQL_LATENCY.labels(operation="select").observe(elapsed)
+            record_query(query, elapsed * 1000, len(df), estimate_bytes(df))
             return df
         except Exception as e:
+            SQL_ERRORS.labels(operation="select").inc()
+            record_query(query, (time.perf_counter() - started) * 1000)
             print(f"Erro ao executar query: {e}")
             return pd.DataFrame() 
 
     def execute_query(self, query: str, params: dict = None):
         """Executa uma query sem retorno (INSERT, UPDATE, DELETE)."""
+        from sqlalchemy import text
         engine = self.get_engine()
+        sql = query
+        if self.backend == "sqlite":
+            from src.database.tsql_sqlite import translate_tsql
+            sql = translate_tsql(query)
+        started = time.perf_counter()
         try:
             with engine.connect() as connection:
                 if params:
-                    connection.execute(text(query), params)
+                    result = connection.execute(text(sql), params)
                 else:
-                    connection.execute(text(query))
+                    result = connection.execute(text(sql))
                 connection.commit()
+            elapsed = time.perf_counter() - started
+            SQL_LATENCY.labels(operation="execute").observe(elapsed)
+            record_query(query, elapsed * 1000, max(result.rowcount, 0))
         except Exception as e:
+            SQL_ERRORS.labels(operation="execute").inc()
+            record_query(query, (time.perf_counter() - started) * 1000)
             print(f"Erro ao executar comando SQL: {e}")
             raise
@@ -0,0 +1,161 @@
+"""
+Instrumentação de SQL por requisição.
+
+O DatabaseConnector registra cada query (fingerprint, duração, linhas e bytes
+retornados) no contexto da requisição HTTP corrente. O contexto é um
+ContextVar: propaga para o threadpool do Starlette (endpoints síncronos) e
+para `asyncio.to_thread`, então queries de qualquer camada chamada pelo
+endpoint são atribuídas à requisição certa. Queries fora de uma requisição
+(warm-up, jobs, threads de refresh) não são registradas.
+"""
+import hashlib
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r":\w+")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_COMMENT_RE = re.compile(r"--[^\n]*")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> str:
+    """Normaliza a query (literais, parâmetros e listas IN viram ?) para agrupar execuções iguais."""
+    text = _COMMENT_RE.sub(" ", sql)
+    text = _STRING_RE.sub("?", text)
+    text = _PARAM_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub("(?)", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def fingerprint_id(sql: str) -> str:
+    return hashlib.md5(fingerprint(sql).encode("utf-8")).hexdigest()[:8]
+
+
+def estimate_bytes(df: pd.DataFrame, sample: int = 200) -> int:
+    """
+    Bytes aproximados do resultado. Colunas de texto são estimadas por amostra
+    (memory_usage(deep=True) percorre todas as strings e custaria O(linhas)).
+    """
+    if df is None or df.empty:
+        return 0
+    total = int(df.memory_usage(index=False, deep=False).sum())
+    n_rows = len(df)
+    for column in df.columns:
+        if df[column].dtype == object:
+            values = df[column].iloc[:sample]
+            mean = sum(len(str(v)) for v in values) / max(len(values), 1)
+            total += int(mean * n_rows)
+    return total
+
+
+@dataclass
+class QueryRecord:
+    fingerprint_id: str
+    fingerprint: str
+    duration_ms: float
+    rows: int
+    bytes: int
+
+
+@dataclass
+class RequestStats:
+    """Totais de SQL de uma requisição."""
+    endpoint: str = ""
+    started: float = field(default_factory=time.perf_counter)
+    queries: List[QueryRecord] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, sql: str, duration_ms: float, rows: int, n_bytes: int):
+        record = QueryRecord(fingerprint_id(sql), fingerprint(sql), duration_ms, rows, n_bytes)
+        with self._lock:
+            self.queries.append(record)
+
+    @property
+    def query_count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def db_ms(self) -> float:
+        return sum(q.duration_ms for q in self.queries)
+
+    @property
+    def rows(self) -> int:
+        return sum(q.rows for q in self.queries)
+
+    @property
+    def bytes(self) -> int:
+        return sum(q.bytes for q in self.queries)
+
+    def by_fingerprint(self, top: int = 5) -> List[dict]:
+        """Queries agrupadas por fingerprint, ordenadas por tempo total (evidencia N+1)."""
+        groups: Dict[str, dict] = {}
+        for q in self.queries:
+            group = groups.setdefault(q.fingerprint_id, {
+                "id": q.fingerprint_id, "sql": q.fingerprint[:160], "count": 0, "ms": 0.0, "rows": 0,
+            })
+            group["count"] += 1
+            group["ms"] += q.duration_ms
+            group["rows"] += q.rows
+        ordered = sorted(groups.values(), key=lambda g: g["ms"], reverse=True)[:top]
+        for group in ordered:
+            group["ms"] = round(group["ms"], 1)
+        return ordered
+
+    def server_timing(self, total_ms: Optional[float] = None) -> str:
+        """Valor do header Server-Timing (visível no DevTools do navegador)."""
+        parts = [f'db;dur={self.db_ms:.1f};desc="{self.query_count} queries, {self.rows} rows"']
+        if total_ms is not None:
+            parts.append(f"app;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+    def summary(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "queries": self.query_count,
+            "db_ms": round(self.db_ms, 1),
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "top_queries": self.by_fingerprint(),
+        }
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("sql_request_stats", default=None)
+
+
+def start_request(endpoint: str = "") -> tuple:
+    """
+    Abre o contexto de instrumentação da requisição. Retorna (stats, token).
+    Se um middleware externo (ex.: o benchmark) já abriu o contexto, o mesmo
+    RequestStats é reaproveitado, e os dois leem os mesmos totais.
+    """
+    stats = _current.get()
+    if stats is None:
+        stats = RequestStats(endpoint=endpoint)
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_request() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def record_query(sql: str, duration_ms: float, rows: int = 0, n_bytes: int = 0):
+    """Chamado pelo DatabaseConnector após cada query."""
+    stats = _current.get()
+    if stats is not None:
+        stats.record(sql, duration_ms, rows, n_bytes)
@@ -0,0 +1,390 @@
+"""
+Gerador de dados sintéticos de vendas para o backend SQLite (`DB_BACKEND=sqlite`).
+
+Produz as tabelas consultadas pelo TelesalesAgent com o mesmo nome e colunas
+do ERP (FAL_IA_Dados_Vendas_Televendas, OSLP, OITM, VW_MariIA_ClientDetails),
+em escala configurável (10 mil a 50 milhões de linhas), para testar a
+performance dos endpoints sem acesso ao SQL Server de produção.
+
+O volume é gerado por blocos de clientes com numpy vetorizado, então a memória
+usada é limitada por `chunk_size` e não pelo total de linhas. Cada cliente tem
+uma cadência de recompra própria, um mix de SKUs favoritos e uma parcela deixa
+de comprar no meio do período (base de inativos/churn).
+
+Uso:
+    python -m src.database.synthetic_data --rows 1000000 --vendors 40 --customers 20000
+    DB_BACKEND=sqlite DB_SQLITE_PATH=data/synthetic_sales.db uvicorn src.api.app:app
+"""
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.database.connector import DEFAULT_SQLITE_PATH
+
+SALES_TABLE = "FAL_IA_Dados_Vendas_Televendas"
+
+# (Categoria_Produto, Unidade_Medida, produtos, NumInSale, preço unitário base)
+CATALOG = [
+    ("ARROZ", "FD", ["Arroz Tipo 1 5kg", "Arroz Tipo 1 1kg", "Arroz Parboilizado 5kg", "Arroz Integral 1kg"], [6, 10, 30], 24.0),
+    ("FEIJAO", "FD", ["Feijão Carioca 1kg", "Feijão Preto 1kg", "Feijão Fradinho 500g"], [10, 20], 7.5),
+    ("MASSA", "FD", ["Espaguete 500g", "Parafuso 500g", "Penne 500g", "Ave Maria 500g"], [20, 24], 4.2),
+    ("OLEO", "CX", ["Óleo de Soja 900ml"], [20], 7.9),
+    ("ACUCAR", "FD", ["Açúcar Cristal 5kg", "Açúcar Refinado 1kg"], [6, 10], 19.0),
+    ("CAFE", "CX", ["Café Torrado e Moído 500g", "Café Extra Forte 250g"], [10, 20], 16.5),
+    ("FARELO", "KG", ["Farelo de Arroz", "Farelo de Trigo"], [1], 1.6),
+]
+
+CITIES = [
+    ("Rio de Janeiro", "RJ"), ("Niterói", "RJ"), ("Duque de Caxias", "RJ"), ("Nova Iguaçu", "RJ"),
+    ("São Gonçalo", "RJ"), ("Campos dos Goytacazes", "RJ"), ("Petrópolis", "RJ"), ("Volta Redonda", "RJ"),
+    ("São Paulo", "SP"), ("Campinas", "SP"), ("Belo Horizonte", "MG"), ("Juiz de Fora", "MG"),
+    ("Vitória", "ES"), ("Vila Velha", "ES"),
+]
+
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elaine", "Fábio", "Gabriela", "Hugo", "Isabela", "João",
+               "Karina", "Lucas", "Mariana", "Nelson", "Olívia", "Paulo", "Renata", "Sérgio", "Tatiana", "Vitor"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Santos", "Lima", "Pereira", "Costa", "Almeida", "Ferreira", "Rocha"]
+BUSINESS_TYPES = ["Mercado", "Supermercado", "Mercearia", "Atacarejo", "Padaria", "Restaurante", "Distribuidora"]
+BUSINESS_NAMES = ["Bom Preço", "Dois Irmãos", "São Jorge", "Central", "Da Família", "Estrela", "Nova Era",
+                  "Boa Vista", "Progresso", "Popular", "Real", "União", "Paraíso", "Primavera"]
+
+SALES_COLUMNS = [
+    "Tipo_Documento", "Numero_Documento", "Data_Emissao", "Status_Documento",
+    "Codigo_Cliente", "Nome_Cliente", "Cidade", "Estado", "Vendedor", "Vendedor_Atual",
+    "SKU", "Nome_Produto", "Categoria_Produto", "Unidade_Medida",
+    "Quantidade", "Preco_Unitario_Original", "Valor_Total_Linha", "Valor_Liquido", "Margem_Valor",
+]
+
+SCHEMA = f"""
+CREATE TABLE OSLP (
+    SlpCode INTEGER PRIMARY KEY,
+    SlpName TEXT NOT NULL,
+    Email TEXT
+);
+CREATE TABLE OITM (
+    ItemCode TEXT PRIMARY KEY,
+    ItemName TEXT NOT NULL,
+    NumInSale REAL,
+    SalUnitMsr TEXT
+);
+CREATE TABLE VW_MariIA_ClientDetails (
+    CardCode TEXT PRIMARY KEY,
+    CardName TEXT,
+    Telefone TEXT,
+    Email TEXT,
+    Endereco TEXT,
+    AtivoDesde TEXT
+);
+CREATE TABLE {SALES_TABLE} (
+    Tipo_Documento TEXT,
+    Numero_Documento INTEGER,
+    Data_Emissao TEXT,
+    Status_Documento TEXT,
+    Codigo_Cliente TEXT,
+    Nome_Cliente TEXT,
+    Cidade TEXT,
+    Estado TEXT,
+    Vendedor TEXT,
+    Vendedor_Atual TEXT,
+    SKU TEXT,
+    Nome_Produto TEXT,
+    Categoria_Produto TEXT,
+    Unidade_Medida TEXT,
+    Quantidade REAL,
+    Preco_Unitario_Original REAL,
+    Valor_Total_Linha REAL,
+    Valor_Liquido REAL,
+    Margem_Valor REAL
+);
+"""
+
+# Índices equivalentes aos usados pelos planos de execução do SQL Server
+INDEXES = [
+    f"CREATE INDEX IX_Vendas_Cliente_Data ON {SALES_TABLE} (Codigo_Cliente, Data_Emissao)",
+    f"CREATE INDEX IX_Vendas_Data ON {SALES_TABLE} (Data_Emissao)",
+    f"CREATE INDEX IX_Vendas_Vendedor_Data ON {SALES_TABLE} (Vendedor_Atual, Data_Emissao)",
+    f"CREATE INDEX IX_Vendas_SKU ON {SALES_TABLE} (SKU)",
+    "CREATE INDEX IX_OSLP_Email ON OSLP (Email)",
+]
+
+
+def _build_catalog(n_skus: int, rng: np.random.Generator) -> dict:
+    """Catálogo de SKUs (códigos no formato do ERP: '5', '201', '201.1')."""
+    codes, names, categories, units, num_in_sale, prices = [], [], [], [], [], []
+    for i in range(n_skus):
+        category, unit, products, packs, base_price = CATALOG[i % len(CATALOG)]
+        product = products[(i // len(CATALOG)) % len(products)]
+        variant = i // (len(CATALOG) * len(products))
+        pack = packs[variant % len(packs)]
+        # 1 em cada 10 SKUs é variação (ex: 201.1) de um código existente
+        code = f"{i // 10 + 1}.{i % 10}" if i % 10 and i > 10 else str(i + 1)
+        codes.append(code)
+        names.append(f"{product} C/{pack}" if unit != "KG" else f"{product} Granel")
+        categories.append(category)
+        units.append(unit)
+        num_in_sale.append(pack)
+        prices.append(round(base_price * rng.uniform(0.85, 1.15), 2))
+    # Popularidade tipo Zipf: poucos SKUs concentram a maior parte do volume
+    popularity = 1.0 / np.arange(1, n_skus + 1) ** 0.9
+    popularity = rng.permutation(popularity)
+    return {
+        "code": np.array(codes, dtype=object),
+        "name": np.array(names, dtype=object),
+        "category": np.array(categories, dtype=object),
+        "unit": np.array(units, dtype=object),
+        "num_in_sale": np.array(num_in_sale, dtype=float),
+        "price": np.array(prices, dtype=float),
+        "popularity": popularity / popularity.sum(),
+    }
+
+
+def _build_vendors(n_vendors: int) -> list:
+    vendors = []
+    for code in range(1, n_vendors + 1):
+        first = FIRST_NAMES[(code - 1) % len(FIRST_NAMES)]
+        last = LAST_NAMES[((code - 1) // len(FIRST_NAMES) + code) % len(LAST_NAMES)]
+        name = f"{first} {last}" if code <= len(FIRST_NAMES) else f"{first} {last} {code}"
+        email = f"{first.lower()}.{last.lower()}{code}@mariia.local".replace("á", "a").replace("é", "e").replace("í", "i")
+        vendors.append((code, name, email))
+    return vendors
+
+
+def _build_customers(n_customers: int, n_vendors: int, n_skus: int, catalog: dict, rng: np.random.Generator) -> dict:
+    # Carteiras de tamanhos desiguais entre vendedores
+    vendor_weights = rng.dirichlet(np.full(n_vendors, 2.0))
+    business = rng.integers(0, len(BUSINESS_TYPES), n_customers)
+    brand = rng.integers(0, len(BUSINESS_NAMES), n_customers)
+    city = rng.integers(0, len(CITIES), n_customers)
+    favorites = np.stack([
+        rng.choice(n_skus, size=min(8, n_skus), replace=False, p=catalog["popularity"])
+        for _ in range(n_customers)
+    ])
+    return {
+        "code": np.array([f"C{i:06d}" for i in range(1, n_customers + 1)], dtype=object),
+        "name": np.array([f"{BUSINESS_TYPES[b]} {BUSINESS_NAMES[n]} {i + 1}" for i, (b, n) in enumerate(zip(business, brand))], dtype=object),
+        "city": np.array([CITIES[c][0] for c in city], dtype=object),
+        "state": np.array([CITIES[c][1] for c in city], dtype=object),
+        "vendor": rng.choice(n_vendors, size=n_customers, p=vendor_weights),
+        # Cadência de recompra em dias (mediana ~3 semanas) e porte (fardos por linha)
+        "gap": np.clip(rng.lognormal(np.log(21), 0.6, n_customers), 3, 120),
+        "size": np.clip(rng.lognormal(np.log(4), 0.7, n_customers), 1, 80),
+        # ~15% dos clientes param de comprar em algum ponto do período
+        "churn": rng.random(n_customers) < 0.15,
+        "churn_at": rng.uniform(0.3, 0.95, n_customers),
+        "favorites": favorites,
+    }
+
+
+def _generate_chunk(idx: np.ndarray, customers: dict, catalog: dict, vendors: list, days: int,
+                    gap_scale: float, mean_lines: float, end_date: date, first_doc: int,
+                    rng: np.random.Generator) -> tuple:
+    """Gera as linhas de venda de um bloco de clientes (todas as operações são vetorizadas)."""
+    gap = customers["gap"][idx] * gap_scale
+    span = np.where(customers["churn"][idx], customers["churn_at"][idx] * days, days)
+
+    # Datas dos pedidos: início aleatório + intervalos com ruído em torno da cadência
+    n_orders = np.ceil(span / gap * 1.3).astype(int) + 1
+    owner = np.repeat(np.arange(len(idx)), n_orders)
+    intervals = gap[owner] * rng.gamma(4.0, 0.25, owner.size)
+    starts = np.concatenate(([0], np.cumsum(n_orders)[:-1]))
+    first = np.zeros(owner.size, dtype=bool)
+    first[starts] = True
+    intervals[first] = rng.uniform(0, gap, len(idx))
+    cumulative = np.cumsum(intervals)
+    offset = np.repeat(cumulative[starts] - intervals[starts], n_orders)
+    day = cumulative - offset
+    keep = day <= span[owner]
+    owner, day = owner[keep], np.floor(day[keep]).astype(int)
+
+    n_docs = owner.size
+    doc_numbers = first_doc + np.arange(n_docs)
+    doc_dates = np.datetime64(end_date - timedelta(days=days)) + day.astype("timedelta64[D]")
+
+    # Linhas por documento e SKU (75% do mix favorito do cliente, resto pela popularidade geral)
+    n_lines = 1 + rng.poisson(max(mean_lines - 1, 0), n_docs)
+    line_doc = np.repeat(np.arange(n_docs), n_lines)
+    line_owner = owner[line_doc]
+    favorites = customers["favorites"][idx]
+    from_favorites = rng.random(line_doc.size) < 0.75
+    sku = np.where(
+        from_favorites,
+        favorites[line_owner, rng.integers(0, favorites.shape[1], line_doc.size)],
+        rng.choice(len(catalog["code"]), size=line_doc.size, p=catalog["popularity"]),
+    )
+
+    unit = catalog["unit"][sku]
+    packs = np.ceil(customers["size"][idx][line_owner] * rng.lognormal(0, 0.5, line_doc.size))
+    # Quantidade em unidades de venda; Farelo (KG) em sacas de 25kg
+    quantity = np.where(unit == "KG", packs * 25, packs * catalog["num_in_sale"][sku])
+    price = catalog["price"][sku]
+    gross = np.round(quantity * price, 2)
+    net = np.round(gross * (1 - rng.uniform(0, 0.08, line_doc.size)), 2)
+    margin = np.round(net * rng.uniform(0.08, 0.25, line_doc.size), 2)
+
+    # Documentos dos últimos 3 dias ainda estão como Pedido em aberto
+    recent = day[line_doc] >= days - 3
+    customer_idx = idx[line_owner]
+    vendor_names = np.array([v[1] for v in vendors], dtype=object)[customers["vendor"][customer_idx]]
+    dates = np.datetime_as_string(doc_dates[line_doc], unit="D").astype(object) + " 00:00:00"
+
+    rows = zip(
+        np.where(recent, "Pedido", "Fatura").tolist(),
+        doc_numbers[line_doc].tolist(),
+        dates.tolist(),
+        np.where(recent, "Aberto", "Faturado").tolist(),
+        customers["code"][customer_idx].tolist(),
+        customers["name"][customer_idx].tolist(),
+        customers["city"][customer_idx].tolist(),
+        customers["state"][customer_idx].tolist(),
+        vendor_names.tolist(),
+        vendor_names.tolist(),
+        catalog["code"][sku].tolist(),
+        catalog["name"][sku].tolist(),
+        catalog["category"][sku].tolist(),
+        unit.tolist(),
+        quantity.tolist(),
+        price.tolist(),
+        gross.tolist(),
+        net.tolist(),
+        margin.tolist(),
+    )
+    return rows, line_doc.size, n_docs
+
+
+def generate(
+    path: str = DEFAULT_SQLITE_PATH,
+    rows: int = 100_000,
+    vendors: int = 20,
+    customers: int = 2_000,
+    skus: int = 300,
+    days: int = 730,
+    mean_lines: float = 4.0,
+    seed: int = 42,
+    chunk_size: int = 250_000,
+    end_date: date = None,
+    verbose: bool = True,
+) -> dict:
+    """
+    Gera a base SQLite em `path` (sobrescreve se existir) e retorna um resumo.
+
+    `rows` é a meta aproximada de linhas de venda; a quantidade real varia
+    alguns pontos percentuais por causa da aleatoriedade das cadências.
+    """
+    end_date = end_date or date.today()
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+
+    catalog = _build_catalog(skus, rng)
+    vendor_rows = _build_vendors(vendors)
+    customer_data = _build_customers(customers, vendors, skus, catalog, rng)
+
+    # Ajusta a cadência para que o total de linhas fique próximo da meta
+    active_days = np.where(customer_data["churn"], customer_data["churn_at"] * days, days)
+    expected_lines = (active_days / customer_data["gap"]).sum() * mean_lines
+    gap_scale = expected_lines / max(rows, 1)
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    try:
+        # Carga em massa: sem journal/fsync (a base é descartável)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+
+        conn.executemany("INSERT INTO OSLP VALUES (?, ?, ?)", vendor_rows)
+        conn.executemany(
+            "INSERT INTO OITM VALUES (?, ?, ?, ?)",
+            zip(catalog["code"].tolist(), catalog["name"].tolist(), catalog["num_in_sale"].tolist(), catalog["unit"].tolist()),
+        )
+        since = [(end_date - timedelta(days=int(d))).isoformat() + " 00:00:00" for d in rng.integers(days, days * 4, customers)]
+        conn.executemany(
+            "INSERT INTO VW_MariIA_ClientDetails VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (code, name, f"(21) 9{rng.integers(1000, 9999)}-{rng.integers(1000, 9999)}",
+                 f"compras{i + 1}@cliente.local", f"Rua {LAST_NAMES[i % len(LAST_NAMES)]}, {i % 900 + 10} - {city}/{state}", since[i])
+                for i, (code, name, city, state) in enumerate(zip(
+                    customer_data["code"], customer_data["name"], customer_data["city"], customer_data["state"]))
+            ),
+        )
+
+        placeholders = ", ".join("?" for _ in SALES_COLUMNS)
+        insert_sales = f"INSERT INTO {SALES_TABLE} ({', '.join(SALES_COLUMNS)}) VALUES ({placeholders})"
+        customers_per_chunk = max(1, int(customers * chunk_size / max(rows, 1)))
+        total_rows, total_docs = 0, 0
+        for chunk_number, chunk_start in enumerate(range(0, customers, customers_per_chunk)):
+            idx = np.arange(chunk_start, min(chunk_start + customers_per_chunk, customers))
+            chunk_rng = np.random.default_rng([seed, chunk_number])
+            chunk_rows, n_rows, n_docs = _generate_chunk(
+                idx, customer_data, catalog, vendor_rows, days, gap_scale, mean_lines,
+                end_date, 100_000 + total_docs, chunk_rng,
+            )
+            conn.executemany(insert_sales, chunk_rows)
+            conn.commit()
+            total_rows += n_rows
+            total_docs += n_docs
+            if verbose:
+                print(f"  ... {total_rows:,} linhas ({min(chunk_start + customers_per_chunk, customers):,}/{customers:,} clientes)")
+
+        if verbose:
+            print("  ... criando índices")
+        for statement in INDEXES:
+            conn.execute(statement)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "path": path,
+        "rows": total_rows,
+        "documents": total_docs,
+        "vendors": vendors,
+        "customers": customers,
+        "skus": skus,
+        "days": days,
+        "end_date": end_date.isoformat(),
+        "seconds": round(time.perf_counter() - started, 2),
+        "size_mb": round(os.path.getsize(path) / 1e6, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera base SQLite sintética com o schema de vendas do ERP.")
+    parser.add_argument("--path", default=DEFAULT_SQLITE_PATH)
+    parser.add_argument("--rows", type=int, default=100_000, help="Meta de linhas de venda (10k a 50M)")
+    parser.add_argument("--vendors", type=int, default=20)
+    parser.add_argument("--customers", type=int, default=2_000)
+    parser.add_argument("--skus", type=int, default=300)
+    parser.add_argument("--days", type=int, default=730, help="Período de histórico (dias até hoje)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=250_000)
+    parser.add_argument("--end-date", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(), default=None)
+    args = parser.parse_args(argv)
+
+    print(f"Gerando base sintética em {args.path} (~{args.rows:,} linhas)...")
+    summary = generate(
+        path=args.path, rows=args.rows, vendors=args.vendors, customers=args.customers,
+        skus=args.skus, days=args.days, seed=args.seed, chunk_size=args.chunk_size,
+        end_date=args.end_date,
+    )
+    print(
+        f"OK: {summary['rows']:,} linhas, {summary['documents']:,} documentos, "
+        f"{summary['customers']:,} clientes, {summary['vendors']} vendedores "
+        f"em {summary['seconds']}s ({summary['size_mb']} MB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Camada de compatibilidade T-SQL -> SQLite para o backend embarcado
+(`DB_BACKEND=sqlite`), usado em testes de performance offline.
+
+Não é um tradutor completo de T-SQL: cobre o dialeto usado pelas queries do
+projeto (TOP, DATEADD/DATEDIFF/GETDATE, FORMAT, ISNULL, COLLATE, YEAR/MONTH).
+"""
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+
+# Colunas de data que voltam como texto do SQLite e são convertidas para datetime
+DATE_COLUMNS = {"Data_Emissao", "Ultima_Compra", "SortDate", "AtivoDesde", "Data_Entrega_Prometida"}
+
+_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_TOP_RE = re.compile(r"\bSELECT\s+(DISTINCT\s+)?TOP\s*(\(\s*[^()]+?\s*\)|\d+)\s+", re.IGNORECASE)
+_DATEPART_FUNC_RE = re.compile(r"\b(DATEADD|DATEDIFF)\s*\(\s*([A-Za-z]+)\s*,", re.IGNORECASE)
+_ISNULL_RE = re.compile(r"\bISNULL\s*\(", re.IGNORECASE)
+_COLLATE_RE = re.compile(r"\s+COLLATE\s+\w+", re.IGNORECASE)
+_GETDATE_RE = re.compile(r"\bGETDATE\s*\(\s*\)", re.IGNORECASE)
+
+
+def _closing_position(sql: str, start: int) -> int:
+    """Posição onde termina o SELECT iniciado em `start` (parêntese que fecha o escopo ou fim)."""
+    depth = 0
+    in_string = False
+    i = start
+    while i < len(sql):
+        char = sql[i]
+        if in_string:
+            if char == "'":
+                in_string = False
+        elif char == "'":
+            in_string = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            if depth == 0:
+                return i
+            depth -= 1
+        i += 1
+    return len(sql.rstrip().rstrip(";").rstrip())
+
+
+def translate_tsql(sql: str) -> str:
+    """
+    Reescreve uma query T-SQL do projeto para o dialeto do SQLite.
+
+    GETDATE() vira um literal (constante de execução, como no SQL Server): assim
+    `Data_Emissao >= DATEADD(day, -30, GETDATE())` é avaliado uma única vez e o
+    índice de Data_Emissao pode ser usado.
+    """
+    now = datetime.now().strftime(_DATETIME_FORMAT)
+    return _GETDATE_RE.sub(f"'{now}'", _translate_cached(sql))
+
+
+@lru_cache(maxsize=512)
+def _translate_cached(sql: str) -> str:
+    sql = _COLLATE_RE.sub("", sql)
+    sql = _ISNULL_RE.sub("IFNULL(", sql)
+    sql = _DATEPART_FUNC_RE.sub(lambda m: f"{m.group(1).upper()}('{m.group(2).lower()}',", sql)
+
+    # SELECT TOP n ... -> SELECT ... LIMIT n (no fim do escopo do próprio SELECT)
+    while True:
+        match = _TOP_RE.search(sql)
+        if not match:
+            break
+        limit = match.group(2).strip().strip("()").strip()
+        head = sql[:match.start()] + "SELECT " + (match.group(1) or "")
+        rest = sql[match.end():]
+        end = _closing_position(rest, 0)
+        sql = head + rest[:end] + f"\nLIMIT {limit}" + ("\n" if end < len(rest) else "") + rest[end:]
+    return sql
+
+
+# --- Funções T-SQL registradas na conexão SQLite ---
+
+def _parse(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = str(value).strip().replace("T", " ")
+    for fmt in (_DATETIME_FORMAT, "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return pd.Timestamp(text).to_pydatetime()
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    # Mesmo comportamento do SQL Server: dia ajustado ao último dia do mês
+    last_day = (date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)).day
+    return value.replace(year=year, month=month, day=min(value.day, last_day))
+
+
+def _dateadd(part, number, value):
+    value = _parse(value)
+    if value is None or number is None:
+        return None
+    number = int(number)
+    if part in ("day", "dd", "d"):
+        result = value + timedelta(days=number)
+    elif part in ("week", "wk", "ww"):
+        result = value + timedelta(weeks=number)
+    elif part in ("month", "mm", "m"):
+        result = _add_months(value, number)
+    elif part in ("quarter", "qq", "q"):
+        result = _add_months(value, 3 * number)
+    elif part in ("year", "yy", "yyyy"):
+        result = _add_months(value, 12 * number)
+    elif part in ("hour", "hh"):
+        result = value + timedelta(hours=number)
+    else:
+        raise ValueError(f"DATEADD: parte de data não suportada: {part}")
+    return result.strftime(_DATETIME_FORMAT)
+
+
+def _datediff(part, start, end):
+    start, end = _parse(start), _parse(end)
+    if start is None or end is None:
+        return None
+    # SQL Server conta fronteiras cruzadas (não intervalos completos)
+    if part in ("day", "dd", "d"):
+        return (end.date() - start.date()).days
+    if part in ("week", "wk", "ww"):
+        return ((end.date() - start.date()).days + start.weekday() - end.weekday()) // 7
+    if part in ("month", "mm", "m"):
+        return (end.year - start.year) * 12 + end.month - start.month
+    if part in ("year", "yy", "yyyy"):
+        return end.year - start.year
+    raise ValueError(f"DATEDIFF: parte de data não suportada: {part}")
+
+
+_FORMAT_TOKENS = [("yyyy", "%Y"), ("yy", "%y"), ("MM", "%m"), ("dd", "%d"), ("HH", "%H"), ("mm", "%M")]
+
+
+def _format(value, pattern):
+    value = _parse(value)
+    if value is None:
+        return None
+    for token, directive in _FORMAT_TOKENS:
+        pattern = pattern.replace(token, directive)
+    return value.strftime(pattern)
+
+
+def _part(attribute):
+    def extract(value):
+        value = _parse(value)
+        return getattr(value, attribute) if value is not None else None
+    return extract
+
+
+def install_tsql_functions(dbapi_connection, connection_record=None):
+    """Listener de `connect` do SQLAlchemy: registra as funções T-SQL na conexão."""
+    dbapi_connection.create_function("GETDATE", 0, lambda: datetime.now().strftime(_DATETIME_FORMAT))
+    # deterministic=True permite ao SQLite avaliar expressões constantes uma vez só
+    dbapi_connection.create_function("DATEADD", 3, _dateadd, deterministic=True)
+    dbapi_connection.create_function("DATEDIFF", 3, _datediff, deterministic=True)
+    dbapi_connection.create_function("FORMAT", 2, _format, deterministic=True)
+    dbapi_connection.create_function("YEAR", 1, _part("year"), deterministic=True)
+    dbapi_connection.create_function("MONTH", 1, _part("month"), deterministic=True)
+    dbapi_connection.create_function("DAY", 1, _part("day"), deterministic=True)
+
+
+def parse_date_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte as colunas de data (texto no SQLite) para datetime, como o driver do SQL Server faz."""
+    for column in DATE_COLUMNS.intersection(df.columns):
+        if not is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    return df
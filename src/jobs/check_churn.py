@@ -2,76 +2,174 @@ import sys
 import os
 import argparse
 from datetime import datetime
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
 
 # Adiciona diretório raiz
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
+from src.core.structured_logging import get_logger
 from src.database.connector import DatabaseConnector
-from src.services.notification_service import send_notification_to_user
+from src.services.notification_service import process_push_receipts, send_push_messages
+from src.services.cadence_model import CustomerCadenceModel
+from src.services.push_dispatcher import PushMessage
+from src.services.token_store import get_token_store
+
+logger = get_logger("churn")
 
 # Configuração
-CHURN_THRESHOLD_DAYS = 30
-VENDOR_DEFAULT_USER_ID = "V.vp - Renata Rodrigues" # Temporário: Em prod, buscaria o ID do vendedor na tabela
+CHURN_THRESHOLDS_DAYS = (30, 60, 90)
+# Alerta de ciclo: cliente recorrente que passou de N× o intervalo mediano entre compras
+CADENCE_FACTOR = 1.5
+HISTORY_DAYS = 365
+DIGEST_MAX_CUSTOMERS = 3
 
-def check_churn_risk():
+def find_churn_alerts(
+    df: pd.DataFrame,
+    today: pd.Timestamp,
+    thresholds: Sequence[int] = CHURN_THRESHOLDS_DAYS,
+    cadence_factor: float = CADENCE_FACTOR,
+    lookback_days: int = 1,
+) -> pd.DataFrame:
     """
-    Verifica clientes que atingiram exatamente 30 dias sem compras hoje
-    e envia notificação para o vendedor responsável.
+    Avalia todos os clientes da tabela de cadência numa passada vetorizada. Um
+    cliente gera alerta no dia em que cruza um limiar fixo (30/60/90 dias) ou
+    o seu próprio ciclo (intervalo mediano entre compras × cadence_factor).
+    `lookback_days` cobre execuções perdidas (o cruzamento pode ter ocorrido
+    nos últimos N dias).
     """
-    print(f"[{datetime.now()}] Iniciando verificação de Churn...")
-    
-    db = DatabaseConnector()
-    
-    # Query: Busca clientes cuja última compra foi há EXATAMENTE 30 dias
-    # Isso evita spam diário. O alerta é único no dia crítico.
-    query = """
-    SELECT 
-        Codigo_Cliente,
-        MAX(Nome_Cliente) as Nome_Cliente,
-        MAX(Vendedor_Atual) as Vendedor,
-        MAX(Data_Emissao) as Ultima_Compra,
-        DATEDIFF(day, MAX(Data_Emissao), GETDATE()) as Dias_Inativo
-    FROM FAL_IA_Dados_Vendas_Televendas
-    GROUP BY Codigo_Cliente
-    HAVING DATEDIFF(day, MAX(Data_Emissao), GETDATE()) = :days
+    if df.empty:
+        return df.assign(Dias_Inativo=[], Motivo=[])
+
+    last = pd.to_datetime(df["Ultima_Compra"]).dt.normalize()
+    days_inactive = (today.normalize() - last).dt.days.to_numpy()
+    interval = df["Intervalo_Mediano"].to_numpy(dtype=float)  # NaN = cliente sem recorrência
+    cadence_day = np.ceil(interval * cadence_factor)
+
+    # Cruzou o limiar hoje (ou nos dias não cobertos): limiar em (dias - lookback, dias]
+    window_start = days_inactive - lookback_days
+    limits = np.asarray(sorted(thresholds), dtype=float)
+    crossed = (limits[None, :] > window_start[:, None]) & (limits[None, :] <= days_inactive[:, None])
+    crossed_threshold = np.where(crossed, limits[None, :], 0).max(axis=1)
+    # Ciclo só alerta antes do primeiro limiar fixo (depois disso os limiares cobrem)
+    crossed_cadence = (cadence_day > window_start) & (cadence_day <= days_inactive) & (cadence_day < limits.min())
+
+    mask = (crossed_threshold > 0) | crossed_cadence
+    alerts = df.loc[mask].copy()
+    alerts["Dias_Inativo"] = days_inactive[mask]
+    threshold_text = np.char.add(crossed_threshold[mask].astype(int).astype(str), " dias sem compras")
+    cadence_text = np.char.add(
+        np.char.add("fora do ciclo (compra a cada ~", np.nan_to_num(np.round(interval[mask])).astype(int).astype(str)),
+        " dias)",
+    )
+    alerts["Motivo"] = np.where(crossed_threshold[mask] > 0, threshold_text, cadence_text)
+    return alerts.sort_values(["Vendedor", "Valor_Total_Historico"], ascending=[True, False])
+
+def load_vendor_users(db: DatabaseConnector) -> Dict[str, List[str]]:
+    """
+    Vendedor_Atual (SlpName) -> ids de usuário possíveis no app. O app registra
+    o token com o nome do vendedor ou com o SlpCode (x-user-id), então ambos valem.
+    """
+    df = db.get_dataframe("SELECT SlpCode, SlpName FROM OSLP")
+    users: Dict[str, List[str]] = {}
+    for code, name in zip(df.get("SlpCode", []), df.get("SlpName", [])):
+        if name:
+            users[name] = [name, str(int(code))]
+    return users
+
+def build_vendor_digests(alerts: pd.DataFrame, vendor_users: Dict[str, List[str]]) -> Dict[str, List[PushMessage]]:
+    """Uma notificação-resumo por vendedor, enviada a todos os seus dispositivos."""
+    store = get_token_store()
+    digests: Dict[str, List[PushMessage]] = {}
+    for vendor, group in alerts.groupby("Vendedor", sort=False):
+        tokens = []
+        for user_tokens in store.tokens_for_many(vendor_users.get(vendor, [vendor])).values():
+            tokens.extend(user_tokens)
+        if not tokens:
+            continue
+
+        top = group.head(DIGEST_MAX_CUSTOMERS)
+        lines = [f"{row.Nome_Cliente} ({row.Codigo_Cliente}): {row.Motivo}" for row in top.itertuples()]
+        extra = len(group) - len(top)
+        if extra > 0:
+            lines.append(f"+ {extra} outros clientes")
+        title = f"⚠️ {len(group)} cliente(s) em risco de churn"
+        body = "\n".join(lines)
+        data = {"type": "churn_digest", "cardCodes": group["Codigo_Cliente"].head(50).tolist()}
+        if len(group) == 1:
+            data["cardCode"] = group["Codigo_Cliente"].iloc[0]
+        digests[vendor] = [PushMessage(token, title, body, data) for token in dict.fromkeys(tokens)]
+    return digests
+
+def check_churn_risk(
+    thresholds: Sequence[int] = CHURN_THRESHOLDS_DAYS,
+    cadence_factor: float = CADENCE_FACTOR,
+    lookback_days: int = 1,
+    dry_run: bool = False,
+):
+    """
+    Identifica clientes que cruzaram hoje um limiar de inatividade (ou o próprio
+    ciclo de recompra) e envia um resumo por vendedor responsável.
     """
-    
+    started = datetime.now()
+    logger.info("Iniciando verificação de Churn", extra={"fields": {"thresholds": list(thresholds)}})
+
+    # Recibos dos envios da execução anterior (remove tokens de aparelhos desinstalados)
+    if not dry_run:
+        try:
+            process_push_receipts()
+        except Exception as e:
+            logger.error("Erro ao conferir recibos de push: %s", e)
+
+    db = DatabaseConnector()
+
     try:
-        df = db.get_dataframe(query, params={"days": CHURN_THRESHOLD_DAYS})
-        
-        if df.empty:
-            print(f"Nenhum cliente atingiu {CHURN_THRESHOLD_DAYS} dias de inatividade hoje.")
+        # Uma leitura dos pedidos; intervalo mediano por cliente calculado em memória
+        model = CustomerCadenceModel(db, history_days=max(HISTORY_DAYS, max(thresholds) + lookback_days))
+        model.build()
+        activity = model.snapshot().reset_index()
+        alerts = find_churn_alerts(activity, pd.Timestamp.now(), thresholds, cadence_factor, lookback_days)
+
+        if alerts.empty:
+            logger.info("Nenhum cliente cruzou limiar de inatividade hoje.", extra={"fields": {"customers": len(activity)}})
             return
 
-        print(f"Encontrados {len(df)} clientes em risco crítico.")
-        
-        count_sent = 0
-        for _, row in df.iterrows():
-            customer_name = row['Nome_Cliente']
-            customer_code = row['Codigo_Cliente']
-            vendor_name = row['Vendedor']
-            
-            # TODO: Mapear 'vendor_name' do SQL para 'user_id' do App.
-            # Por enquanto, usamos o hardcoded se o vendedor for a Renata, ou logamos aviso.
-            target_user_id = VENDOR_DEFAULT_USER_ID 
-            
-            # Se tivermos autenticação real futura, faríamos a busca do user_id correto.
-            # if vendor_name != target_user_id: continue 
-            
-            title = "⚠️ Risco de Churn Identificado"
-            body = f"O cliente {customer_name} ({customer_code}) completou 30 dias sem compras. Ligue agora!"
-            
-            # Envia notificacao
-            if send_notification_to_user(target_user_id, title, body, data={"cardCode": customer_code}):
-                print(f"Notificação enviada para {target_user_id} sobre {customer_code}")
-                count_sent += 1
-            else:
-                print(f"Falha ao notificar {target_user_id} (Token não encontrado?)")
-                
-        print(f"Job finalizado. {count_sent} notificações enviadas.")
-        
+        digests = build_vendor_digests(alerts, load_vendor_users(db))
+        vendors = alerts["Vendedor"].nunique()
+        messages = [message for vendor_messages in digests.values() for message in vendor_messages]
+        if dry_run:
+            for vendor, vendor_messages in digests.items():
+                print(f"[dry-run] {vendor} ({len(vendor_messages)} dispositivo(s)): {vendor_messages[0].title}")
+            sent = 0
+        else:
+            sent = send_push_messages(messages).sent if messages else 0
+
+        logger.info(
+            "Job de churn finalizado",
+            extra={"fields": {
+                "customers": len(activity), "alerts": len(alerts), "vendors": vendors,
+                "vendors_without_token": vendors - len(digests), "notifications_sent": sent,
+                "elapsed_ms": round((datetime.now() - started).total_seconds() * 1000, 1),
+            }},
+        )
     except Exception as e:
-        print(f"Erro ao executar job: {e}")
+        logger.exception("Erro ao executar job de churn")
 
 if __name__ == "__main__":
-    check_churn_risk()
+    parser = argparse.ArgumentParser(description="Alertas de risco de churn por vendedor.")
+    parser.add_argument("--thresholds", default=",".join(map(str, CHURN_THRESHOLDS_DAYS)),
+                        help="Limiares de inatividade em dias (ex: 30,60,90)")
+    parser.add_argument("--cadence-factor", type=float, default=CADENCE_FACTOR)
+    parser.add_argument("--lookback-days", type=int, default=1,
+                        help="Dias cobertos pela execução (ex: 3 após um fim de semana sem job)")
+    parser.add_argument("--dry-run", action="store_true", help="Mostra os resumos sem enviar push")
+    args = parser.parse_args()
+
+    check_churn_risk(
+        thresholds=[int(t) for t in args.thresholds.split(",") if t.strip()],
+        cadence_factor=args.cadence_factor,
+        lookback_days=args.lookback_days,
+        dry_run=args.dry_run,
+    )
@@ -0,0 +1,172 @@
+"""
+Interface de backend de LLM usada pelos agentes.
+
+Os agentes falam apenas com estes tipos neutros (LLMBackend, ChatSession,
+LLMChunk, LLMResponse). A implementação Vertex AI fica em `vertex_backend.py`
+e um stand-in local determinístico (para benchmarks offline) em
+`fake_backend.py`.
+"""
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional
+
+from src.core.metrics import LLM_LATENCY, observe_llm, record_llm_usage
+
+VERTEX = "vertex"
+FAKE = "fake"
+
+
+@dataclass
+class FunctionCall:
+    name: str
+    args: dict = field(default_factory=dict)
+
+
+@dataclass
+class LLMChunk:
+    """Pedaço de uma resposta em stream: texto ou uma chamada de função."""
+    text: str = ""
+    function_call: Optional[FunctionCall] = None
+
+
+@dataclass
+class LLMResponse:
+    text: str = ""
+    finish_reason: Optional[str] = None
+    # prompt_tokens / output_tokens (quando o backend informa)
+    usage: dict = field(default_factory=dict)
+
+
+class ChatSession(ABC):
+    """Sessão de chat com histórico mantido pelo backend."""
+
+    @abstractmethod
+    def send_message_stream(self, message: str) -> AsyncIterator[LLMChunk]:
+        """Envia a mensagem do usuário e itera os chunks da resposta."""
+
+    @abstractmethod
+    async def send_function_response(self, name: str, response: dict) -> LLMResponse:
+        """Devolve o resultado de uma tool ao modelo e retorna a resposta completa."""
+
+
+class LLMBackend(ABC):
+    model_id: str = ""
+
+    @abstractmethod
+    def start_chat(self, history: Optional[List[dict]] = None) -> ChatSession:
+        """Inicia um chat. `history`: lista de {"role": "user"|"model", "text": "..."}."""
+
+    @abstractmethod
+    async def generate_content_async(self, prompt: str, generation_config: Optional[dict] = None) -> LLMResponse:
+        """Geração única (sem chat)."""
+
+    @abstractmethod
+    def generate_content(self, prompt: str, generation_config: Optional[dict] = None) -> LLMResponse:
+        """Versão síncrona de `generate_content_async`."""
+
+
+class MeteredChatSession(ChatSession):
+    """Registra latência e tokens das chamadas de chat (ver src/core/metrics.py)."""
+
+    def __init__(self, inner: ChatSession, backend_name: str):
+        self._inner = inner
+        self._backend_name = backend_name
+
+    async def send_message_stream(self, message: str) -> AsyncIterator[LLMChunk]:
+        # Mede até o primeiro chunk: o consumidor pode interromper o stream (function call)
+        started = time.perf_counter()
+        first = True
+        async for chunk in self._inner.send_message_stream(message):
+            if first:
+                LLM_LATENCY.labels(backend=self._backend_name, operation="chat_first_chunk").observe(
+                    time.perf_counter() - started
+                )
+                first = False
+            yield chunk
+
+    async def send_function_response(self, name: str, response: dict) -> LLMResponse:
+        with observe_llm(self._backend_name, "function_response"):
+            result = await self._inner.send_function_response(name, response)
+        record_llm_usage(self._backend_name, result.usage)
+        return result
+
+
+class MeteredLLMBackend(LLMBackend):
+    """Decorator de métricas sobre qualquer backend (latência por operação e tokens)."""
+
+    def __init__(self, inner: LLMBackend, backend_name: str):
+        self._inner = inner
+        self._backend_name = backend_name
+        self.model_id = inner.model_id
+
+    @property
+    def inner(self) -> LLMBackend:
+        return self._inner
+
+    def start_chat(self, history: Optional[List[dict]] = None) -> ChatSession:
+        return MeteredChatSession(self._inner.start_chat(history), self._backend_name)
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[dict] = None) -> LLMResponse:
+        with observe_llm(self._backend_name, "generate"):
+            result = await self._inner.generate_content_async(prompt, generation_config)
+        record_llm_usage(self._backend_name, result.usage)
+        return result
+
+    def generate_content(self, prompt: str, generation_config: Optional[dict] = None) -> LLMResponse:
+        with observe_llm(self._backend_name, "generate"):
+            result = self._inner.generate_content(prompt, generation_config)
+        record_llm_usage(self._backend_name, result.usage)
+        return result
+
+
+def create_llm_backend(
+    backend: str,
+    model_id: str,
+    system_instruction: Optional[str] = None,
+    tools: Optional[List[dict]] = None,
+    project: Optional[str] = None,
+    location: Optional[str] = None,
+    safety_block_threshold: Optional[str] = None,
+    script_path: Optional[str] = None,
+    latency_ms: float = 0,
+    tokens_per_second: float = 0,
+) -> LLMBackend:
+    """
+    Cria o backend configurado.
+
+    - "vertex": Gemini via Vertex AI (usa project/location/safety_block_threshold).
+    - "fake": respostas roteirizadas locais (usa script_path/latency_ms/tokens_per_second).
+
+    `tools` são declarações neutras: {"name", "description", "parameters"}.
+    O backend retornado é envolvido por MeteredLLMBackend (métricas Prometheus).
+    """
+    return MeteredLLMBackend(
+        _create_backend(
+            backend, model_id, system_instruction, tools, project, location,
+            safety_block_threshold, script_path, latency_ms, tokens_per_second,
+        ),
+        backend,
+    )
+
+
+def _create_backend(backend, model_id, system_instruction, tools, project, location,
+                    safety_block_threshold, script_path, latency_ms, tokens_per_second) -> LLMBackend:
+    if backend == VERTEX:
+        from src.llm.vertex_backend import VertexBackend
+        return VertexBackend(
+            model_id=model_id,
+            system_instruction=system_instruction,
+            tools=tools,
+            project=project,
+            location=location,
+            safety_block_threshold=safety_block_threshold,
+        )
+    if backend == FAKE:
+        from src.llm.fake_backend import FakeLLMBackend
+        return FakeLLMBackend.from_script_file(
+            script_path,
+            latency_ms=latency_ms,
+            tokens_per_second=tokens_per_second,
+        )
+    raise ValueError(f"Backend de LLM desconhecido: {backend!r} (use '{VERTEX}' ou '{FAKE}')")
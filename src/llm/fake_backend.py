@@ -0,0 +1,181 @@
+"""
+Stand-in local e determinístico de LLM para testes de carga e benchmarks offline.
+
+Respostas vêm de um roteiro (lista de regras avaliadas em ordem):
+
+    [
+        {"match": "histórico", "function_call": {"name": "get_customer_history_markdown",
+                                                 "args": {"card_code": "C00123"}},
+         "text": "Resumo do histórico..."},
+        {"match": ".*", "text": "Olá! Sou a MariIA."}
+    ]
+
+- `match`: regex (case-insensitive) aplicada à mensagem/prompt.
+- `function_call`: se presente, o stream devolve a chamada de tool e o `text`
+  vira a resposta ao FunctionResponse.
+- `json`: resposta estruturada (serializada) para `generate_content*`.
+
+Latência e vazão são configuráveis: `latency_ms` antes do primeiro token e
+`tokens_per_second` para o restante (0 = sem limite).
+"""
+import asyncio
+import json
+import re
+import time
+from typing import AsyncIterator, List, Optional
+
+from src.llm.backend import ChatSession, FunctionCall, LLMBackend, LLMChunk, LLMResponse
+
+DEFAULT_SCRIPT = [
+    {
+        "match": r"PITCH DE VENDAS",
+        "json": {
+            "pitch_text": "Olá! Seu estoque de Arroz deve estar acabando. Que tal incluir Feijão e Massas no pedido de hoje?",
+            "profile_summary": "Cliente focado em Arroz, com compras quinzenais.",
+            "frequency_assessment": "Último pedido dentro da frequência habitual.",
+            "suggested_order": [
+                {"product_name": "Arroz Tipo 1 5kg", "sku": "0001", "quantity": 10},
+                {"product_name": "Feijão Carioca 1kg", "sku": "0101", "quantity": 6},
+                {"product_name": "Espaguete 500g", "sku": "0201", "quantity": 4}
+            ],
+            "motivation": "Mix estratégico: 1 âncora + 2 produtos de alto volume",
+            "reasons": [
+                {"title": "Timing Ideal", "text": "Dentro da janela de recompra.", "icon": "history"},
+                {"title": "Giro Garantido", "text": "Arroz é o item âncora do cliente.", "icon": "star"},
+                {"title": "Oportunidade de Mix", "text": "Feijão e Massas são co-comprados com Arroz.", "icon": "trending_up"}
+            ]
+        }
+    },
+    {
+        "match": r"Analise o SKU",
+        "json": {
+            "categoria": "Alimentos > Mercearia",
+            "especificacoes": ["Embalagem plástica", "Fardo"],
+            "riscos": ["Validade"],
+            "ambiguidade_detectada": False
+        }
+    },
+    {
+        "match": r"hist[óo]rico",
+        "function_call": {"name": "get_customer_history_markdown", "args": {"card_code": "C00123", "limit": 10}},
+        "text": "O cliente compra principalmente Arroz, com pedidos regulares nas últimas semanas."
+    },
+    {
+        "match": r"inativ|sem compra",
+        "function_call": {"name": "get_inactive_customers_markdown", "args": {"days_without_purchase": 30}},
+        "text": "Estes são os clientes sem compras recentes na sua carteira. Priorize os de maior volume."
+    },
+    {
+        "match": r".*",
+        "text": "Olá! Sou a MariIA, sua assistente de televendas. Posso buscar histórico de clientes, "
+                "clientes inativos, produtos mais vendidos e sugerir pitches de venda."
+    }
+]
+
+
+def _tokenize(text: str) -> List[str]:
+    """Tokens aproximados: palavras mantendo o espaço à direita (o join reconstrói o texto)."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class FakeLLMBackend(LLMBackend):
+    def __init__(
+        self,
+        script: Optional[List[dict]] = None,
+        latency_ms: float = 0,
+        tokens_per_second: float = 0,
+        chunk_tokens: int = 4,
+        model_id: str = "fake-llm",
+    ):
+        self.model_id = model_id
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.rules = [dict(rule, pattern=re.compile(rule.get("match", ".*"), re.IGNORECASE | re.DOTALL))
+                      for rule in (script if script is not None else DEFAULT_SCRIPT)]
+
+    @classmethod
+    def from_script_file(cls, path: Optional[str] = None, **kwargs) -> "FakeLLMBackend":
+        script = None
+        if path:
+            with open(path, encoding="utf-8") as f:
+                script = json.load(f)
+        return cls(script=script, **kwargs)
+
+    def match(self, message: str) -> dict:
+        for rule in self.rules:
+            if rule["pattern"].search(message or ""):
+                return rule
+        return {"text": ""}
+
+    @staticmethod
+    def rule_text(rule: dict) -> str:
+        if "json" in rule:
+            return json.dumps(rule["json"], ensure_ascii=False)
+        return rule.get("text", "")
+
+    # --- Simulação de tempo ---
+
+    def _token_delay(self, n_tokens: int) -> float:
+        return n_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _response(self, prompt: str, text: str) -> LLMResponse:
+        return LLMResponse(
+            text=text,
+            finish_reason="STOP",
+            usage={"prompt_tokens": len(_tokenize(prompt)), "output_tokens": len(_tokenize(text))},
+        )
+
+    async def stream_text(self, text: str) -> AsyncIterator[LLMChunk]:
+        tokens = _tokenize(text)
+        for i in range(0, len(tokens), self.chunk_tokens):
+            batch = tokens[i:i + self.chunk_tokens]
+            delay = self._token_delay(len(batch))
+            if delay:
+                await asyncio.sleep(delay)
+            yield LLMChunk(text="".join(batch))
+
+    # --- LLMBackend ---
+
+    def start_chat(self, history: Optional[List[dict]] = None) -> ChatSession:
+        return FakeChatSession(self, history or [])
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[dict] = None) -> LLMResponse:
+        text = self.rule_text(self.match(prompt))
+        await asyncio.sleep(self.latency_ms / 1000 + self._token_delay(len(_tokenize(text))))
+        return self._response(prompt, text)
+
+    def generate_content(self, prompt: str, generation_config: Optional[dict] = None) -> LLMResponse:
+        text = self.rule_text(self.match(prompt))
+        time.sleep(self.latency_ms / 1000 + self._token_delay(len(_tokenize(text))))
+        return self._response(prompt, text)
+
+
+class FakeChatSession(ChatSession):
+    def __init__(self, backend: FakeLLMBackend, history: List[dict]):
+        self.backend = backend
+        self.history = list(history)
+        self._pending_rule = None
+
+    async def send_message_stream(self, message: str) -> AsyncIterator[LLMChunk]:
+        rule = self.backend.match(message)
+        self.history.append({"role": "user", "text": message})
+        await asyncio.sleep(self.backend.latency_ms / 1000)
+
+        if "function_call" in rule:
+            call = rule["function_call"]
+            self._pending_rule = rule
+            yield LLMChunk(function_call=FunctionCall(name=call["name"], args=dict(call.get("args", {}))))
+            return
+
+        text = self.backend.rule_text(rule)
+        async for chunk in self.backend.stream_text(text):
+            yield chunk
+        self.history.append({"role": "model", "text": text})
+
+    async def send_function_response(self, name: str, response: dict) -> LLMResponse:
+        rule, self._pending_rule = self._pending_rule or {}, None
+        text = rule.get("text", "")
+        await asyncio.sleep(self.backend.latency_ms / 1000 + self.backend._token_delay(len(_tokenize(text))))
+        self.history.append({"role": "model", "text": text})
+        return self.backend._response(json.dumps(response, ensure_ascii=False, default=str), text)
@@ -0,0 +1,138 @@
+"""Backend de LLM sobre o SDK da Vertex AI (Gemini)."""
+from typing import AsyncIterator, List, Optional
+
+import vertexai
+from vertexai.generative_models import (
+    Content, FunctionDeclaration, GenerativeModel, Part, SafetySetting, Tool
+)
+
+from src.llm.backend import ChatSession, FunctionCall, LLMBackend, LLMChunk, LLMResponse
+
+GLOBAL_ENDPOINT = "aiplatform.googleapis.com"
+
+_SAFETY_CATEGORIES = [
+    SafetySetting.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+    SafetySetting.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+    SafetySetting.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+    SafetySetting.HarmCategory.HARM_CATEGORY_HARASSMENT,
+]
+
+
+def _extract_parts(response):
+    """
+    Percorre candidates/content/parts com acesso defensivo: acessar `.text` de
+    um chunk que só tem function_call lança ValueError no SDK.
+    """
+    if not getattr(response, 'candidates', None):
+        return
+    for candidate in response.candidates:
+        content = getattr(candidate, 'content', None)
+        for part in getattr(content, 'parts', None) or []:
+            yield part
+
+
+def _usage(response) -> dict:
+    metadata = getattr(response, 'usage_metadata', None)
+    if not metadata:
+        return {}
+    return {
+        "prompt_tokens": getattr(metadata, 'prompt_token_count', 0) or 0,
+        "output_tokens": getattr(metadata, 'candidates_token_count', 0) or 0,
+    }
+
+
+def _to_response(response) -> LLMResponse:
+    text = ""
+    try:
+        text = response.text or ""
+    except Exception:
+        # Fallback manual se .text falhar
+        text = "".join(getattr(part, 'text', "") or "" for part in _extract_parts(response))
+
+    finish_reason = None
+    if getattr(response, 'candidates', None):
+        finish_reason = str(response.candidates[0].finish_reason)
+    return LLMResponse(text=text, finish_reason=finish_reason, usage=_usage(response))
+
+
+class VertexChatSession(ChatSession):
+    def __init__(self, chat):
+        self._chat = chat
+
+    async def send_message_stream(self, message: str) -> AsyncIterator[LLMChunk]:
+        response_stream = await self._chat.send_message_async(message, stream=True)
+        async for chunk in response_stream:
+            try:
+                text = ""
+                for part in _extract_parts(chunk):
+                    # function_call pode ser método ou propriedade dependendo do SDK
+                    fn = getattr(part, 'function_call', None)
+                    if fn and getattr(fn, 'name', None):
+                        yield LLMChunk(function_call=FunctionCall(name=fn.name, args={k: v for k, v in fn.args.items()}))
+                        return
+                    text += getattr(part, 'text', "") or ""
+                if text:
+                    yield LLMChunk(text=text)
+            except (AttributeError, ValueError):
+                # Chunk malformado: ignora e segue o stream
+                continue
+
+    async def send_function_response(self, name: str, response: dict) -> LLMResponse:
+        part = Part.from_function_response(name=name, response=response)
+        # Stream após Tool Calling é instável no SDK: resposta completa (stream=False)
+        final_response = await self._chat.send_message_async([part], stream=False)
+        return _to_response(final_response)
+
+
+class VertexBackend(LLMBackend):
+    def __init__(
+        self,
+        model_id: str,
+        system_instruction: Optional[str] = None,
+        tools: Optional[List[dict]] = None,
+        project: Optional[str] = None,
+        location: Optional[str] = None,
+        safety_block_threshold: Optional[str] = None,
+    ):
+        vertexai.init(project=project, location=location, api_endpoint=GLOBAL_ENDPOINT)
+        self.model_id = model_id
+
+        vertex_tools = None
+        if tools:
+            vertex_tools = [Tool(function_declarations=[FunctionDeclaration(**tool) for tool in tools])]
+
+        self.safety_settings = None
+        if safety_block_threshold:
+            threshold = getattr(SafetySetting.HarmBlockThreshold, safety_block_threshold)
+            self.safety_settings = [
+                SafetySetting(category=category, threshold=threshold) for category in _SAFETY_CATEGORIES
+            ]
+
+        self._model = GenerativeModel(
+            model_name=model_id,
+            system_instruction=system_instruction,
+            tools=vertex_tools,
+        )
+
+    def start_chat(self, history: Optional[List[dict]] = None) -> ChatSession:
+        contents = [
+            Content(role=msg["role"], parts=[Part.from_text(msg["text"])])
+            for msg in history or []
+        ]
+        return VertexChatSession(self._model.start_chat(history=contents))
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[dict] = None) -> LLMResponse:
+        response = await self._model.generate_content_async(
+            prompt,
+            generation_config=generation_config,
+            safety_settings=self.safety_settings,
+        )
+        return _to_response(response)
+
+    def generate_content(self, prompt: str, generation_config: Optional[dict] = None) -> LLMResponse:
+        response = self._model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            safety_settings=self.safety_settings,
+        )
+        return _to_response(response)
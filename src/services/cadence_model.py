@@ -0,0 +1,257 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.core.structured_logging import get_logger
+from src.services.refreshable import RefreshableModel
+
+logger = get_logger("cadence")
+
+
+class CustomerCadenceModel(RefreshableModel):
+    """
+    Cadência de recompra por cliente, pré-calculada a partir dos pedidos da
+    FAL_IA_Dados_Vendas_Televendas.
+
+    - Uma linha por cliente com intervalo mediano entre compras, desvio,
+      data esperada da próxima compra, média de fardos por pedido (180 dias
+      antes da última compra) e valor no período.
+    - `Vendedor` é o Vendedor_Atual do último pedido. O filtro por vendedor
+      usa um índice vendedor -> clientes com todos os vendedores do cliente
+      no histórico (mesma regra da consulta SQL, que filtra as linhas por
+      Vendedor_Atual antes de agrupar), montado no build/refresh.
+    - Calculada numa passada vetorizada (groupby/diff) sobre os pedidos em
+      memória. O refresh é incremental: busca só pedidos a partir do último
+      dia carregado e recalcula apenas os clientes afetados.
+    - As consultas (/inactive, job de churn) não fazem SQL: as colunas que
+      dependem de "hoje" (dias inativo, atraso, risco) são derivadas na hora.
+    """
+
+    # Abaixo disso o intervalo mediano não é confiável (menos de 2 intervalos)
+    MIN_PURCHASE_DAYS = 3
+    # Ciclo assumido para clientes sem histórico suficiente
+    DEFAULT_INTERVAL_DAYS = 30
+
+    def __init__(self, db, history_days: int = 730, refresh_seconds: int = 900,
+                 rebuild_seconds: int = 86400, profile_days: int = 180):
+        super().__init__(db, refresh_seconds=refresh_seconds, rebuild_seconds=rebuild_seconds)
+        self.history_days = history_days
+        self.profile_days = profile_days
+
+        self._orders = pd.DataFrame()
+        self._table = pd.DataFrame()
+        self._vendor_customers: Dict[str, pd.Index] = {}
+        self._watermark: Optional[pd.Timestamp] = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "customers": len(self._table),
+                "orders": len(self._orders),
+                "watermark": str(self._watermark) if self._watermark is not None else None,
+                "built_at": datetime.fromtimestamp(self._built_at).isoformat() if self._built_at else None,
+            }
+
+    # --- Carga ---
+
+    def _fetch(self, since) -> pd.DataFrame:
+        query = """
+        SELECT
+            Codigo_Cliente,
+            Tipo_Documento,
+            Numero_Documento,
+            MAX(Data_Emissao) as Data_Emissao,
+            SUM(Quantidade) as Quantidade,
+            SUM(Valor_Total_Linha) as Valor,
+            MAX(Nome_Cliente) as Nome_Cliente,
+            MAX(Cidade) as Cidade,
+            MAX(Estado) as Estado,
+            MAX(Vendedor_Atual) as Vendedor_Atual
+        FROM FAL_IA_Dados_Vendas_Televendas
+        WHERE Data_Emissao >= :since
+        GROUP BY Codigo_Cliente, Tipo_Documento, Numero_Documento
+        """
+        df = self.db.get_dataframe(query, params={"since": str(since)})
+        if not df.empty:
+            df['Data_Emissao'] = pd.to_datetime(df['Data_Emissao'])
+            df['Doc_Key'] = df['Tipo_Documento'].astype(str) + '|' + df['Numero_Documento'].astype(str)
+            for column in ('Quantidade', 'Valor'):
+                df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0.0)
+        return df
+
+    def _build(self):
+        """Recalcula a tabela inteira com a janela configurada."""
+        since = (datetime.now() - timedelta(days=self.history_days)).date()
+        orders = self._fetch(since)
+        table = self.compute(orders, self.profile_days, self.MIN_PURCHASE_DAYS)
+        vendor_customers = self._index_vendors(orders)
+        with self._lock:
+            self._orders = orders
+            self._table = table
+            self._vendor_customers = vendor_customers
+            self._watermark = orders['Data_Emissao'].max().normalize() if not orders.empty else None
+        logger.info("Cadência calculada", extra={"fields": {"customers": len(table), "orders": len(orders)}})
+
+    def _refresh(self):
+        """Refresh incremental: pedidos novos desde o watermark, recalculando só os clientes afetados."""
+        since = self._watermark.date() if self._watermark is not None else \
+            (datetime.now() - timedelta(days=self.history_days)).date()
+        delta = self._fetch(since)
+        if delta.empty:
+            return
+
+        # Pedidos do dia do watermark voltam na consulta: substitui em vez de somar
+        orders = pd.concat([self._orders, delta], ignore_index=True)
+        orders = orders.drop_duplicates(['Codigo_Cliente', 'Doc_Key'], keep='last')
+        affected = pd.unique(delta['Codigo_Cliente'])
+        updated = self.compute(
+            orders[orders['Codigo_Cliente'].isin(affected)], self.profile_days, self.MIN_PURCHASE_DAYS
+        )
+        table = pd.concat([self._table.drop(index=affected, errors='ignore'), updated])
+        vendor_customers = self._index_vendors(orders)
+        with self._lock:
+            self._orders = orders
+            self._table = table
+            self._vendor_customers = vendor_customers
+            self._watermark = max(self._watermark, delta['Data_Emissao'].max().normalize()) \
+                if self._watermark is not None else delta['Data_Emissao'].max().normalize()
+
+    @staticmethod
+    def _index_vendors(orders: pd.DataFrame) -> Dict[str, pd.Index]:
+        """Vendedor_Atual -> clientes com algum pedido desse vendedor no histórico."""
+        if orders.empty:
+            return {}
+        pairs = orders[['Vendedor_Atual', 'Codigo_Cliente']].dropna().drop_duplicates()
+        return {
+            vendor: pd.Index(customers.to_numpy())
+            for vendor, customers in pairs.groupby('Vendedor_Atual', sort=False)['Codigo_Cliente']
+        }
+
+    @staticmethod
+    def compute(orders: pd.DataFrame, profile_days: int = 180, min_purchase_days: int = 3) -> pd.DataFrame:
+        """Tabela de cadência (indexada por Codigo_Cliente) numa passada vetorizada."""
+        columns = [
+            'Nome_Cliente', 'Cidade', 'Estado', 'Vendedor', 'Primeira_Compra', 'Ultima_Compra', 'Pedidos',
+            'Valor_Total_Historico', 'Media_Fardos', 'Dias_Com_Compra', 'Intervalo_Mediano', 'Intervalo_Desvio',
+            'Proxima_Compra_Esperada',
+        ]
+        if orders.empty:
+            return pd.DataFrame(columns=columns).rename_axis('Codigo_Cliente')
+
+        orders = orders.sort_values(['Codigo_Cliente', 'Data_Emissao'])
+        grouped = orders.groupby('Codigo_Cliente', sort=False)
+        table = grouped.agg(
+            Nome_Cliente=('Nome_Cliente', 'last'),
+            Cidade=('Cidade', 'last'),
+            Estado=('Estado', 'last'),
+            Vendedor=('Vendedor_Atual', 'last'),
+            Primeira_Compra=('Data_Emissao', 'min'),
+            Ultima_Compra=('Data_Emissao', 'max'),
+            Pedidos=('Doc_Key', 'size'),
+            Valor_Total_Historico=('Valor', 'sum'),
+        )
+
+        # Intervalos entre dias de compra (vários pedidos no mesmo dia contam uma vez)
+        days = pd.DataFrame({
+            'Codigo_Cliente': orders['Codigo_Cliente'].to_numpy(),
+            'Dia': orders['Data_Emissao'].dt.normalize().to_numpy(),
+        }).drop_duplicates()
+        days['Gap'] = days.groupby('Codigo_Cliente', sort=False)['Dia'].diff().dt.days
+        gaps = days.groupby('Codigo_Cliente', sort=False)['Gap'].agg(['median', 'std', 'count'])
+        table['Dias_Com_Compra'] = gaps['count'].reindex(table.index).fillna(0).astype(int) + 1
+        reliable = table['Dias_Com_Compra'] >= min_purchase_days
+        table['Intervalo_Mediano'] = gaps['median'].reindex(table.index).where(reliable)
+        table['Intervalo_Desvio'] = gaps['std'].reindex(table.index).where(reliable).round(1)
+        table['Proxima_Compra_Esperada'] = (
+            table['Ultima_Compra'].dt.normalize() + pd.to_timedelta(table['Intervalo_Mediano'], unit='D')
+        )
+
+        # Média de fardos por pedido nos `profile_days` dias até a última compra
+        last = orders['Codigo_Cliente'].map(table['Ultima_Compra'])
+        recent = orders[orders['Data_Emissao'] >= last - pd.Timedelta(days=profile_days)]
+        table['Media_Fardos'] = (
+            recent.groupby('Codigo_Cliente', sort=False)['Quantidade'].mean()
+            .reindex(table.index).fillna(0.0).clip(lower=0.0).round(1)
+        )
+        return table[columns]
+
+    # --- Consulta ---
+
+    def _select(self, vendor: Optional[str] = None) -> pd.DataFrame:
+        """Tabela atual (sem cópia), opcionalmente só com os clientes do vendedor."""
+        self.ensure_fresh()
+        with self._lock:
+            table, vendor_customers = self._table, self._vendor_customers
+        if vendor:
+            table = table[table.index.isin(vendor_customers.get(vendor, pd.Index([])))]
+        return table
+
+    def _relative_to(self, table: pd.DataFrame, today: pd.Timestamp) -> pd.DataFrame:
+        """Acrescenta as colunas que dependem de `today` (devolve uma cópia)."""
+        days_inactive = (today - table['Ultima_Compra'].dt.normalize()).dt.days
+        expected = table['Intervalo_Mediano'].fillna(self.DEFAULT_INTERVAL_DAYS).clip(lower=1)
+        return table.assign(
+            Dias_Inativo=days_inactive,
+            Dias_Atraso=(days_inactive - table['Intervalo_Mediano']).round(0),
+            Risco=np.round(days_inactive / expected, 2),
+        )
+
+    def snapshot(self, today: Optional[pd.Timestamp] = None, vendor: Optional[str] = None) -> pd.DataFrame:
+        """
+        Tabela com as colunas relativas a hoje:
+        Dias_Inativo, Dias_Atraso (além do ciclo esperado) e Risco
+        (dias inativo / intervalo esperado; > 1 = atrasado em relação ao próprio ciclo).
+
+        `vendor` mantém o cliente se ele teve pedido com esse vendedor em
+        qualquer momento do histórico (não só no último pedido); as métricas
+        continuam calculadas sobre todos os pedidos do cliente.
+        """
+        return self._relative_to(self._select(vendor), (today or pd.Timestamp.now()).normalize())
+
+    def profile_average(self, card_code: str, last_purchase_date) -> Optional[float]:
+        """
+        Media_Fardos do cliente (média por pedido nos `profile_days` dias até a
+        última compra). None se a tabela não serve essa consulta: cliente
+        desconhecido, `last_purchase_date` diferente da última compra em
+        memória ou janela anterior ao histórico carregado.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            table = self._table
+        if card_code not in table.index:
+            return None
+        row = table.loc[card_code]
+        last = row['Ultima_Compra'].normalize()
+        if pd.Timestamp(last_purchase_date).normalize() != last:
+            return None
+        loaded_since = pd.Timestamp.now().normalize() - pd.Timedelta(days=self.history_days)
+        if last - pd.Timedelta(days=self.profile_days) < loaded_since:
+            return None
+        return float(row['Media_Fardos'])
+
+    def inactive(self, min_days: int = 30, max_days: int = 365, vendor: Optional[str] = None) -> pd.DataFrame:
+        """Clientes sem compra entre `min_days` e `max_days` dias, do maior risco para o menor."""
+        table = self._select(vendor)
+        today = pd.Timestamp.now().normalize()
+        # Filtra antes de derivar as colunas: só a fatia devolvida é copiada
+        days_inactive = (today - table['Ultima_Compra'].dt.normalize()).dt.days
+        table = self._relative_to(table[(days_inactive > min_days) & (days_inactive <= max_days)], today)
+        table = table.sort_values(
+            ['Risco', 'Media_Fardos', 'Valor_Total_Historico'], ascending=[False, False, False]
+        )
+        return table.reset_index()
+
+
+def get_cadence_model(db) -> CustomerCadenceModel:
+    """Instância compartilhada (a carga inicial lê a janela inteira de pedidos)."""
+    def create():
+        from src.core.config import get_settings
+        settings = get_settings()
+        return CustomerCadenceModel(
+            db,
+            history_days=settings.CADENCE_HISTORY_DAYS,
+            refresh_seconds=settings.CADENCE_REFRESH_SECONDS,
+        )
+    return CustomerCadenceModel.shared(create)
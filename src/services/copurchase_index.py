@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.core.structured_logging import get_logger
+from src.services.refreshable import RefreshableModel
+
+logger = get_logger("copurchase")
+
+
+class CoPurchaseIndex(RefreshableModel):
+    """
+    Índice item×item de co-compra (SKU × Documento) pré-calculado a partir da
+    FAL_IA_Dados_Vendas_Televendas.
+
+    - A matriz de co-ocorrência fica em memória como matriz esparsa (CSR).
+    - O refresh é incremental: só busca documentos emitidos a partir da última
+      data carregada (watermark). Um rebuild completo periódico descarta
+      documentos que saíram da janela.
+    - As consultas (top-k) não fazem SQL: usam apenas a matriz e o último
+      registro de compra por cliente×SKU mantido no próprio índice.
+    """
+
+    def __init__(self, db, window_days: int = 365, refresh_seconds: int = 900, rebuild_seconds: int = 86400):
+        super().__init__(db, refresh_seconds=refresh_seconds, rebuild_seconds=rebuild_seconds)
+        self.window_days = window_days
+        self._reset()
+
+    def _reset(self):
+        self._sku_to_idx: Dict[str, int] = {}
+        self._skus: List[str] = []
+        self._product_names: Dict[int, str] = {}
+        self._matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        # Codigo_Cliente -> {sku_idx: última data de compra}
+        self._customer_last_purchase: Dict[str, Dict[int, pd.Timestamp]] = {}
+        # Codigo_Cliente -> vendedores com algum documento do cliente (checagem de carteira sem SQL)
+        self._customer_vendors: Dict[str, Set[str]] = {}
+        self._watermark: Optional[pd.Timestamp] = None
+        self._docs_at_watermark = set()
+
+    def stats(self) -> dict:
+        """Resumo do índice (para diagnóstico)."""
+        with self._lock:
+            return {
+                "skus": len(self._skus),
+                "customers": len(self._customer_last_purchase),
+                "pairs": int(self._matrix.nnz),
+                "watermark": str(self._watermark) if self._watermark is not None else None,
+                "built_at": datetime.fromtimestamp(self._built_at).isoformat() if self._built_at else None,
+            }
+
+    # --- Carga ---
+
+    def _fetch(self, since) -> pd.DataFrame:
+        query = """
+        SELECT
+            Tipo_Documento,
+            Numero_Documento,
+            Codigo_Cliente,
+            SKU,
+            MAX(Nome_Produto) as Nome_Produto,
+            MAX(Vendedor_Atual) as Vendedor_Atual,
+            MAX(Data_Emissao) as Data_Emissao
+        FROM FAL_IA_Dados_Vendas_Televendas
+        WHERE Data_Emissao >= :since
+          AND Quantidade > 0
+        GROUP BY Tipo_Documento, Numero_Documento, Codigo_Cliente, SKU
+        """
+        df = self.db.get_dataframe(query, params={"since": str(since)})
+        if not df.empty:
+            df['Data_Emissao'] = pd.to_datetime(df['Data_Emissao'])
+            df['SKU'] = df['SKU'].astype(str).str.strip()
+            df['Doc_Key'] = df['Tipo_Documento'].astype(str) + '|' + df['Numero_Documento'].astype(str)
+        return df
+
+    def _build(self):
+        """Reconstrói o índice do zero com a janela configurada."""
+        since = (datetime.now() - timedelta(days=self.window_days)).date()
+        df = self._fetch(since)
+        with self._lock:
+            self._reset()
+            self._apply(df)
+        logger.info("Índice de co-compra construído", extra={"fields": {"skus": len(self._skus), "pairs": int(self._matrix.nnz)}})
+
+    def _refresh(self):
+        """Refresh incremental: aplica apenas documentos novos desde o watermark."""
+        since = self._watermark.date() if self._watermark is not None else \
+            (datetime.now() - timedelta(days=self.window_days)).date()
+        df = self._fetch(since)
+        if not df.empty:
+            # Documentos do dia do watermark já carregados não podem ser somados de novo
+            df = df[~df['Doc_Key'].isin(self._docs_at_watermark)]
+        with self._lock:
+            self._apply(df)
+
+    def _apply(self, df: pd.DataFrame):
+        """Soma a co-ocorrência dos documentos de `df` na matriz. Chamar com _lock."""
+        if df.empty:
+            return
+
+        # Registra SKUs novos (mantém os índices existentes estáveis)
+        for sku in pd.unique(df.loc[~df['SKU'].isin(self._sku_to_idx), 'SKU']):
+            self._sku_to_idx[sku] = len(self._skus)
+            self._skus.append(sku)
+        n_skus = len(self._skus)
+
+        cols = df['SKU'].map(self._sku_to_idx).to_numpy()
+        rows, _ = pd.factorize(df['Doc_Key'])
+        names = df.drop_duplicates('SKU', keep='last')
+        self._product_names.update(zip(names['SKU'].map(self._sku_to_idx), names['Nome_Produto']))
+
+        # Matriz de incidência Documento × SKU binária
+        incidence = sparse.csr_matrix(
+            (np.ones(len(df), dtype=np.float32), (rows, cols)),
+            shape=(rows.max() + 1, n_skus)
+        )
+        incidence.data[:] = 1.0
+
+        delta = (incidence.T @ incidence).tocsr()
+        delta.setdiag(0)
+        delta.eliminate_zeros()
+
+        if self._matrix.shape != (n_skus, n_skus):
+            self._matrix.resize((n_skus, n_skus))
+        self._matrix = (self._matrix + delta).tocsr()
+
+        # Última compra por cliente × SKU
+        df = df.assign(Sku_Idx=cols)
+        last = df.groupby(['Codigo_Cliente', 'Sku_Idx'])['Data_Emissao'].max()
+        for (card_code, sku_idx), date in last.items():
+            history = self._customer_last_purchase.setdefault(card_code, {})
+            if sku_idx not in history or history[sku_idx] < date:
+                history[sku_idx] = date
+
+        pairs = df[['Codigo_Cliente', 'Vendedor_Atual']].dropna().drop_duplicates()
+        for card_code, vendor in zip(pairs['Codigo_Cliente'], pairs['Vendedor_Atual']):
+            self._customer_vendors.setdefault(card_code, set()).add(vendor)
+
+        # Avança o watermark e guarda os documentos do dia para deduplicar o próximo refresh
+        max_date = df['Data_Emissao'].max().normalize()
+        same_day = set(df.loc[df['Data_Emissao'] >= max_date, 'Doc_Key'])
+        if self._watermark is None or max_date > self._watermark:
+            self._watermark = max_date
+            self._docs_at_watermark = same_day
+        elif max_date == self._watermark:
+            self._docs_at_watermark |= same_day
+
+    # --- Consulta ---
+
+    def customer_vendors(self, card_code: str) -> FrozenSet[str]:
+        """Vendedores com algum documento do cliente na janela do índice (vazio se desconhecido)."""
+        self.ensure_fresh()
+        with self._lock:
+            return frozenset(self._customer_vendors.get(card_code, ()))
+
+    def recommend(self, card_code: str, top_k: int = 5, recency_days: int = 60) -> pd.DataFrame:
+        """
+        SKUs mais co-comprados com a cesta do cliente que ele NÃO comprou nos
+        últimos `recency_days` dias.
+
+        Retorna DataFrame com SKU (cru), Produto, Score (nº de documentos em que
+        o SKU apareceu junto com itens da cesta) e Itens_Relacionados (quantos
+        SKUs da cesta sustentam a sugestão).
+        """
+        columns = ['SKU', 'Produto', 'Score', 'Itens_Relacionados']
+        self.ensure_fresh()
+
+        with self._lock:
+            history = self._customer_last_purchase.get(card_code)
+            if not history or self._matrix.nnz == 0:
+                return pd.DataFrame(columns=columns)
+
+            basket = np.fromiter(history.keys(), dtype=np.int64, count=len(history))
+            dates = np.array(list(history.values()), dtype='datetime64[ns]')
+            cutoff = np.datetime64(datetime.now() - timedelta(days=recency_days), 'ns')
+            recent = basket[dates >= cutoff]
+
+            basket_rows = self._matrix[basket]
+            scores = np.asarray(basket_rows.sum(axis=0)).ravel()
+            scores[recent] = 0
+
+            candidates = np.flatnonzero(scores > 0)
+            if candidates.size == 0:
+                return pd.DataFrame(columns=columns)
+            if candidates.size > top_k:
+                candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+            # Desempate determinístico por índice do SKU
+            top = candidates[np.lexsort((candidates, -scores[candidates]))]
+
+            support = np.asarray((basket_rows[:, top] > 0).sum(axis=0)).ravel()
+            return pd.DataFrame({
+                'SKU': [self._skus[i] for i in top],
+                'Produto': [self._product_names.get(i, '') for i in top],
+                'Score': scores[top].astype(int),
+                'Itens_Relacionados': support.astype(int),
+            })
+
+
+def get_copurchase_index(db) -> CoPurchaseIndex:
+    """Instância compartilhada (o índice é caro para construir)."""
+    def create():
+        from src.core.config import get_settings
+        settings = get_settings()
+        return CoPurchaseIndex(
+            db,
+            window_days=settings.COPURCHASE_WINDOW_DAYS,
+            refresh_seconds=settings.COPURCHASE_REFRESH_SECONDS,
+        )
+    return CoPurchaseIndex.shared(create)
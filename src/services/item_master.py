@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.core.structured_logging import get_logger
+from src.services.refreshable import RefreshableModel
+
+logger = get_logger("item_master")
+
+ITEM_QUERY = """
+SELECT ItemCode, ItemName, NumInSale, SalUnitMsr
+FROM OITM
+"""
+
+
+class ItemMaster(RefreshableModel):
+    """
+    Cadastro de itens (OITM) em memória: ItemCode -> NumInSale, nome e unidade
+    de venda.
+
+    A categoria não vem do cadastro: a Categoria_Produto usada pelo app (ARROZ,
+    FEIJAO, ...) já está na própria FAL_IA_Dados_Vendas_Televendas, e o grupo
+    do OITM (ItmsGrpCod/OITB) é outra classificação.
+
+    - Carga em massa numa consulta (o cadastro é pequeno) e recarga completa
+      periódica em background.
+    - A conversão quantidade -> fardos é feita em pandas (`to_bales`), então as
+      consultas de vendas não precisam de `LEFT JOIN OITM ... COLLATE`, que
+      impedia o uso de índice no SKU. Como NumInSale é constante por SKU, as
+      queries agregam a quantidade por SKU e a divisão acontece depois.
+    """
+
+    def __init__(self, db, refresh_seconds: int = 3600):
+        super().__init__(db, refresh_seconds=refresh_seconds, rebuild_seconds=refresh_seconds)
+        self._items = pd.DataFrame(columns=["ItemName", "NumInSale", "SalUnitMsr"])
+        self._factors = pd.Series(dtype=float)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "built_at": datetime.fromtimestamp(self._built_at).isoformat() if self._built_at else None,
+            }
+
+    # --- Carga ---
+
+    def _build(self):
+        """Recarrega o cadastro inteiro (não há refresh incremental: o cadastro é pequeno)."""
+        df = self.db.get_dataframe(ITEM_QUERY)
+        if df.empty:
+            # O conector devolve DataFrame vazio em erro de banco. Sem cadastro, todo SKU
+            # converteria com fator 1.0: falha para não marcar o build (a carga é refeita
+            # na próxima consulta; num refresh, os fatores anteriores continuam valendo)
+            raise RuntimeError("Consulta do cadastro de itens (OITM) voltou vazia")
+        df["ItemCode"] = df["ItemCode"].astype(str).str.strip()
+        df["NumInSale"] = pd.to_numeric(df["NumInSale"], errors="coerce")
+        items = df.drop_duplicates("ItemCode", keep="last").set_index("ItemCode")
+        # Fator de conversão: NumInSale só vale se > 1 (mesma regra do CASE antigo)
+        factors = items["NumInSale"].where(items["NumInSale"] > 1)
+        with self._lock:
+            self._items, self._factors = items, factors
+        logger.info("Cadastro de itens carregado", extra={"fields": {"items": len(items)}})
+
+    # --- Consulta ---
+
+    def factors(self, skus: pd.Series) -> np.ndarray:
+        """NumInSale de cada SKU (1.0 para itens sem cadastro ou NumInSale <= 1)."""
+        self.ensure_fresh()
+        with self._lock:
+            factors = self._factors
+        mapped = skus.astype(str).str.strip().map(factors)
+        return mapped.fillna(1.0).to_numpy(dtype=float)
+
+    def to_bales(self, quantities: pd.Series, skus: pd.Series) -> pd.Series:
+        """Quantidade -> fardos (Quantidade / NumInSale), vetorizado."""
+        values = pd.to_numeric(quantities, errors="coerce").to_numpy(dtype=float)
+        return pd.Series(values / self.factors(skus), index=quantities.index)
+
+
+def get_item_master(db) -> ItemMaster:
+    """Instância compartilhada (usada pela agente e pelo rollup mensal)."""
+    def create():
+        from src.core.config import get_settings
+        return ItemMaster(db, refresh_seconds=get_settings().ITEM_MASTER_REFRESH_SECONDS)
+    return ItemMaster.shared(create)
@@ -1,75 +1,64 @@
-import json
 import os
-import requests
+import sys
 from typing import List, Dict
 
-TOKENS_FILE = os.path.join(os.path.dirname(__file__), '../database/tokens.json')
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from src.core.structured_logging import get_logger
+from src.services.push_dispatcher import DispatchResult, PushMessage, get_push_dispatcher
+from src.services.token_store import get_token_store
+
+logger = get_logger("notifications")
 
 def load_tokens() -> Dict[str, str]:
-    """Carrega o mapeamento user_id -> token do arquivo JSON."""
-    if not os.path.exists(TOKENS_FILE):
-        return {}
-    try:
-        with open(TOKENS_FILE, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    """Mapeamento user_id -> token mais recente (compatibilidade com o antigo tokens.json)."""
+    return get_token_store().latest_by_user()
 
-def save_token(user_id: str, token: str):
-    """Salva ou atualiza o token de um usuário."""
-    tokens = load_tokens()
-    tokens[user_id] = token
-    
-    # Garante que o diretório existe
-    os.makedirs(os.path.dirname(TOKENS_FILE), exist_ok=True)
-    
-    with open(TOKENS_FILE, 'w') as f:
-        json.dump(tokens, f, indent=4)
-    print(f"Token salvo para {user_id}: {token}")
+def save_token(user_id: str, token: str, platform: str = None):
+    """Salva ou atualiza o token de um dispositivo do usuário."""
+    get_token_store().register(user_id, token, platform)
+    logger.info("Token registrado", extra={"fields": {"user_id": user_id}})
 
 def get_token(user_id: str) -> str:
-    """Retorna o token de um usuário ou None."""
-    tokens = load_tokens()
-    return tokens.get(user_id)
+    """Retorna o token do dispositivo mais recente do usuário ou None."""
+    tokens = get_token_store().tokens_for(user_id)
+    return tokens[0] if tokens else None
+
+def get_tokens(user_id: str) -> List[str]:
+    """Todos os dispositivos registrados do usuário."""
+    return get_token_store().tokens_for(user_id)
+
+def send_push_messages(messages: List[PushMessage]) -> DispatchResult:
+    """Envia mensagens em lote (até 100 por requisição) e guarda os tickets para conferir os recibos."""
+    result = get_push_dispatcher().send(messages)
+    if result.tickets:
+        get_token_store().add_tickets(result.tickets)
+    return result
+
+def process_push_receipts(min_age_seconds: float = 900) -> DispatchResult:
+    """Confere os recibos dos envios anteriores (invalida tokens DeviceNotRegistered)."""
+    store = get_token_store()
+    tickets = store.pending_tickets(min_age_seconds)
+    if not tickets:
+        return DispatchResult()
+    result = get_push_dispatcher().fetch_receipts(tickets)
+    store.remove_tickets(tickets)
+    logger.info(
+        "Recibos de push conferidos",
+        extra={"fields": {"tickets": len(tickets), "failed": result.failed, "errors": result.errors}},
+    )
+    return result
 
 def send_push_notification(token: str, title: str, body: str, data: dict = None) -> bool:
     """Envia notificação via Expo Push API."""
     if not token:
-        print("Token vazio. Notificação cancelada.")
-        return False
-        
-    url = "https://exp.host/--/api/v2/push/send"
-    headers = {
-        "Accept": "application/json",
-        "Accept-encoding": "gzip, deflate",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "to": token,
-        "title": title,
-        "body": body,
-        "sound": "default",
-        "priority": "high"
-    }
-    
-    if data:
-        payload["data"] = data
-        
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        print(f"Notificação enviada: {response.json()}")
-        return True
-    except Exception as e:
-        print(f"Erro ao enviar notificação: {e}")
+        logger.warning("Token vazio. Notificação cancelada.")
         return False
+    return send_push_messages([PushMessage(token, title, body, data)]).sent > 0
 
 def send_notification_to_user(user_id: str, title: str, body: str, data: dict = None):
-    """Envia notificação para um usuário específico pelo ID."""
-    token = get_token(user_id)
-    if token:
-        return send_push_notification(token, title, body, data)
-    else:
-        print(f"Usuário {user_id} não tem token registrado.")
+    """Envia notificação para todos os dispositivos de um usuário."""
+    tokens = get_tokens(user_id)
+    if not tokens:
+        logger.info("Usuário %s não tem token registrado.", user_id)
         return False
+    return send_push_messages([PushMessage(token, title, body, data) for token in tokens]).sent > 0
@@ -0,0 +1,367 @@
+"""
+Fila durável de envio de pedidos ao SAP.
+
+O vendedor recebe o aceite na hora (`enqueue` grava o pedido numa base SQLite
+local e retorna); workers em background enviam ao Service Layer com
+concorrência limitada, retry com backoff exponencial para falhas
+transitórias e status consultável pela API.
+
+Idempotência em duas camadas:
+- Local: a mesma `idempotency_key` do mesmo vendedor devolve o pedido já
+  enfileirado (o app pode reenviar o POST sem criar outro pedido); a mesma
+  chave com outro payload é conflito (`OrderConflictError`).
+- SAP (opcional): com `SAP_ORDER_KEY_FIELD` configurado, o `order_id` do
+  pedido (único mesmo entre vendedores) vai nesse campo (UDF). Antes de
+  repetir um envio cujo resultado é incerto (timeout/5xx depois do POST), o
+  worker procura o pedido pela chave e só reenvia se ele não existir. Sem o
+  campo, um envio incerto é repetido às cegas e pode duplicar o pedido.
+
+Cada worker reserva até `batch_size` pedidos prontos e os envia num único
+OData $batch (um changeset por pedido); pedidos com resultado incerto vão
+sozinhos, depois da busca pela chave.
+
+Pedidos que ficaram em `processing` quando o processo caiu voltam para a
+fila quando o lease expira.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from src.core.metrics import SAP_ORDERS
+from src.core.structured_logging import get_logger
+from src.services.sap_service import SapServiceError
+
+logger = get_logger("order_queue")
+
+QUEUED, PROCESSING, RETRYING, SUBMITTED, FAILED = "queued", "processing", "retrying", "submitted", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sap_orders (
+    order_id TEXT PRIMARY KEY,
+    idempotency_key TEXT NOT NULL,
+    vendor TEXT NOT NULL DEFAULT '',
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    uncertain INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    doc_entry INTEGER,
+    doc_num INTEGER,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_sap_orders_key ON sap_orders (vendor, idempotency_key);
+CREATE INDEX IF NOT EXISTS ix_sap_orders_pending ON sap_orders (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS ix_sap_orders_vendor ON sap_orders (vendor, created_at);
+"""
+
+_PUBLIC_COLUMNS = (
+    "order_id", "idempotency_key", "vendor", "status", "attempts", "last_error",
+    "doc_entry", "doc_num", "created_at", "updated_at",
+)
+
+
+class OrderConflictError(Exception):
+    """Idempotency key já usada pelo mesmo vendedor com outro payload."""
+
+
+class OrderQueue:
+    def __init__(
+        self,
+        db_path: str,
+        sap_factory: Callable,
+        workers: int = 4,
+        batch_size: int = 20,
+        max_attempts: int = 8,
+        backoff_seconds: float = 2.0,
+        max_backoff_seconds: float = 300.0,
+        lease_seconds: float = 120.0,
+        poll_seconds: float = 1.0,
+        key_field: Optional[str] = None,
+    ):
+        self.db_path = db_path
+        self.sap_factory = sap_factory
+        self.workers = workers
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.key_field = key_field or None
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # --- API ---
+
+    def enqueue(self, payload: dict, idempotency_key: Optional[str] = None, vendor: Optional[str] = None) -> dict:
+        """
+        Grava o pedido e retorna na hora. Chave repetida (do mesmo vendedor)
+        devolve o pedido existente; com payload diferente levanta
+        OrderConflictError.
+        """
+        key = idempotency_key or str(uuid.uuid4())
+        vendor = vendor or ""
+        encoded = json.dumps(payload, ensure_ascii=False)
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sap_orders "
+                "(order_id, idempotency_key, vendor, payload, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(uuid.uuid4()), key, vendor, encoded, QUEUED, 0.0, now, now),
+            )
+            row = conn.execute(
+                "SELECT * FROM sap_orders WHERE vendor = ? AND idempotency_key = ?", (vendor, key)
+            ).fetchone()
+        if json.loads(row["payload"]) != json.loads(encoded):
+            raise OrderConflictError(f"Idempotency-Key '{key}' já usada com outro pedido.")
+        self.start()
+        self._wake.set()
+        return self._public(row)
+
+    def get(self, order_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM sap_orders WHERE order_id = ?", (order_id,)).fetchone()
+        return self._public(row) if row else None
+
+    def counts(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM sap_orders GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    @staticmethod
+    def _public(row: sqlite3.Row) -> dict:
+        return {column: row[column] for column in _PUBLIC_COLUMNS}
+
+    # --- Workers ---
+
+    def start(self):
+        """Sobe os workers (idempotente)."""
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"sap-order-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                jobs = self._claim(self.batch_size)
+            except Exception as e:
+                logger.error("Erro ao ler a fila de pedidos: %s", e)
+                jobs = []
+            if not jobs:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            try:
+                fresh = [job for job in jobs if not job["uncertain"]]
+                for job in jobs:
+                    if job["uncertain"] or len(fresh) == 1:
+                        self._process(job)
+                if len(fresh) > 1:
+                    self._process_batch(fresh)
+            except Exception as e:
+                # Ex: sqlite travado ao gravar o resultado. O worker segue vivo; os pedidos
+                # sem status final voltam como incertos quando o lease expirar
+                logger.error("Erro ao processar pedidos da fila: %s", e)
+
+    def _claim(self, limit: int = 1) -> List[sqlite3.Row]:
+        """Reserva até `limit` pedidos prontos (BEGIN IMMEDIATE: um worker/processo por vez)."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                """
+                SELECT * FROM sap_orders
+                WHERE (status IN (?, ?) AND next_attempt_at <= ?)
+                   OR (status = ? AND lease_until < ?)
+                ORDER BY created_at LIMIT ?
+                """,
+                (QUEUED, RETRYING, now, PROCESSING, now, limit),
+            ).fetchall()
+            for row in rows:
+                # Lease expirado = worker morreu no meio do envio: resultado incerto
+                uncertain = 1 if row["status"] == PROCESSING else row["uncertain"]
+                conn.execute(
+                    "UPDATE sap_orders SET status = ?, lease_until = ?, uncertain = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE order_id = ?",
+                    (PROCESSING, now + self.lease_seconds, uncertain, datetime.now().isoformat(), row["order_id"]),
+                )
+            conn.execute("COMMIT")
+            if not rows:
+                return []
+            ids = [row["order_id"] for row in rows]
+            return conn.execute(
+                f"SELECT * FROM sap_orders WHERE order_id IN ({','.join('?' * len(ids))}) ORDER BY created_at", ids
+            ).fetchall()
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _payload(self, job: sqlite3.Row) -> dict:
+        payload = json.loads(job["payload"])
+        if self.key_field:
+            payload[self.key_field] = job["order_id"]
+        return payload
+
+    def _process(self, job: sqlite3.Row):
+        sap = self.sap_factory()
+        try:
+            existing = None
+            if job["uncertain"] and self.key_field:
+                # O envio anterior pode ter criado o pedido antes de falhar
+                existing = sap.find_order_by_key(self.key_field, job["order_id"])
+            self._submitted(job, existing or sap.create_order(self._payload(job)), deduplicated=existing is not None)
+        except SapServiceError as e:
+            self._rejected(job, e)
+        except Exception as e:
+            # Erro inesperado (ex: rede no meio da resposta): trata como transitório e incerto
+            self._fail(job, str(e), retryable=True, uncertain=True)
+
+    def _process_batch(self, jobs: List[sqlite3.Row]):
+        """Vários pedidos num único $batch; cada um tem seu próprio resultado."""
+        try:
+            results = self.sap_factory().create_orders([self._payload(job) for job in jobs])
+        except SapServiceError as e:
+            # Falha do $batch inteiro: parte dos pedidos pode ter sido gravada, então
+            # todos voltam como incertos (reenvio individual, depois da busca pela chave)
+            for job in jobs:
+                self._fail(job, str(e), retryable=e.retryable, uncertain=True)
+            return
+        except Exception as e:
+            for job in jobs:
+                self._fail(job, str(e), retryable=True, uncertain=True)
+            return
+        for job, result in zip(jobs, results):
+            if isinstance(result, SapServiceError):
+                self._rejected(job, result)
+            else:
+                self._submitted(job, result)
+
+    def _submitted(self, job: sqlite3.Row, result: dict, deduplicated: bool = False):
+        self._finish(job, SUBMITTED, doc=result)
+        SAP_ORDERS.labels(result="submitted").inc()
+        logger.info(
+            "Pedido enviado ao SAP",
+            extra={"fields": {"order_id": job["order_id"], "doc_entry": result.get("DocEntry"),
+                              "attempts": job["attempts"], "deduplicated": deduplicated}},
+        )
+
+    def _rejected(self, job: sqlite3.Row, error: SapServiceError):
+        # Sem status (rede) ou 5xx: o SAP pode ter gravado o pedido antes de falhar
+        uncertain = error.status_code is None or error.status_code >= 500
+        self._fail(job, str(error), retryable=error.retryable, uncertain=uncertain)
+
+    def _fail(self, job: sqlite3.Row, error: str, retryable: bool, uncertain: bool):
+        if retryable and job["attempts"] < self.max_attempts:
+            delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (job["attempts"] - 1))
+            self._finish(job, RETRYING, error=error, next_attempt_at=time.time() + delay,
+                         uncertain=job["uncertain"] or uncertain)
+            SAP_ORDERS.labels(result="retry").inc()
+            logger.warning(
+                "Falha transitória no envio ao SAP; nova tentativa em %.0fs", delay,
+                extra={"fields": {"order_id": job["order_id"], "attempts": job["attempts"], "error": error[:300]}},
+            )
+        else:
+            self._finish(job, FAILED, error=error)
+            SAP_ORDERS.labels(result="failed").inc()
+            logger.error(
+                "Pedido rejeitado pelo SAP",
+                extra={"fields": {"order_id": job["order_id"], "attempts": job["attempts"], "error": error[:300]}},
+            )
+
+    def _finish(self, job, status: str, doc: Optional[dict] = None, error: Optional[str] = None,
+                next_attempt_at: float = 0.0, uncertain: int = 0):
+        doc = doc or {}
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE sap_orders SET status = ?, lease_until = NULL, next_attempt_at = ?, uncertain = ?, "
+                "last_error = ?, doc_entry = COALESCE(?, doc_entry), doc_num = COALESCE(?, doc_num), updated_at = ? "
+                "WHERE order_id = ?",
+                (status, next_attempt_at, int(bool(uncertain)), error, doc.get("DocEntry"), doc.get("DocNum"),
+                 datetime.now().isoformat(), job["order_id"]),
+            )
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """Espera a fila esvaziar (testes / shutdown). True se não sobrou pendência."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            counts = self.counts()
+            if not any(counts.get(status) for status in (QUEUED, PROCESSING, RETRYING)):
+                return True
+            time.sleep(0.05)
+        return False
+
+
+# Instância compartilhada
+_order_queue_instance = None
+_order_queue_lock = threading.Lock()
+
+
+def get_order_queue() -> OrderQueue:
+    global _order_queue_instance
+    with _order_queue_lock:
+        if _order_queue_instance is None:
+            from src.core.config import get_settings
+            from src.services.sap_service import get_sap_service
+            settings = get_settings()
+            _order_queue_instance = OrderQueue(
+                settings.SAP_ORDER_QUEUE_DB,
+                get_sap_service,
+                workers=settings.SAP_ORDER_WORKERS,
+                batch_size=settings.SAP_ORDER_BATCH_SIZE,
+                max_attempts=settings.SAP_ORDER_MAX_ATTEMPTS,
+                key_field=settings.SAP_ORDER_KEY_FIELD,
+            )
+    return _order_queue_instance
+
+
+def resume_order_queue():
+    """No startup: retoma pedidos pendentes de uma execução anterior (se a fila já existe)."""
+    from src.core.config import get_settings
+    if os.path.exists(get_settings().SAP_ORDER_QUEUE_DB):
+        get_order_queue().start()
+
+
+def stop_order_queue():
+    if _order_queue_instance is not None:
+        _order_queue_instance.stop()
@@ -0,0 +1,334 @@
+"""
+Store de analytics do Pitch IA (SQLite embutido, indexado).
+
+O log `pitch_usage.jsonl` mistura eventos `pitch_generated` e `pitch_feedback`;
+medir conversão direto nele exige ler o arquivo inteiro e juntar por pitch_id.
+Aqui os eventos são ingeridos de forma incremental numa base SQLite:
+
+- `pitches`: um registro por pitch, com flags `useful`/`sold` já resolvidas
+  (a agregação vira um GROUP BY indexado, sem join com o feedback).
+- `feedback`: eventos brutos de feedback (deduplicados).
+- `ingest_files`: até onde cada arquivo de log já foi lido. O arquivo é
+  identificado pelo hash da primeira linha (sobrevive à rotação e ao gzip do
+  BufferedJSONLSink), então um arquivo rotacionado continua do offset onde o
+  arquivo ativo parou e nunca é relido por inteiro.
+
+Linhas incompletas no fim do arquivo ativo ficam para a próxima ingestão. O
+log é lido em blocos de `INGEST_CHUNK_BYTES` (memória limitada mesmo na
+primeira ingestão de um log grande) e as consultas não esperam a ingestão:
+`ensure_fresh` a dispara em background e responde com o que já está na base.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from src.core.structured_logging import get_logger
+from src.utils.log_sink import BufferedJSONLSink
+
+logger = get_logger("pitch_analytics")
+
+# Bytes do log lidos por vez na ingestão
+INGEST_CHUNK_BYTES = 4 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pitches (
+    pitch_id TEXT PRIMARY KEY,
+    ts TEXT NOT NULL,
+    week TEXT NOT NULL,
+    card_code TEXT,
+    target_sku TEXT,
+    vendor TEXT,
+    user_id TEXT,
+    useful INTEGER NOT NULL DEFAULT 0,
+    sold INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS feedback (
+    pitch_id TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    feedback_type TEXT NOT NULL,
+    user_id TEXT,
+    UNIQUE (pitch_id, ts, feedback_type)
+);
+CREATE TABLE IF NOT EXISTS ingest_files (
+    signature TEXT PRIMARY KEY,
+    path TEXT,
+    offset INTEGER NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_pitches_ts ON pitches (ts);
+CREATE INDEX IF NOT EXISTS ix_pitches_card_code ON pitches (card_code);
+CREATE INDEX IF NOT EXISTS ix_pitches_sku ON pitches (target_sku, ts, useful, sold);
+CREATE INDEX IF NOT EXISTS ix_pitches_vendor ON pitches (vendor, ts, useful, sold);
+CREATE INDEX IF NOT EXISTS ix_pitches_week ON pitches (week, useful, sold);
+CREATE INDEX IF NOT EXISTS ix_feedback_pitch_id ON feedback (pitch_id);
+"""
+
+GROUP_COLUMNS = {"sku": "target_sku", "vendor": "vendor", "week": "week", "card_code": "card_code"}
+
+_INSERT_PITCH = """
+INSERT OR IGNORE INTO pitches (pitch_id, ts, week, card_code, target_sku, vendor, user_id, useful, sold)
+VALUES (?, ?, ?, ?, ?, ?, ?,
+    EXISTS (SELECT 1 FROM feedback WHERE pitch_id = ? AND feedback_type = 'useful'),
+    EXISTS (SELECT 1 FROM feedback WHERE pitch_id = ? AND feedback_type = 'sold'))
+"""
+_INSERT_FEEDBACK = "INSERT OR IGNORE INTO feedback (pitch_id, ts, feedback_type, user_id) VALUES (?, ?, ?, ?)"
+
+
+def _week_start(ts: str) -> str:
+    """Segunda-feira da semana do evento (YYYY-MM-DD)."""
+    try:
+        day = datetime.fromisoformat(ts).date()
+    except (TypeError, ValueError):
+        return ""
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+class PitchAnalyticsStore:
+    def __init__(self, db_path: str, log_path: str, refresh_seconds: float = 30.0):
+        self.db_path = db_path
+        self.log_path = log_path
+        self.refresh_seconds = refresh_seconds
+        self._ingest_lock = threading.Lock()
+        self._ingested_at = 0.0
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # --- Ingestão ---
+
+    def _log_files(self) -> List[str]:
+        """Rotacionados (mais antigos primeiro) e, por último, o arquivo ativo."""
+        files = BufferedJSONLSink(self.log_path).rotated_files()
+        if os.path.exists(self.log_path):
+            files.append(self.log_path)
+        return files
+
+    def ensure_fresh(self):
+        """Se passou de `refresh_seconds`, dispara a ingestão incremental em background."""
+        if time.time() - self._ingested_at >= self.refresh_seconds and not self._ingest_lock.locked():
+            self._ingested_at = time.time()  # Evita disparos concorrentes
+            threading.Thread(target=self._safe_ingest, daemon=True).start()
+
+    def _safe_ingest(self):
+        try:
+            self.ingest()
+        except Exception as e:
+            logger.warning("Erro na ingestão do log de pitches: %s", e)
+
+    def ingest(self) -> Dict[str, int]:
+        """Lê só o que foi adicionado ao log desde a última ingestão."""
+        totals = {"pitches": 0, "feedback": 0, "files": 0}
+        with self._ingest_lock:
+            for path in self._log_files():
+                active = path == self.log_path
+                result = self._ingest_file(path, complete=not active)
+                for key in ("pitches", "feedback"):
+                    totals[key] += result[key]
+                totals["files"] += 1 if result["read"] else 0
+            self._ingested_at = time.time()
+        return totals
+
+    def _ingest_file(self, path: str, complete: bool) -> dict:
+        result = {"pitches": 0, "feedback": 0, "read": False}
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            first_line = f.readline()
+            if not first_line.endswith(b"\n"):
+                return result  # arquivo vazio ou primeira linha ainda incompleta
+            signature = hashlib.sha1(first_line).hexdigest()
+
+            conn = self._connect()
+            try:
+                # BEGIN IMMEDIATE: vários workers da API podem ingerir ao mesmo tempo
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT offset, complete FROM ingest_files WHERE signature = ?", (signature,)
+                ).fetchone()
+                if row is not None and row["complete"]:
+                    conn.rollback()
+                    return result
+                offset = row["offset"] if row is not None else 0
+
+                # Blocos de INGEST_CHUNK_BYTES; a linha cortada no fim do bloco vai para o próximo
+                f.seek(offset)
+                consumed, pending, n_pitches, n_feedback = 0, b"", 0, 0
+                while True:
+                    chunk = f.read(INGEST_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    data = pending + chunk
+                    end = data.rfind(b"\n") + 1
+                    pending = data[end:]
+                    if not end:
+                        continue
+                    pitches, feedback = self._parse(data[:end].splitlines())
+                    self._apply(conn, pitches, feedback)
+                    consumed += end
+                    n_pitches += len(pitches)
+                    n_feedback += len(feedback)
+                if consumed == 0 and not complete:
+                    conn.rollback()
+                    return result
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingest_files (signature, path, offset, complete, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (signature, os.path.basename(path), offset + consumed, 1 if complete else 0,
+                     datetime.now().isoformat()),
+                )
+                conn.commit()
+                result.update(pitches=n_pitches, feedback=n_feedback, read=True)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+        return result
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, pitches: list, feedback: list):
+        conn.executemany(_INSERT_FEEDBACK, feedback)
+        conn.executemany(_INSERT_PITCH, pitches)
+        # Feedback de pitches já ingeridos: atualiza as flags
+        for kind in ("useful", "sold"):
+            conn.executemany(
+                f"UPDATE pitches SET {kind} = 1 WHERE pitch_id = ?",
+                [(pitch_id,) for pitch_id, _, feedback_type, _ in feedback if feedback_type == kind],
+            )
+
+    @staticmethod
+    def _parse(lines: List[bytes]):
+        pitches, feedback = [], []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            ts = entry.get("timestamp") or ""
+            event = entry.get("event", "pitch_generated")  # entradas antigas não tinham `event`
+            if event == "pitch_feedback":
+                if entry.get("pitch_id"):
+                    feedback.append((entry["pitch_id"], ts, entry.get("feedback_type") or "", entry.get("user_id")))
+            elif event == "pitch_generated":
+                # Entradas antigas sem pitch_id: id estável derivado da própria linha
+                pitch_id = entry.get("pitch_id") or "legacy-" + hashlib.sha1(line).hexdigest()[:16]
+                metadata = entry.get("metadata") or {}
+                vendor = metadata.get("vendor") or entry.get("user_id")
+                pitches.append((
+                    pitch_id, ts, _week_start(ts), entry.get("card_code"), entry.get("target_sku"),
+                    vendor, entry.get("user_id"), pitch_id, pitch_id,
+                ))
+        return pitches, feedback
+
+    # --- Consultas ---
+
+    def conversion(
+        self,
+        group_by: str = "sku",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        vendor: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[dict]:
+        """
+        Conversão agregada por SKU, vendedor, semana ou cliente:
+        pitches gerados, marcados como úteis e vendidos, e as taxas.
+        """
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"group_by inválido: {group_by} (use {', '.join(GROUP_COLUMNS)})")
+        self.ensure_fresh()
+
+        column = GROUP_COLUMNS[group_by]
+        where, params = [], []
+        if start:
+            where.append("ts >= ?")
+            params.append(start)
+        if end:
+            where.append("ts < ?")
+            params.append(end)
+        if vendor:
+            where.append("vendor = ?")
+            params.append(vendor)
+        query = f"""
+            SELECT {column} AS grupo, COUNT(*) AS pitches, SUM(useful) AS useful, SUM(sold) AS sold
+            FROM pitches
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            GROUP BY {column}
+            ORDER BY {'grupo DESC' if group_by == 'week' else 'pitches DESC'}
+            LIMIT ?
+        """
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            {
+                group_by: row["grupo"],
+                "pitches": row["pitches"],
+                "useful": row["useful"],
+                "sold": row["sold"],
+                "useful_rate": round(row["useful"] / row["pitches"], 4) if row["pitches"] else 0.0,
+                "conversion_rate": round(row["sold"] / row["pitches"], 4) if row["pitches"] else 0.0,
+            }
+            for row in rows
+        ]
+
+    def summary(self, vendor: Optional[str] = None) -> dict:
+        self.ensure_fresh()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS pitches, COALESCE(SUM(useful), 0) AS useful, COALESCE(SUM(sold), 0) AS sold, "
+                "MIN(ts) AS first_ts, MAX(ts) AS last_ts FROM pitches"
+                + (" WHERE vendor = ?" if vendor else ""),
+                (vendor,) if vendor else (),
+            ).fetchone()
+        return dict(row)
+
+
+# Instância compartilhada
+_pitch_analytics_instance = None
+_pitch_analytics_lock = threading.Lock()
+
+
+def get_pitch_analytics() -> PitchAnalyticsStore:
+    global _pitch_analytics_instance
+    with _pitch_analytics_lock:
+        if _pitch_analytics_instance is None:
+            from src.core.config import get_settings
+            settings = get_settings()
+            _pitch_analytics_instance = PitchAnalyticsStore(
+                settings.PITCH_ANALYTICS_DB,
+                settings.PITCH_LOG_FILE,
+                refresh_seconds=settings.PITCH_ANALYTICS_REFRESH_SECONDS,
+            )
+    return _pitch_analytics_instance
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestão e consulta do analytics de pitches.")
+    parser.add_argument("--db", default="data/pitch_analytics.db")
+    parser.add_argument("--log", default="logs/pitch_usage.jsonl")
+    parser.add_argument("--group-by", default="sku", choices=sorted(GROUP_COLUMNS))
+    args = parser.parse_args()
+
+    store = PitchAnalyticsStore(args.db, args.log)
+    started = time.perf_counter()
+    print(f"Ingestão: {store.ingest()} em {time.perf_counter() - started:.2f}s")
+    for item in store.conversion(group_by=args.group_by, limit=20):
+        print(item)
@@ -0,0 +1,258 @@
+"""
+Envio de push (Expo) em lote.
+
+- Até 100 mensagens por requisição (limite da Expo Push API).
+- Uma `requests.Session` com pool de conexões reaproveitada entre lotes.
+- Lotes enviados em paralelo (ThreadPoolExecutor) com limite de taxa em
+  mensagens/segundo (token bucket), retry com backoff em 429/5xx e timeout.
+- Cada ticket é tratado individualmente: `DeviceNotRegistered` invalida o
+  token no TokenStore; tickets ok ficam pendentes e os recibos são buscados
+  numa execução posterior (`process_receipts`), sem segurar o envio.
+
+A URL base é configurável (EXPO_PUSH_URL) para testes contra um servidor local.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.core.metrics import PUSH_SENT
+from src.core.structured_logging import get_logger
+
+logger = get_logger("push")
+
+SEND_PATH = "/--/api/v2/push/send"
+RECEIPTS_PATH = "/--/api/v2/push/getReceipts"
+MAX_BATCH = 100
+MAX_RECEIPT_IDS = 1000
+
+
+@dataclass
+class PushMessage:
+    to: str
+    title: str
+    body: str
+    data: Optional[dict] = None
+    sound: str = "default"
+    priority: str = "high"
+
+    def payload(self) -> dict:
+        payload = {"to": self.to, "title": self.title, "body": self.body, "sound": self.sound, "priority": self.priority}
+        if self.data:
+            payload["data"] = self.data
+        return payload
+
+
+@dataclass
+class DispatchResult:
+    sent: int = 0
+    failed: int = 0
+    invalid_tokens: List[str] = field(default_factory=list)
+    tickets: Dict[str, str] = field(default_factory=dict)  # ticket_id -> token
+    errors: Dict[str, int] = field(default_factory=dict)
+    elapsed_s: float = 0.0
+
+    def merge(self, other: "DispatchResult"):
+        self.sent += other.sent
+        self.failed += other.failed
+        self.invalid_tokens.extend(other.invalid_tokens)
+        self.tickets.update(other.tickets)
+        for error, count in other.errors.items():
+            self.errors[error] = self.errors.get(error, 0) + count
+
+
+class RateLimiter:
+    """Token bucket thread-safe (unidades por segundo, com rajada de até `burst`)."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1):
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PushDispatcher:
+    def __init__(
+        self,
+        base_url: str = "https://exp.host",
+        batch_size: int = MAX_BATCH,
+        concurrency: int = 4,
+        rate_per_second: float = 500,
+        timeout: float = 10.0,
+        max_retries: int = 3,
+        access_token: Optional[str] = None,
+        on_invalid_tokens: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = max(1, min(batch_size, MAX_BATCH))
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.on_invalid_tokens = on_invalid_tokens
+        self.limiter = RateLimiter(rate_per_second)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Content-Type": "application/json",
+        })
+        if access_token:
+            self.session.headers["Authorization"] = f"Bearer {access_token}"
+
+    # --- HTTP ---
+
+    def _post(self, path: str, body) -> dict:
+        """POST com retry/backoff em 429, 5xx e erros de conexão."""
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.base_url + path, json=body, timeout=self.timeout)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                return response.json()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt == self.max_retries:
+                    raise
+                retry_after = getattr(getattr(e, "response", None), "headers", {}).get("Retry-After")
+                time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else delay)
+                delay *= 2
+
+    # --- Envio ---
+
+    def send(self, messages: Iterable[PushMessage]) -> DispatchResult:
+        """Envia as mensagens em lotes paralelos e consolida os tickets."""
+        started = time.perf_counter()
+        messages = [m for m in messages if m.to]
+        batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        result = DispatchResult()
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches)), thread_name_prefix="push") as pool:
+                for batch_result in pool.map(self._send_batch, batches):
+                    result.merge(batch_result)
+
+        if result.invalid_tokens and self.on_invalid_tokens:
+            self.on_invalid_tokens(result.invalid_tokens)
+        PUSH_SENT.labels(result="ok").inc(result.sent)
+        PUSH_SENT.labels(result="error").inc(result.failed)
+        result.elapsed_s = time.perf_counter() - started
+        logger.info(
+            "Push enviado",
+            extra={"fields": {
+                "messages": len(messages), "batches": len(batches), "sent": result.sent, "failed": result.failed,
+                "invalid_tokens": len(result.invalid_tokens), "errors": result.errors,
+                "elapsed_ms": round(result.elapsed_s * 1000, 1),
+            }},
+        )
+        return result
+
+    def _send_batch(self, batch: List[PushMessage]) -> DispatchResult:
+        result = DispatchResult()
+        self.limiter.acquire(len(batch))
+        try:
+            tickets = self._post(SEND_PATH, [m.payload() for m in batch]).get("data") or []
+        except Exception as e:
+            logger.error("Falha ao enviar lote de push: %s", e, extra={"fields": {"size": len(batch)}})
+            result.failed = len(batch)
+            result.errors["RequestFailed"] = len(batch)
+            return result
+
+        # Os tickets vêm na mesma ordem das mensagens
+        for message, ticket in zip(batch, tickets):
+            if ticket.get("status") == "ok":
+                result.sent += 1
+                if ticket.get("id"):
+                    result.tickets[ticket["id"]] = message.to
+            else:
+                error = (ticket.get("details") or {}).get("error") or "Unknown"
+                result.failed += 1
+                result.errors[error] = result.errors.get(error, 0) + 1
+                if error == "DeviceNotRegistered":
+                    result.invalid_tokens.append(message.to)
+        missing = len(batch) - len(tickets)
+        if missing > 0:
+            result.failed += missing
+            result.errors["MissingTicket"] = result.errors.get("MissingTicket", 0) + missing
+        return result
+
+    # --- Recibos ---
+
+    def fetch_receipts(self, tickets: Dict[str, str]) -> DispatchResult:
+        """
+        Consulta os recibos (ticket_id -> token). A Expo recomenda esperar ~15 min
+        após o envio; por isso os tickets ficam pendentes e são conferidos depois.
+        """
+        result = DispatchResult()
+        ids = list(tickets)
+        chunks = [ids[i:i + MAX_RECEIPT_IDS] for i in range(0, len(ids), MAX_RECEIPT_IDS)]
+        for chunk in chunks:
+            try:
+                receipts = self._post(RECEIPTS_PATH, {"ids": chunk}).get("data") or {}
+            except Exception as e:
+                logger.error("Falha ao buscar recibos de push: %s", e)
+                continue
+            for ticket_id, receipt in receipts.items():
+                if receipt.get("status") == "ok":
+                    result.sent += 1
+                    continue
+                error = (receipt.get("details") or {}).get("error") or "Unknown"
+                result.failed += 1
+                result.errors[error] = result.errors.get(error, 0) + 1
+                if error == "DeviceNotRegistered" and ticket_id in tickets:
+                    result.invalid_tokens.append(tickets[ticket_id])
+        if result.invalid_tokens and self.on_invalid_tokens:
+            self.on_invalid_tokens(result.invalid_tokens)
+        return result
+
+    def close(self):
+        self.session.close()
+
+
+# Instância compartilhada (reaproveita o pool de conexões entre envios)
+_dispatcher_instance = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_push_dispatcher() -> PushDispatcher:
+    global _dispatcher_instance
+    with _dispatcher_lock:
+        if _dispatcher_instance is None:
+            from src.core.config import get_settings
+            from src.services.token_store import get_token_store
+            settings = get_settings()
+            _dispatcher_instance = PushDispatcher(
+                base_url=settings.EXPO_PUSH_URL,
+                batch_size=settings.PUSH_BATCH_SIZE,
+                concurrency=settings.PUSH_CONCURRENCY,
+                rate_per_second=settings.PUSH_RATE_PER_SECOND,
+                timeout=settings.PUSH_TIMEOUT_SECONDS,
+                access_token=settings.EXPO_ACCESS_TOKEN,
+                on_invalid_tokens=lambda tokens: get_token_store().invalidate(tokens),
+            )
+    return _dispatcher_instance
@@ -0,0 +1,100 @@
+"""
+Base dos modelos pré-calculados em memória (co-compra, cadência, rollup
+mensal, cadastro de itens).
+
+- `ensure_fresh()`: na primeira chamada constrói o modelo de forma síncrona
+  (requisições concorrentes esperam o mesmo build, sem repetir a carga); depois
+  disso, se passou de `refresh_seconds`, dispara o refresh em background e
+  responde com os dados atuais.
+- `refresh()`: incremental (`_refresh`), com rebuild completo a cada
+  `rebuild_seconds`.
+- `shared()`: instância única por classe, criada sob demanda.
+
+Subclasses implementam `_build()` e, se tiverem refresh incremental,
+`_refresh()`; ambos rodam com `_refresh_lock` e trocam as estruturas lidas
+pelas consultas sob `_lock`.
+"""
+import threading
+import time
+from typing import Callable, TypeVar
+
+from src.core.structured_logging import get_logger
+
+logger = get_logger("models")
+
+T = TypeVar("T", bound="RefreshableModel")
+
+# RLock: a factory de um modelo pode pedir a instância compartilhada de outro
+_shared_lock = threading.RLock()
+
+
+class RefreshableModel:
+    def __init__(self, db, refresh_seconds: int = 900, rebuild_seconds: int = 86400):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+
+        # Protege as estruturas lidas pelas consultas
+        self._lock = threading.Lock()
+        # Serializa builds/refreshes (SQL roda fora do _lock)
+        self._refresh_lock = threading.Lock()
+        self._built_at = 0.0
+        self._refreshed_at = 0.0
+
+    @property
+    def is_built(self) -> bool:
+        return self._built_at > 0
+
+    # --- Implementação das subclasses (chamadas com _refresh_lock) ---
+
+    def _build(self):
+        raise NotImplementedError
+
+    def _refresh(self):
+        self._build()
+
+    # --- Ciclo de vida ---
+
+    def build(self):
+        """Reconstrói o modelo do zero."""
+        with self._refresh_lock:
+            self._build()
+            self._built_at = self._refreshed_at = time.time()
+
+    def refresh(self):
+        """Refresh incremental (ou rebuild completo, se o último build passou de `rebuild_seconds`)."""
+        if not self.is_built or time.time() - self._built_at > self.rebuild_seconds:
+            self.build()
+            return
+
+        with self._refresh_lock:
+            self._refresh()
+            self._refreshed_at = time.time()
+
+    def ensure_fresh(self):
+        """Garante que o modelo existe; se estiver velho, atualiza em background."""
+        if not self.is_built:
+            with self._refresh_lock:
+                # Quem esperava o lock reaproveita o build da requisição anterior
+                if not self.is_built:
+                    self._build()
+                    self._built_at = self._refreshed_at = time.time()
+        elif time.time() - self._refreshed_at > self.refresh_seconds and not self._refresh_lock.locked():
+            self._refreshed_at = time.time()  # Evita disparos concorrentes
+            threading.Thread(target=self._safe_refresh, daemon=True).start()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning("Erro no refresh de %s: %s", type(self).__name__, e)
+
+    @classmethod
+    def shared(cls: type[T], factory: Callable[[], T]) -> T:
+        """Instância compartilhada da classe (criada por `factory` na primeira chamada)."""
+        with _shared_lock:
+            instance = cls.__dict__.get("_shared_instance")
+            if instance is None:
+                instance = factory()
+                cls._shared_instance = instance
+        return instance
@@ -0,0 +1,248 @@
+from datetime import datetime
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from src.core.structured_logging import get_logger
+from src.services.item_master import ItemMaster, get_item_master
+from src.services.refreshable import RefreshableModel
+
+logger = get_logger("rollup")
+
+# (cliente, mês, categoria, SKU) -> valor, quantidade, linhas, documentos.
+# Fardos = Quantidade_Fardos / NumInSale, aplicado na leitura pelo cadastro de itens
+ROLLUP_QUERY = """
+SELECT
+    Codigo_Cliente,
+    YEAR(Data_Emissao) as Ano,
+    MONTH(Data_Emissao) as Mes,
+    Categoria_Produto,
+    SKU,
+    MAX(Nome_Produto) as Nome_Produto,
+    SUM(COALESCE(Valor_Liquido, Valor_Total_Linha, 0)) as Valor,
+    SUM(Quantidade) as Quantidade,
+    SUM(CASE WHEN Unidade_Medida NOT IN ('KG', 'TN') THEN Quantidade ELSE 0 END) as Quantidade_Fardos,
+    COUNT(*) as Linhas,
+    SUM(CASE WHEN Unidade_Medida NOT IN ('KG', 'TN') THEN 1 ELSE 0 END) as Linhas_Fardos,
+    COUNT(DISTINCT Numero_Documento) as Documentos
+FROM FAL_IA_Dados_Vendas_Televendas
+WHERE Data_Emissao >= :since
+GROUP BY Codigo_Cliente, YEAR(Data_Emissao), MONTH(Data_Emissao), Categoria_Produto, SKU
+"""
+
+# (cliente, mês) -> contagens distintas que não podem ser somadas a partir das linhas por SKU
+CUSTOMER_MONTH_QUERY = """
+SELECT
+    Codigo_Cliente,
+    YEAR(Data_Emissao) as Ano,
+    MONTH(Data_Emissao) as Mes,
+    COUNT(DISTINCT CASE WHEN Unidade_Medida NOT IN ('KG', 'TN') THEN Data_Emissao END) as Dias_Fardos
+FROM FAL_IA_Dados_Vendas_Televendas
+WHERE Data_Emissao >= :since
+GROUP BY Codigo_Cliente, YEAR(Data_Emissao), MONTH(Data_Emissao)
+"""
+
+# Linhas do mês parcial do início de uma janela em dias (um cliente, índice Codigo_Cliente + Data_Emissao)
+PARTIAL_MONTH_QUERY = """
+SELECT
+    SKU,
+    MAX(Nome_Produto) as Nome_Produto,
+    SUM(Quantidade) as Quantidade_Fardos,
+    COUNT(*) as Linhas_Fardos
+FROM FAL_IA_Dados_Vendas_Televendas
+WHERE Codigo_Cliente = :card_code
+  AND Data_Emissao >= :since
+  AND Data_Emissao < :until
+  AND Unidade_Medida NOT IN ('KG', 'TN')
+GROUP BY SKU
+"""
+
+
+def month_key(value) -> int:
+    """Data -> chave AAAAMM."""
+    value = pd.Timestamp(value)
+    return value.year * 100 + value.month
+
+
+def _month_start(key: int) -> pd.Timestamp:
+    return pd.Timestamp(year=key // 100, month=key % 100, day=1)
+
+
+class SalesRollup(RefreshableModel):
+    """
+    Agregado mensal cliente × mês × categoria × SKU da FAL_IA_Dados_Vendas_Televendas.
+
+    - Duas tabelas em memória, indexadas por Codigo_Cliente (uma consulta lê
+      só a fatia do cliente, sem varrer linhas de nota):
+      `lines` (valor, quantidade, quantidade em fardos, linhas e documentos
+      por SKU) e `months` (dias com compra de fardos por
+      cliente × mês, contagem que não soma por SKU).
+    - Refresh incremental: reagrega só a partir do mês do último refresh
+      (o mês corrente inteiro é recalculado, então contagens distintas ficam
+      corretas) e substitui esses meses. Rebuild completo diário.
+    - As janelas em dias são aproximadas para meses inteiros: entram os meses
+      que tocam o período pedido. Exceção: `bales_breakdown` lê o mês parcial
+      do início da janela das notas, então bate com a consulta por dias. A média por pedido dos 180 dias antes da
+      última compra (janela exata) fica na tabela de cadência
+      (`CustomerCadenceModel.profile_average`), não aqui.
+    - A divisão por OITM.NumInSale acontece na leitura (`item_master`), então
+      uma recarga do cadastro vale na hora para todo o histórico agregado.
+    """
+
+    def __init__(self, db, history_months: int = 24, refresh_seconds: int = 900, rebuild_seconds: int = 86400,
+                 item_master: Optional[ItemMaster] = None):
+        super().__init__(db, refresh_seconds=refresh_seconds, rebuild_seconds=rebuild_seconds)
+        self.item_master = item_master or ItemMaster(db)
+        self.history_months = history_months
+
+        self._lines = pd.DataFrame()
+        self._months = pd.DataFrame()
+        self._first_month: Optional[int] = None
+        self._watermark: Optional[int] = None  # Mês (AAAAMM) a partir do qual o próximo refresh reagrega
+
+    def covers(self, since) -> bool:
+        """True se o histórico em memória começa antes de `since`."""
+        return self._first_month is not None and month_key(since) >= self._first_month
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": len(self._lines),
+                "customer_months": len(self._months),
+                "customers": self._months.index.nunique() if not self._months.empty else 0,
+                "first_month": self._first_month,
+                "built_at": datetime.fromtimestamp(self._built_at).isoformat() if self._built_at else None,
+            }
+
+    # --- Carga ---
+
+    def _fetch(self, since: pd.Timestamp):
+        params = {"since": since.strftime("%Y-%m-%d")}
+        lines = self.db.get_dataframe(ROLLUP_QUERY, params=params)
+        months = self.db.get_dataframe(CUSTOMER_MONTH_QUERY, params=params)
+        return self._prepare(lines), self._prepare(months)
+
+    @staticmethod
+    def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty:
+            return df
+        df = df.copy()
+        df["Mes"] = (pd.to_numeric(df["Ano"]) * 100 + pd.to_numeric(df["Mes"])).astype(int)
+        df = df.drop(columns=["Ano"])
+        for column in ("Valor", "Quantidade", "Quantidade_Fardos", "Linhas", "Linhas_Fardos", "Documentos", "Dias_Fardos"):
+            if column in df.columns:
+                df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0.0)
+        return df.set_index("Codigo_Cliente").sort_index()
+
+    def _build(self):
+        """Reagrega toda a janela configurada."""
+        first = (pd.Timestamp.now().to_period("M") - (self.history_months - 1)).start_time
+        lines, months = self._fetch(first)
+        with self._lock:
+            self._lines, self._months = lines, months
+            self._first_month = month_key(first)
+            self._watermark = month_key(pd.Timestamp.now())
+        logger.info("Rollup mensal calculado", extra={"fields": {"rows": len(lines), "customer_months": len(months)}})
+
+    def _refresh(self):
+        """Reagrega a partir do mês do último refresh e substitui esses meses."""
+        watermark = self._watermark
+        lines, months = self._fetch(_month_start(watermark))
+        with self._lock:
+            self._lines = self._replace(self._lines, lines, watermark)
+            self._months = self._replace(self._months, months, watermark)
+            self._watermark = month_key(pd.Timestamp.now())
+
+    @staticmethod
+    def _replace(current: pd.DataFrame, fresh: pd.DataFrame, from_month: int) -> pd.DataFrame:
+        kept = current[current["Mes"] < from_month] if not current.empty else current
+        return pd.concat([kept, fresh]).sort_index() if not fresh.empty else kept
+
+    # --- Consulta ---
+
+    @staticmethod
+    def _slice(df: pd.DataFrame, card_code: str) -> pd.DataFrame:
+        if df.empty or card_code not in df.index:
+            return df.iloc[0:0]
+        return df.loc[[card_code]]
+
+    def customer_lines(self, card_code: str, since=None) -> pd.DataFrame:
+        """Linhas do rollup de um cliente (a partir do mês de `since`)."""
+        self.ensure_fresh()
+        with self._lock:
+            rows = self._slice(self._lines, card_code)
+        if since is not None and not rows.empty:
+            rows = rows[rows["Mes"] >= month_key(since)]
+        return rows
+
+    def trend_frame(self, card_code: str, since) -> pd.DataFrame:
+        """Entrada de `sales_trend.build_trend` (Data_Emissao = 1º dia do mês)."""
+        rows = self.customer_lines(card_code, since)
+        return pd.DataFrame({
+            "Data_Emissao": [_month_start(key) for key in rows["Mes"]],
+            "Categoria_Produto": rows["Categoria_Produto"].to_numpy(),
+            "Total": rows["Valor"].to_numpy(),
+        })
+
+    def bales_breakdown(self, card_code: str, days: int = 180) -> pd.DataFrame:
+        """
+        Média de fardos por linha de cada SKU do cliente (exclui KG/TN) nos
+        últimos `days` dias exatos: meses inteiros do rollup mais o mês
+        parcial do início da janela, lido das notas do cliente.
+        """
+        since = pd.Timestamp.now() - pd.Timedelta(days=days)
+        next_month = (since.to_period("M") + 1).start_time
+        rows = self.customer_lines(card_code, next_month)
+        partial = self.db.get_dataframe(PARTIAL_MONTH_QUERY, params={
+            "card_code": card_code,
+            "since": since.strftime("%Y-%m-%d %H:%M:%S"),
+            "until": next_month.strftime("%Y-%m-%d"),
+        })
+        if not partial.empty:
+            for column in ("Quantidade_Fardos", "Linhas_Fardos"):
+                partial[column] = pd.to_numeric(partial[column], errors="coerce").fillna(0.0)
+            rows = pd.concat([rows, partial], ignore_index=True)
+        rows = rows[rows["Linhas_Fardos"] > 0]
+        columns = ["SKU", "Produto", "Media_SKU", "Vezes_Comprado"]
+        if rows.empty:
+            return pd.DataFrame(columns=columns)
+        grouped = rows.groupby("SKU", sort=False).agg(
+            Produto=("Nome_Produto", "max"), Quantidade=("Quantidade_Fardos", "sum"),
+            Vezes_Comprado=("Linhas_Fardos", "sum"),
+        )
+        grouped["Fardos"] = self.item_master.to_bales(grouped["Quantidade"], grouped.index.to_series())
+        grouped["Media_SKU"] = (grouped["Fardos"] / grouped["Vezes_Comprado"]).round(1)
+        grouped["Vezes_Comprado"] = grouped["Vezes_Comprado"].astype(int)
+        return grouped.reset_index().sort_values("Media_SKU", ascending=False)[columns].reset_index(drop=True)
+
+    def average_bales(self, card_codes: Optional[Iterable[str]] = None, months: int = 6) -> pd.Series:
+        """Média de fardos por dia de compra (exclui KG/TN) por cliente, nos últimos `months` meses."""
+        self.ensure_fresh()
+        since = month_key((pd.Timestamp.now() - pd.DateOffset(months=months)))
+        with self._lock:
+            lines, customer_months = self._lines, self._months
+        if lines.empty:
+            return pd.Series(dtype=float)
+        # NumInSale é constante por SKU: soma por cliente × SKU antes de converter
+        quantities = lines.loc[lines["Mes"] >= since].groupby([lines.index.name, "SKU"])["Quantidade_Fardos"].sum()
+        skus = quantities.index.get_level_values("SKU").to_series(index=quantities.index)
+        fardos = self.item_master.to_bales(quantities, skus).groupby(level=0).sum()
+        days = customer_months.loc[customer_months["Mes"] >= since, "Dias_Fardos"].groupby(level=0).sum()
+        average = (fardos / days.where(days > 0)).dropna().round(2)
+        if card_codes is not None:
+            average = average.reindex(pd.Index(list(card_codes))).fillna(0.0)
+        return average
+
+
+def get_sales_rollup(db) -> SalesRollup:
+    """Instância compartilhada (a carga inicial agrega a janela inteira)."""
+    def create():
+        from src.core.config import get_settings
+        settings = get_settings()
+        return SalesRollup(
+            db,
+            history_months=settings.SALES_ROLLUP_HISTORY_MONTHS,
+            refresh_seconds=settings.SALES_ROLLUP_REFRESH_SECONDS,
+            item_master=get_item_master(db),
+        )
+    return SalesRollup.shared(create)
@@ -0,0 +1,128 @@
+"""
+Tendência de vendas por categoria para os gráficos do app.
+
+A query agrega por Data_Emissao + Categoria_Produto, sem função sobre a
+coluna (o filtro de data é um parâmetro e usa o índice; nada de FORMAT por
+linha), e o resto é feito em pandas
+numa passada: categoria por regra de palavra-chave (np.select nos valores
+distintos), período (semana/mês/trimestre) via `to_period` e um único
+`pivot_table`, reindexado para todos os períodos da janela.
+"""
+import unicodedata
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+GRANULARITIES = {"week": "W-SUN", "month": "M", "quarter": "Q"}
+DEFAULT_PERIODS = {"week": 12, "month": 6, "quarter": 4}
+PALETTE = ["#1A2F5A", "#22C55E", "#F97316", "#8B5CF6", "#EAB308", "#06B6D4", "#EF4444", "#64748B"]
+OTHER = "Outros"
+
+TREND_QUERY = """
+SELECT
+    Data_Emissao,
+    Categoria_Produto,
+    SUM(COALESCE(Valor_Liquido, Valor_Total_Linha, 0)) as Total
+FROM FAL_IA_Dados_Vendas_Televendas
+WHERE Codigo_Cliente = :card_code
+  AND Data_Emissao >= :since
+GROUP BY Data_Emissao, Categoria_Produto
+"""
+
+
+@dataclass
+class TrendCategory:
+    name: str
+    keyword: str  # Trecho procurado em Categoria_Produto (sem acento, maiúsculas)
+    color: Optional[str] = None
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(char for char in text if not unicodedata.combining(char)).upper()
+
+
+def parse_categories(spec: str) -> List[TrendCategory]:
+    """'Arroz=ARROZ,Feijão=FEIJAO' (ou só 'Arroz,Café': palavra-chave = nome) -> categorias com cor."""
+    categories = []
+    for index, item in enumerate(part.strip() for part in spec.split(",")):
+        if not item:
+            continue
+        name, _, keyword = item.partition("=")
+        categories.append(TrendCategory(name.strip(), _normalize(keyword.strip() or name.strip()),
+                                        PALETTE[index % len(PALETTE)]))
+    return categories
+
+
+def window_start(granularity: str, periods: int, today: Optional[pd.Timestamp] = None) -> pd.Timestamp:
+    """Início do período mais antigo da janela (`periods` períodos, incluindo o atual)."""
+    if not 1 <= periods <= 260:
+        raise ValueError("periods deve estar entre 1 e 260")
+    current = (today or pd.Timestamp.now()).to_period(_freq(granularity))
+    return (current - (periods - 1)).start_time
+
+
+def build_trend(
+    df: pd.DataFrame,
+    categories: List[TrendCategory],
+    granularity: str = "month",
+    periods: int = 6,
+    today: Optional[pd.Timestamp] = None,
+    include_other: bool = False,
+) -> dict:
+    """
+    Agregado por data (Data_Emissao, Categoria_Produto, Total) -> {labels, datasets}
+    no formato do gráfico. Períodos sem venda aparecem com 0.
+    """
+    if df.empty:
+        return {"labels": [], "datasets": []}
+
+    freq = _freq(granularity)
+    dates = pd.to_datetime(df["Data_Emissao"])
+
+    # Categoria: regra avaliada só nos valores distintos de Categoria_Produto
+    codes, uniques = pd.factorize(df["Categoria_Produto"].fillna(""))
+    normalized = pd.Series([_normalize(value) for value in uniques], dtype=object)
+    labels = np.select(
+        [normalized.str.contains(category.keyword, regex=False).to_numpy() for category in categories],
+        [category.name for category in categories],
+        default=OTHER,
+    ) if categories else np.full(len(uniques), OTHER, dtype=object)
+    category = labels[codes] if len(uniques) else np.array([], dtype=object)
+
+    current = (today or pd.Timestamp.now()).to_period(freq)
+    window = pd.period_range(end=current, periods=periods, freq=freq)
+    pivot = pd.DataFrame({
+        "Periodo": dates.dt.to_period(freq),
+        "Categoria": category,
+        "Total": pd.to_numeric(df["Total"], errors="coerce").fillna(0.0).to_numpy(),
+    }).pivot_table(index="Periodo", columns="Categoria", values="Total", aggfunc="sum", fill_value=0.0)
+
+    series = list(categories)
+    if include_other:
+        series.append(TrendCategory(OTHER, "", PALETTE[-1]))
+    pivot = pivot.reindex(index=window, columns=[item.name for item in series], fill_value=0.0)
+
+    return {
+        "labels": [_label(period, granularity) for period in window],
+        "datasets": [
+            {"name": item.name, "data": pivot[item.name].astype(float).round(2).tolist(), "color": item.color}
+            for item in series
+        ],
+    }
+
+
+def _freq(granularity: str) -> str:
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularidade inválida: {granularity} (use {', '.join(GRANULARITIES)})")
+    return GRANULARITIES[granularity]
+
+
+def _label(period: pd.Period, granularity: str) -> str:
+    if granularity == "week":
+        return period.start_time.strftime("%d/%m")
+    if granularity == "quarter":
+        return f"T{period.quarter}/{period.start_time.strftime('%y')}"
+    return period.start_time.strftime("%m/%y")
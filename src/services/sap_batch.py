@@ -0,0 +1,133 @@
+"""
+Codificação de requisições OData `$batch` do SAP B1 Service Layer.
+
+Um `$batch` leva várias operações num único POST (multipart/mixed). Cada
+escrita vai no seu próprio changeset: o Service Layer executa o changeset de
+forma atômica, então um pedido rejeitado não desfaz os outros do mesmo lote.
+Leituras (GET) vão soltas no batch. A resposta traz um resultado por
+operação, na mesma ordem.
+"""
+import json
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+CRLF = b"\r\n"
+
+
+@dataclass
+class BatchOperation:
+    method: str
+    path: str  # Relativo à raiz do Service Layer (ex: "Orders", "Items('0005')")
+    payload: Optional[dict] = None
+
+
+@dataclass
+class BatchResult:
+    status: int
+    body: object = None  # JSON decodificado (ou texto, se não for JSON)
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+
+def encode_batch(operations: List[BatchOperation], base_path: str) -> Tuple[str, bytes]:
+    """Retorna (content_type, corpo) do POST $batch."""
+    boundary = f"batch_{uuid.uuid4().hex}"
+    base_path = base_path.rstrip("/")
+    lines: List[bytes] = []
+    for index, op in enumerate(operations, start=1):
+        request = _encode_request(op, base_path)
+        lines.append(f"--{boundary}".encode())
+        if op.method.upper() == "GET":
+            lines += [b"Content-Type: application/http", b"Content-Transfer-Encoding: binary", b"", request]
+        else:
+            changeset = f"changeset_{uuid.uuid4().hex}"
+            lines += [
+                f"Content-Type: multipart/mixed;boundary={changeset}".encode(), b"",
+                f"--{changeset}".encode(),
+                b"Content-Type: application/http", b"Content-Transfer-Encoding: binary",
+                f"Content-ID: {index}".encode(), b"",
+                request,
+                f"--{changeset}--".encode(),
+            ]
+    lines.append(f"--{boundary}--".encode())
+    return f"multipart/mixed;boundary={boundary}", CRLF.join(lines) + CRLF
+
+
+def _encode_request(op: BatchOperation, base_path: str) -> bytes:
+    head = f"{op.method.upper()} {base_path}/{op.path.lstrip('/')} HTTP/1.1".encode()
+    if op.payload is None:
+        return head + CRLF
+    body = json.dumps(op.payload, ensure_ascii=False).encode()
+    return CRLF.join([head, b"Content-Type: application/json", b"", body])
+
+
+def decode_batch(content_type: str, raw: bytes) -> List[BatchResult]:
+    """Resultados de uma resposta $batch, um por operação, na ordem enviada."""
+    results = []
+    for start_line, _headers, body in _messages(content_type, raw):
+        parts = start_line.split(" ", 2)
+        results.append(BatchResult(int(parts[1]), _json_or_text(body)))
+    return results
+
+
+def decode_batch_request(content_type: str, raw: bytes) -> List[BatchOperation]:
+    """Operações de uma requisição $batch (usado pelo stand-in de testes)."""
+    operations = []
+    for start_line, _headers, body in _messages(content_type, raw):
+        method, target = start_line.split(" ")[:2]
+        operations.append(BatchOperation(method, target, json.loads(body) if body.strip() else None))
+    return operations
+
+
+def _messages(content_type: str, raw: bytes):
+    """Percorre as partes (e changesets aninhados) devolvendo (linha inicial, headers, corpo)."""
+    for headers, body in _split(raw, _boundary(content_type)):
+        part_type = headers.get("content-type", "")
+        if part_type.startswith("multipart/mixed"):
+            yield from _messages(part_type, body)
+        else:
+            yield _parse_http(body)
+
+
+def _boundary(content_type: str) -> str:
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary":
+            return value.strip('"')
+    raise ValueError(f"Content-Type sem boundary: {content_type}")
+
+
+def _split(raw: bytes, boundary: str):
+    delimiter = b"--" + boundary.encode()
+    for chunk in raw.split(delimiter)[1:]:
+        if chunk.startswith(b"--"):
+            break
+        yield _parse_headers(chunk.strip(b"\r\n"))
+
+
+def _parse_headers(chunk: bytes):
+    head, _, body = chunk.replace(CRLF, b"\n").partition(b"\n\n")
+    headers = {}
+    for line in head.decode("utf-8", "replace").split("\n"):
+        key, sep, value = line.partition(":")
+        if sep:
+            headers[key.strip().lower()] = value.strip()
+    return headers, body.strip(b"\n")
+
+
+def _parse_http(message: bytes):
+    start_line, _, rest = message.replace(CRLF, b"\n").partition(b"\n")
+    headers, body = _parse_headers(rest) if rest.strip() else ({}, b"")
+    return start_line.decode("utf-8", "replace").strip(), headers, body
+
+
+def _json_or_text(body: bytes):
+    if not body.strip():
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", "replace")
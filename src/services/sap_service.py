@@ -1,116 +1,310 @@
-
 import json
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, List, Optional, Union
+from urllib.parse import quote, urlparse
+
 import requests
-import datetime
-from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
 from src.core.config import get_settings
+from src.core.structured_logging import get_logger
+from src.services.sap_batch import BatchOperation, BatchResult, decode_batch, encode_batch
+
+logger = get_logger("sap")
+
+
+class SapServiceError(Exception):
+    """
+    Erro do Service Layer. `retryable` indica falha transitória (rede,
+    timeout, 429, 5xx); erros de negócio (400 etc.) não adiantam repetir.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+    @classmethod
+    def from_response(cls, response: requests.Response) -> "SapServiceError":
+        try:
+            detail = json.dumps(response.json(), ensure_ascii=False)
+        except Exception:
+            detail = response.text
+        return cls.from_status(response.status_code, detail)
+
+    @classmethod
+    def from_status(cls, status: int, detail) -> "SapServiceError":
+        if not isinstance(detail, str):
+            detail = json.dumps(detail, ensure_ascii=False)
+        return cls(detail, status_code=status, retryable=status in (401, 408, 429) or status >= 500)
+
 
 class SapService:
-    def __init__(self):
-        self.settings = get_settings()
-        self.base_url = self.settings.SAP_SL_URL
+    """
+    Cliente do SAP B1 Service Layer.
+
+    - Uma `requests.Session` com pool de conexões (keep-alive): pedidos não
+      pagam um handshake TCP/TLS novo a cada chamada.
+    - O ciclo de vida da sessão B1SESSION é protegido por lock: várias threads
+      que recebem 401 ao mesmo tempo disparam um único re-login.
+    - A sessão é renovada antes de expirar (timeout informado no Login,
+      deslizante a cada uso, menos uma margem).
+    - `SAP_MAX_CONCURRENCY` limita as chamadas simultâneas ao Service Layer.
+    - `batch`/`create_orders`/`get_items_stock` agrupam várias operações em
+      OData $batch (um round trip por lote, resultado por operação).
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings or get_settings()
+        self.base_url = self.settings.SAP_SL_URL.rstrip("/")
+        self.verify_ssl = self.settings.SAP_VERIFY_SSL
+        self.timeout = self.settings.SAP_TIMEOUT_SECONDS
+        self.refresh_margin = self.settings.SAP_SESSION_REFRESH_MARGIN_SECONDS
+        self.batch_size = self.settings.SAP_BATCH_MAX_OPERATIONS
+
         self.session_id = None
         self.route_id = None
-        self.verify_ssl = self.settings.SAP_VERIFY_SSL
+        self._session_timeout = self.settings.SAP_SESSION_TIMEOUT_MINUTES * 60
+        self._last_used = 0.0
+        # Incrementa a cada login: um 401 só invalida a sessão com que a requisição foi feita
+        self._generation = 0
+        self._session_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.settings.SAP_MAX_CONCURRENCY)
 
-    def _get_headers(self):
-        headers = {'Content-Type': 'application/json'}
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.settings.SAP_MAX_CONCURRENCY)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+        self.http.verify = self.verify_ssl
+        # Os cookies de sessão são enviados explicitamente (estado controlado pelo lock)
+        self.http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def _get_headers(self, session_id=None, route_id=None, content_type='application/json'):
+        headers = {'Content-Type': content_type}
         cookies = {}
-        if self.session_id:
-            cookies['B1SESSION'] = self.session_id
-        if self.route_id:
-            cookies['ROUTEID'] = self.route_id
-        
+        if session_id:
+            cookies['B1SESSION'] = session_id
+        if route_id:
+            cookies['ROUTEID'] = route_id
+
         cookie_string = "; ".join([f"{k}={v}" for k, v in cookies.items()])
         if cookie_string:
             headers['Cookie'] = cookie_string
-            
+
         return headers
 
+    # --- Sessão ---
+
+    def _session_valid(self) -> bool:
+        return bool(self.session_id) and \
+            time.monotonic() < self._last_used + self._session_timeout - self.refresh_margin
+
+    def _ensure_session(self):
+        """Retorna (session_id, route_id, generation), logando se necessário (uma thread por vez)."""
+        if not self._session_valid():
+            with self._session_lock:
+                if not self._session_valid():
+                    self._login_locked()
+        return self.session_id, self.route_id, self._generation
+
+    def _invalidate(self, generation: int):
+        """Descarta a sessão após 401, se ninguém já tiver renovado."""
+        with self._session_lock:
+            if generation == self._generation:
+                self.session_id = None
+
     def login(self):
+        with self._session_lock:
+            return self._login_locked()
+
+    def _login_locked(self):
         url = f"{self.base_url}/Login"
         payload = {
             "CompanyDB": self.settings.SAP_DB,
             "UserName": self.settings.SAP_USER,
             "Password": self.settings.SAP_PASSWORD
         }
-        
+
         try:
-            print(f"SAP LOGIN Attempt: {self.base_url} (DB: {self.settings.SAP_DB})")
-            response = requests.post(url, json=payload, verify=self.verify_ssl, timeout=15)
+            logger.info("SAP LOGIN Attempt: %s (DB: %s)", self.base_url, self.settings.SAP_DB)
+            with self._slots:
+                response = self.http.post(url, json=payload, timeout=15)
             response.raise_for_status()
-            
+
             data = response.json()
             self.session_id = data.get('SessionId')
-            
+            if data.get('SessionTimeout'):
+                self._session_timeout = int(data['SessionTimeout']) * 60
+
             # RouteID is often in cookies for Load Balancer affinity
             if 'ROUTEID' in response.cookies:
                 self.route_id = response.cookies['ROUTEID']
-                
-            print("SAP LOGIN Success")
+
+            self._last_used = time.monotonic()
+            self._generation += 1
+            logger.info("SAP LOGIN Success")
             return True
         except Exception as e:
-            print(f"SAP LOGIN Error: {e}")
-            if hasattr(e, 'response') and e.response:
-                print(f"SAP Response: {e.response.text}")
-            raise HTTPException(status_code=500, detail=f"SAP Login Failed: {str(e)}")
+            response = getattr(e, 'response', None)
+            logger.error(
+                "SAP LOGIN Error: %s", e,
+                extra={"fields": {"sap_response": response.text if response is not None else None}},
+            )
+            status = response.status_code if response is not None else None
+            raise SapServiceError(
+                f"SAP Login Failed: {str(e)}", status_code=status,
+                retryable=status is None or status == 429 or status >= 500,
+            ) from e
 
     def logout(self):
-        if not self.session_id:
-            return
-            
-        url = f"{self.base_url}/Logout"
-        try:
-            requests.post(url, headers=self._get_headers(), verify=self.verify_ssl)
+        with self._session_lock:
+            if not self.session_id:
+                return
+            url = f"{self.base_url}/Logout"
+            try:
+                self.http.post(url, headers=self._get_headers(self.session_id, self.route_id), timeout=self.timeout)
+            except Exception:
+                pass
             self.session_id = None
             self.route_id = None
-        except:
-            pass
+
+    def close(self):
+        self.logout()
+        self.http.close()
+
+    # --- Requisições ---
+
+    def request(self, method: str, path: str, payload=None, timeout: Optional[float] = None,
+                data: Optional[bytes] = None, content_type: str = 'application/json') -> requests.Response:
+        """
+        Chamada autenticada ao Service Layer (pool de conexões + limite de
+        concorrência). Em 401, renova a sessão uma vez e repete.
+        `data`/`content_type` enviam um corpo já codificado (ex: $batch).
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(2):
+            session_id, route_id, generation = self._ensure_session()
+            with self._slots:
+                response = self.http.request(
+                    method, url, json=payload, data=data,
+                    headers=self._get_headers(session_id, route_id, content_type),
+                    timeout=timeout or self.timeout,
+                )
+            if response.status_code == 401 and attempt == 0:
+                logger.info("SAP Session expired. Re-logging...")
+                self._invalidate(generation)
+                continue
+            if response.status_code < 400:
+                self._last_used = time.monotonic()
+            return response
+        return response
 
     def create_order(self, order_payload):
         """
         Creates a Sales Order (Note) in SAP via Service Layer.
-        Auto-logins if session is missing.
+        Auto-logins if session is missing or about to expire.
+        Raises SapServiceError (a API traduz para HTTP; a fila decide se repete).
         """
-        if not self.session_id:
-            self.login()
-            
-        url = f"{self.base_url}/Orders"
-        
+        logger.info("Creating SAP Order...")
         try:
-            print("Creating SAP Order...")
-            response = requests.post(url, json=order_payload, headers=self._get_headers(), verify=self.verify_ssl, timeout=30)
-            
-            # If session expired, retry once
-            if response.status_code == 401:
-                print("SAP Session expired. Re-logging...")
-                self.login()
-                response = requests.post(url, json=order_payload, headers=self._get_headers(), verify=self.verify_ssl, timeout=30)
-                
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.HTTPError as e:
-            error_detail = "SAP Error"
+            response = self.request("POST", "Orders", order_payload)
+        except requests.RequestException as e:
+            raise SapServiceError(f"SAP unreachable: {e}", retryable=True) from e
+        if response.status_code >= 400:
+            error = SapServiceError.from_response(response)
+            logger.warning("SAP API Error: %s", error, extra={"fields": {"status": response.status_code}})
+            raise error
+        return response.json()
+
+    def find_order_by_key(self, field: str, key: str) -> Optional[dict]:
+        """Busca um pedido já criado pela chave de idempotência (campo do cabeçalho, ex: UDF)."""
+        safe_key = quote(key.replace("'", "''"), safe="")
+        try:
+            response = self.request(
+                "GET", f"Orders?$filter={field} eq '{safe_key}'&$select=DocEntry,DocNum&$top=1"
+            )
+        except requests.RequestException as e:
+            raise SapServiceError(f"SAP unreachable: {e}", retryable=True) from e
+        if response.status_code >= 400:
+            raise SapServiceError.from_response(response)
+        orders = response.json().get("value") or []
+        return orders[0] if orders else None
+
+    # --- $batch ---
+
+    def batch(self, operations: List[BatchOperation], timeout: Optional[float] = None) -> List[BatchResult]:
+        """
+        Executa as operações em requisições OData $batch (até
+        SAP_BATCH_MAX_OPERATIONS por POST) e devolve um resultado por
+        operação, na ordem. Falhas de uma operação vêm no seu BatchResult;
+        só falhas do $batch inteiro (rede, sessão, 5xx, resposta truncada)
+        levantam SapServiceError, e aí POSTs de blocos anteriores (ou do
+        próprio bloco) podem já ter sido gravados.
+        """
+        base_path = urlparse(self.base_url).path
+        results: List[BatchResult] = []
+        for start in range(0, len(operations), self.batch_size):
+            chunk = operations[start:start + self.batch_size]
+            content_type, body = encode_batch(chunk, base_path)
             try:
-                error_json = e.response.json()
-                error_detail = json.dumps(error_json)
-                print(f"SAP API Error: {error_detail}")
-            except:
-                print(f"SAP Raw Error: {e.response.text}")
-                error_detail = e.response.text
-                
-            raise HTTPException(status_code=400, detail=f"SAP Creation Failed: {error_detail}")
-        except Exception as e:
-            print(f"Unexpected SAP Error: {e}")
-            raise HTTPException(status_code=500, detail=f"Unexpected Error: {str(e)}")
+                response = self.request("POST", "$batch", data=body, content_type=content_type, timeout=timeout)
+            except requests.RequestException as e:
+                raise SapServiceError(f"SAP unreachable: {e}", retryable=True) from e
+            if response.status_code >= 400:
+                raise SapServiceError.from_response(response)
+            chunk_results = decode_batch(response.headers.get("Content-Type", ""), response.content)
+            if len(chunk_results) != len(chunk):
+                # Sem status: as operações podem ter sido executadas, o resultado é incerto
+                raise SapServiceError(
+                    f"Resposta $batch com {len(chunk_results)} resultados para {len(chunk)} operações",
+                    retryable=True,
+                )
+            results.extend(chunk_results)
+        return results
+
+    def create_orders(self, order_payloads: List[dict]) -> List[Union[dict, SapServiceError]]:
+        """
+        Cria vários pedidos com $batch (um changeset por pedido: a rejeição de
+        um não desfaz os outros). Retorna, por pedido, o documento criado ou o
+        SapServiceError correspondente.
+        """
+        if not order_payloads:
+            return []
+        logger.info("Creating SAP Orders via $batch", extra={"fields": {"orders": len(order_payloads)}})
+        results = self.batch([BatchOperation("POST", "Orders", payload) for payload in order_payloads])
+        return [
+            result.body if result.ok else SapServiceError.from_status(result.status, result.body)
+            for result in results
+        ]
+
+    def get_items_stock(self, item_codes: List[str]) -> Dict[str, Optional[dict]]:
+        """Estoque de vários itens num único $batch (None para item inexistente)."""
+        codes = list(dict.fromkeys(item_codes))
+        operations = [
+            BatchOperation(
+                "GET", "Items('{}')?$select=ItemCode,ItemName,QuantityOnStock".format(code.replace("'", "''")),
+            )
+            for code in codes
+        ]
+        stock: Dict[str, Optional[dict]] = {}
+        for code, result in zip(codes, self.batch(operations)):
+            if result.status == 404:
+                stock[code] = None
+            elif not result.ok:
+                raise SapServiceError.from_status(result.status, result.body)
+            else:
+                stock[code] = result.body
+        return stock
 
-# Singleton instance to reuse session across requests (simple version)
-# In production, consider request-scoped or better session management.
+# Instância compartilhada: o pool de conexões e a sessão B1SESSION são
+# reaproveitados entre requisições (thread-safe).
 _sap_service_instance = None
+_sap_service_lock = threading.Lock()
 
 def get_sap_service():
     global _sap_service_instance
-    if _sap_service_instance is None:
-        _sap_service_instance = SapService()
+    with _sap_service_lock:
+        if _sap_service_instance is None:
+            _sap_service_instance = SapService()
     return _sap_service_instance
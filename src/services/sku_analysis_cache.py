@@ -0,0 +1,123 @@
+"""
+Cache em disco (SQLite) das análises de SKU do InventoryAgent.
+
+- Endereçado por conteúdo: a chave é o hash de (modelo, versão do prompt,
+  SKU, hash do contexto). Mudou o contexto, o modelo ou o texto do prompt,
+  a chave muda e o SKU é analisado de novo; nada precisa ser invalidado.
+- Tamanho limitado (`max_bytes`): ao passar do limite, as entradas usadas
+  há mais tempo são removidas (LRU por `last_access`) até 90% do limite.
+- Só análises bem-sucedidas entram no cache (erros são refeitos).
+- `stats()` traz hits, misses, gravações, remoções e ocupação.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from src.core.structured_logging import get_logger
+
+logger = get_logger("sku_cache")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sku_analyses (
+    cache_key TEXT PRIMARY KEY,
+    sku TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sku_analyses_last_access ON sku_analyses (last_access);
+"""
+
+
+def cache_key(sku: str, context: str, model_id: str, prompt_version: str) -> str:
+    context_hash = hashlib.sha256(context.strip().encode("utf-8")).hexdigest()
+    raw = "\x1f".join([model_id, prompt_version, sku.strip().upper(), context_hash])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SkuAnalysisCache:
+    def __init__(self, db_path: str, max_bytes: int = 200 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM sku_analyses").fetchone()[0]
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def get(self, sku: str, context: str, model_id: str, prompt_version: str) -> Optional[str]:
+        key = cache_key(sku, context, model_id, prompt_version)
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM sku_analyses WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._conn.execute("UPDATE sku_analyses SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, sku: str, context: str, model_id: str, prompt_version: str, result: str):
+        key = cache_key(sku, context, model_id, prompt_version)
+        size = len(result.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM sku_analyses WHERE cache_key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sku_analyses "
+                "(cache_key, sku, model_id, prompt_version, result, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, sku.strip(), model_id, prompt_version, result, size, now, now),
+            )
+            self._bytes += size - (previous[0] if previous else 0)
+            self._counters["writes"] += 1
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Chamado com o lock. Remove as entradas menos usadas até 90% do limite."""
+        target = int(self.max_bytes * 0.9)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Recalcula: outro processo pode ter gravado/removido entradas
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM sku_analyses").fetchone()[0]
+            cursor = self._conn.execute("SELECT cache_key, size FROM sku_analyses ORDER BY last_access")
+            victims = []
+            for key, size in cursor:
+                if total <= target:
+                    break
+                victims.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM sku_analyses WHERE cache_key = ?", victims)
+            removed = len(victims)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._bytes = total
+        self._counters["evictions"] += removed
+        logger.info("Cache de SKUs podado", extra={"fields": {"removed": removed, "bytes": total}})
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM sku_analyses").fetchone()[0]
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        return dict(
+            counters,
+            entries=entries,
+            bytes=self._bytes,
+            max_bytes=self.max_bytes,
+            hit_ratio=round(counters["hits"] / lookups, 3) if lookups else 0.0,
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
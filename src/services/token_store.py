@@ -0,0 +1,205 @@
+"""
+Store de tokens de push (Expo) em SQLite, com cache de leitura em memória.
+
+- Um usuário pode ter vários dispositivos; o token é a chave primária (um
+  aparelho reinstalado/reatribuído troca de dono num upsert).
+- As leituras vêm de um dict user_id -> tokens (O(1)). Escritas de outros
+  processos (API x job de churn) são detectadas por `PRAGMA data_version`,
+  que muda quando outra conexão faz commit: só então o cache é recarregado.
+- Tokens que o Expo reporta como `DeviceNotRegistered` são removidos.
+- Tickets aceitos pela Expo ficam em `push_tickets` até os recibos serem
+  conferidos numa execução posterior.
+- Na primeira abertura, o antigo `src/database/tokens.json` é importado.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from src.core.structured_logging import get_logger
+
+logger = get_logger("token_store")
+
+LEGACY_TOKENS_FILE = os.path.join(os.path.dirname(__file__), '../database/tokens.json')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS push_tokens (
+    token TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    platform TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_push_tokens_user_id ON push_tokens (user_id);
+CREATE TABLE IF NOT EXISTS push_tickets (
+    ticket_id TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_push_tickets_created_at ON push_tickets (created_at);
+"""
+
+
+class TokenStore:
+    def __init__(self, db_path: str, legacy_file: Optional[str] = LEGACY_TOKENS_FILE):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._by_user: Dict[str, List[str]] = {}
+        self._owner: Dict[str, str] = {}  # token -> user_id
+        self._data_version = None
+        if legacy_file:
+            self.migrate_json(legacy_file)
+
+    # --- Cache ---
+
+    def _refresh_if_changed(self):
+        """Chamado com o lock. Recarrega o cache só se outro processo gravou."""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        by_user: Dict[str, List[str]] = {}
+        owner: Dict[str, str] = {}
+        for token, user_id in self._conn.execute(
+            "SELECT token, user_id FROM push_tokens ORDER BY updated_at DESC"
+        ):
+            by_user.setdefault(user_id, []).append(token)
+            owner[token] = user_id
+        self._by_user = by_user
+        self._owner = owner
+        self._data_version = version
+
+    # --- Leitura ---
+
+    def tokens_for(self, user_id: str) -> List[str]:
+        """Tokens do usuário, do dispositivo mais recente para o mais antigo."""
+        with self._lock:
+            self._refresh_if_changed()
+            return list(self._by_user.get(user_id, ()))
+
+    def tokens_for_many(self, user_ids: Iterable[str]) -> Dict[str, List[str]]:
+        with self._lock:
+            self._refresh_if_changed()
+            return {user_id: list(self._by_user[user_id]) for user_id in user_ids if user_id in self._by_user}
+
+    def latest_by_user(self) -> Dict[str, str]:
+        """user_id -> token do dispositivo mais recente."""
+        with self._lock:
+            self._refresh_if_changed()
+            return {user_id: tokens[0] for user_id, tokens in self._by_user.items()}
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh_if_changed()
+            return sum(len(tokens) for tokens in self._by_user.values())
+
+    # --- Escrita ---
+
+    def register(self, user_id: str, token: str, platform: Optional[str] = None):
+        """Registra (ou move para `user_id`) o token de um dispositivo."""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._refresh_if_changed()
+            self._conn.execute(
+                """
+                INSERT INTO push_tokens (token, user_id, platform, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(token) DO UPDATE SET
+                    user_id = excluded.user_id,
+                    platform = COALESCE(excluded.platform, push_tokens.platform),
+                    updated_at = excluded.updated_at
+                """,
+                (token, user_id, platform, now, now),
+            )
+            # Commit da própria conexão não muda o data_version: atualiza o cache aqui
+            self._drop_from_cache([token])
+            self._by_user.setdefault(user_id, []).insert(0, token)
+            self._owner[token] = user_id
+
+    def invalidate(self, tokens: Iterable[str], reason: str = "DeviceNotRegistered") -> int:
+        """Remove tokens que o Expo não aceita mais."""
+        tokens = list(tokens)
+        if not tokens:
+            return 0
+        with self._lock:
+            self._refresh_if_changed()
+            cursor = self._conn.executemany("DELETE FROM push_tokens WHERE token = ?", [(t,) for t in tokens])
+            self._drop_from_cache(tokens)
+        if cursor.rowcount:
+            logger.info("Tokens de push removidos", extra={"fields": {"count": cursor.rowcount, "reason": reason}})
+        return cursor.rowcount
+
+    def _drop_from_cache(self, tokens: List[str]):
+        for token in tokens:
+            user_id = self._owner.pop(token, None)
+            if user_id is None:
+                continue
+            remaining = [t for t in self._by_user.get(user_id, ()) if t != token]
+            if remaining:
+                self._by_user[user_id] = remaining
+            else:
+                self._by_user.pop(user_id, None)
+
+    # --- Tickets pendentes de recibo ---
+
+    def add_tickets(self, tickets: Dict[str, str]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO push_tickets (ticket_id, token, created_at) VALUES (?, ?, ?)",
+                [(ticket_id, token, now) for ticket_id, token in tickets.items()],
+            )
+
+    def pending_tickets(self, min_age_seconds: float = 900, limit: int = 10_000) -> Dict[str, str]:
+        """Tickets enviados há pelo menos `min_age_seconds` (ticket_id -> token)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ticket_id, token FROM push_tickets WHERE created_at <= ? ORDER BY created_at LIMIT ?",
+                (time.time() - min_age_seconds, limit),
+            ).fetchall()
+        return dict(rows)
+
+    def remove_tickets(self, ticket_ids: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM push_tickets WHERE ticket_id = ?", [(t,) for t in ticket_ids])
+
+    def migrate_json(self, path: str) -> int:
+        """Importa o antigo tokens.json (user_id -> token) e o renomeia para .migrated."""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r") as f:
+                legacy = json.load(f)
+        except Exception as e:
+            logger.warning("Não foi possível ler %s: %s", path, e)
+            return 0
+        for user_id, token in legacy.items():
+            if token:
+                self.register(user_id, token)
+        os.replace(path, path + ".migrated")
+        logger.info("tokens.json migrado", extra={"fields": {"users": len(legacy), "db": self.db_path}})
+        return len(legacy)
+
+
+# Instância compartilhada
+_token_store_instance = None
+_token_store_lock = threading.Lock()
+
+
+def get_token_store() -> TokenStore:
+    global _token_store_instance
+    with _token_store_lock:
+        if _token_store_instance is None:
+            try:
+                from src.core.config import get_settings
+                db_path = get_settings().PUSH_TOKEN_DB
+            except Exception:
+                db_path = "data/push_tokens.db"
+            _token_store_instance = TokenStore(db_path)
+    return _token_store_instance
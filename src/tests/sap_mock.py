@@ -0,0 +1,192 @@
+"""
+Stand-in local do SAP B1 Service Layer para testes (http.server, HTTP/1.1 keep-alive).
+
+Implementa Login/Logout, POST Orders, GET Orders?$filter=<campo> eq '<valor>',
+GET Items('<código>') e $batch, com validação do cookie B1SESSION.
+`expire_sessions()` simula o timeout da sessão; os contadores permitem checar
+re-logins, concorrência máxima e reaproveitamento de conexões.
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from urllib.parse import unquote
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.services.sap_batch import decode_batch_request
+
+BASE_PATH = "/b1s/v1"
+
+
+def _error(status):
+    return {"error": {"code": -1, "message": {"value": f"HTTP {status}"}}}
+
+
+class MockServiceLayer:
+    def __init__(self, latency: float = 0.0, session_timeout_minutes: int = 30):
+        self.latency = latency
+        self.session_timeout_minutes = session_timeout_minutes
+        self.sessions = set()
+        self.logins = 0
+        self.orders = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_next = []  # status HTTP forçados nas próximas chamadas de Orders
+        self.fail_after_commit = []  # idem, mas o pedido é gravado antes do erro (resultado ambíguo)
+        self.items = {}  # ItemCode -> entidade devolvida em GET Items('...')
+        self.batches = 0
+        self.truncate_batches = []  # nº de resultados omitidos do fim das próximas respostas $batch
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}{BASE_PATH}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def expire_sessions(self):
+        with self.lock:
+            self.sessions.clear()
+
+    def resource(self, method, path, query, body):
+        """Operações sobre entidades (chamadas diretas ou dentro de um $batch): (status, corpo)."""
+        if path == "/Orders" and method == "GET":
+            match = re.search(r"\$filter=(\w+)(?:%20|\s)eq(?:%20|\s)'([^']*)'", query)
+            value = unquote(match.group(2)).replace("''", "'") if match else None
+            with self.lock:
+                found = [o for o in self.orders if match and o.get(match.group(1)) == value]
+            return 200, {"value": found[:1]}
+        if path == "/Orders":
+            with self.lock:
+                if self.fail_next:
+                    status = self.fail_next.pop(0)
+                    return status, _error(status)
+                order = json.loads(body)
+                order["DocEntry"] = len(self.orders) + 1
+                self.orders.append(order)
+                if self.fail_after_commit:
+                    status = self.fail_after_commit.pop(0)
+                    return status, _error(status)
+            return 201, order
+        match = re.fullmatch(r"/Items\('([^']*)'\)", path)
+        if match and method == "GET" and match.group(1) in self.items:
+            return 200, self.items[match.group(1)]
+        return 404, {"error": {"code": -1, "message": {"value": "Not found"}}}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload=None, headers=None):
+                raw = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _session(self):
+                match = re.search(r"B1SESSION=([^;]+)", self.headers.get("Cookie", ""))
+                return match.group(1) if match else None
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def do_GET(self):
+                self.do_POST()
+
+            def do_POST(self):
+                body = self._body()
+                with mock.lock:
+                    mock.connections.add(self.client_address)
+                    mock.in_flight += 1
+                    mock.max_in_flight = max(mock.max_in_flight, mock.in_flight)
+                try:
+                    if mock.latency:
+                        time.sleep(mock.latency)
+                    self._dispatch(body)
+                finally:
+                    with mock.lock:
+                        mock.in_flight -= 1
+
+            def _dispatch(self, body):
+                path = self.path[len(BASE_PATH):] if self.path.startswith(BASE_PATH) else self.path
+                path, _, query = path.partition("?")
+                if path == "/Login":
+                    session_id = str(uuid.uuid4())
+                    with mock.lock:
+                        mock.logins += 1
+                        mock.sessions.add(session_id)
+                    return self._reply(
+                        200, {"SessionId": session_id, "SessionTimeout": mock.session_timeout_minutes},
+                        headers={"Set-Cookie": "ROUTEID=.node1; path=/b1s"},
+                    )
+                if self._session() not in mock.sessions:
+                    return self._reply(401, {"error": {"code": 301, "message": {"value": "Invalid session."}}})
+                if path == "/Logout":
+                    with mock.lock:
+                        mock.sessions.discard(self._session())
+                    return self._reply(204)
+                if path == "/$batch":
+                    return self._batch(body)
+                status, payload = mock.resource(self.command, path, query, body)
+                return self._reply(status, payload)
+
+            def _batch(self, body):
+                with mock.lock:
+                    mock.batches += 1
+                operations = decode_batch_request(self.headers.get("Content-Type", ""), body)
+                boundary = f"batchresponse_{uuid.uuid4().hex}"
+                parts = []
+                for op in operations:
+                    target = op.path[len(BASE_PATH):] if op.path.startswith(BASE_PATH) else op.path
+                    path, _, query = target.partition("?")
+                    raw = json.dumps(op.payload).encode() if op.payload is not None else b""
+                    status, payload = mock.resource(op.method, path, query, raw)
+                    response = (
+                        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: application/json\r\n\r\n"
+                        + (json.dumps(payload) if payload is not None else "")
+                    )
+                    if op.method == "GET":
+                        parts.append(
+                            "Content-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\n" + response
+                        )
+                    else:
+                        changeset = f"changesetresponse_{uuid.uuid4().hex}"
+                        parts.append(
+                            f"Content-Type: multipart/mixed;boundary={changeset}\r\n\r\n--{changeset}\r\n"
+                            "Content-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\n"
+                            f"{response}\r\n--{changeset}--"
+                        )
+                with mock.lock:
+                    dropped = mock.truncate_batches.pop(0) if mock.truncate_batches else 0
+                if dropped:
+                    parts = parts[:-dropped]
+                raw = "".join(f"--{boundary}\r\n{part}\r\n" for part in parts) + f"--{boundary}--\r\n"
+                raw = raw.encode()
+                self.send_response(202)
+                self.send_header("Content-Type", f"multipart/mixed;boundary={boundary}")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
@@ -0,0 +1,82 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.cadence_model import CustomerCadenceModel
+
+
+class FakeDB:
+    """Simula o DatabaseConnector: pedidos agregados filtrados por Data_Emissao >= :since."""
+    def __init__(self):
+        self.rows = []
+        self.queries = 0
+
+    def add(self, doc, card_code, days_ago, qty=10, value=100.0, vendor="ANA"):
+        self.rows.append({
+            "Codigo_Cliente": card_code, "Tipo_Documento": "Fatura", "Numero_Documento": doc,
+            "Data_Emissao": (datetime.now() - timedelta(days=days_ago)).replace(hour=0, minute=0, second=0, microsecond=0),
+            "Quantidade": qty, "Valor": value, "Nome_Cliente": f"Cliente {card_code}", "Cidade": "X", "Estado": "SP",
+            "Vendedor_Atual": vendor,
+        })
+
+    def get_dataframe(self, query, params=None):
+        self.queries += 1
+        df = pd.DataFrame(self.rows)
+        return df[df["Data_Emissao"] >= pd.Timestamp(params["since"])].copy()
+
+
+def test_weekly_buyer_late_outranks_quarterly_buyer():
+    db = FakeDB()
+    for i, days_ago in enumerate(range(12, 90, 7)):  # semanal, última compra há 12 dias
+        db.add(100 + i, "WEEKLY", days_ago, qty=20)
+    for i, days_ago in enumerate((31, 121, 211, 301)):  # trimestral, última compra há 31 dias
+        db.add(200 + i, "QUARTERLY", days_ago, qty=500, value=5000.0)
+    db.add(300, "ONCE", 40, vendor="BIA")
+
+    model = CustomerCadenceModel(db)
+    model.build()
+    inactive = model.inactive(min_days=10, max_days=365)
+    assert list(inactive["Codigo_Cliente"]) == ["WEEKLY", "ONCE", "QUARTERLY"]
+    weekly = inactive.set_index("Codigo_Cliente").loc["WEEKLY"]
+    assert (weekly["Intervalo_Mediano"], weekly["Dias_Atraso"], weekly["Media_Fardos"]) == (7.0, 5.0, 20.0)
+    assert pd.isna(inactive.set_index("Codigo_Cliente").loc["ONCE", "Intervalo_Mediano"])
+    assert list(model.inactive(min_days=10, vendor="ANA")["Codigo_Cliente"]) == ["WEEKLY", "QUARTERLY"]
+
+    # Refresh incremental: o cliente semanal voltou a comprar e sai da lista
+    db.add(150, "WEEKLY", 0)
+    model.refresh()
+    assert list(model.inactive(min_days=10)["Codigo_Cliente"]) == ["ONCE", "QUARTERLY"]
+    assert model.stats()["orders"] == len(db.rows)
+
+
+def test_vendor_filter_matches_any_vendor_in_history():
+    db = FakeDB()
+    db.add(1, "MOVED", 90, vendor="ANA")
+    db.add(2, "MOVED", 60, vendor="BIA")  # Carteira trocou de vendedor
+    db.add(3, "STAYED", 45, vendor="BIA")
+
+    model = CustomerCadenceModel(db)
+    model.build()
+    assert list(model.inactive(min_days=10, vendor="ANA")["Codigo_Cliente"]) == ["MOVED"]
+    assert sorted(model.inactive(min_days=10, vendor="BIA")["Codigo_Cliente"]) == ["MOVED", "STAYED"]
+    assert model.snapshot().loc["MOVED", "Vendedor"] == "BIA"
+    assert model.snapshot(vendor="NINGUEM").empty
+
+
+def test_profile_average_uses_exact_window_before_last_purchase():
+    db = FakeDB()
+    db.add(1, "C1", 10, qty=30)
+    db.add(2, "C1", 150, qty=10)
+    db.add(3, "C1", 200, qty=500)  # fora dos 180 dias antes da última compra
+
+    model = CustomerCadenceModel(db)
+    model.build()
+    last = model.snapshot().loc["C1", "Ultima_Compra"]
+    assert model.profile_average("C1", last) == 20.0
+    assert model.profile_average("C1", last - timedelta(days=1)) is None  # outra data: consulta direta
+    assert model.profile_average("NOVO", last) is None
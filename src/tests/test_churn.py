@@ -0,0 +1,33 @@
+import sys
+import os
+
+import pandas as pd
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.jobs.check_churn import find_churn_alerts
+
+
+def test_thresholds_and_reorder_cadence_in_one_pass():
+    today = pd.Timestamp("2026-10-19")
+    day = lambda n: today - pd.Timedelta(days=n)
+    df = pd.DataFrame({
+        "Codigo_Cliente": ["C1", "C2", "C3", "C4", "C5"],
+        "Nome_Cliente": ["A", "B", "C", "D", "E"],
+        "Vendedor": ["ANA", "ANA", "BIA", "BIA", "BIA"],
+        # C1: 30 dias hoje; C2: 61 dias (só pega com lookback 2); C3: semanal, parado há 11 dias (ciclo 7×1.5);
+        # C4: semanal parado há 5 dias; C5: 45 dias (entre limiares, sem recorrência)
+        "Ultima_Compra": [day(30), day(61), day(11), day(5), day(45)],
+        "Intervalo_Mediano": [70.0, 50.0, 7.0, 7.0, float("nan")],
+        "Valor_Total_Historico": [100.0, 50.0, 900.0, 10.0, 5.0],
+    })
+
+    alerts = find_churn_alerts(df, today, thresholds=(30, 60, 90), cadence_factor=1.5, lookback_days=1)
+    assert dict(zip(alerts["Codigo_Cliente"], alerts["Motivo"])) == {
+        "C1": "30 dias sem compras",
+        "C3": "fora do ciclo (compra a cada ~7 dias)",
+    }
+
+    alerts = find_churn_alerts(df, today, lookback_days=2)
+    assert set(alerts["Codigo_Cliente"]) == {"C1", "C2", "C3"}
@@ -0,0 +1,73 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.copurchase_index import CoPurchaseIndex
+
+
+class FakeDB:
+    """Simula o DatabaseConnector filtrando um DataFrame por Data_Emissao >= :since."""
+    def __init__(self):
+        self.rows = []
+
+    def add(self, doc, card_code, skus, days_ago, vendor="Vendedor Teste"):
+        for sku in skus:
+            self.rows.append({
+                "Tipo_Documento": "NF", "Numero_Documento": doc, "Codigo_Cliente": card_code,
+                "SKU": sku, "Nome_Produto": f"Produto {sku}", "Vendedor_Atual": vendor,
+                "Data_Emissao": datetime.now() - timedelta(days=days_ago),
+            })
+
+    def get_dataframe(self, query, params=None):
+        df = pd.DataFrame(self.rows)
+        return df[df["Data_Emissao"] >= pd.Timestamp(params["since"])].copy()
+
+
+def build_index():
+    db = FakeDB()
+    db.add(1, "C1", ["0001", "0002"], 90)
+    db.add(2, "C2", ["0001", "0002", "0003"], 10)
+    db.add(3, "C2", ["0001", "0003"], 5)
+    index = CoPurchaseIndex(db)
+    index.build()
+    return db, index
+
+
+def test_recommend_excludes_recent_purchases():
+    _, index = build_index()
+    df = index.recommend("C2")
+    # C2 comprou 0001, 0002 e 0003 nos últimos 60 dias: nada a sugerir
+    assert df.empty
+
+    df = index.recommend("C1")
+    assert df["SKU"].tolist()[0] == "0003"
+    assert set(df["SKU"]) == {"0001", "0002", "0003"}
+
+
+def test_incremental_refresh_does_not_double_count():
+    db, index = build_index()
+    before = index.recommend("C1").set_index("SKU")["Score"]
+
+    db.add(4, "C3", ["0002", "0003"], 0)
+    index.refresh()
+    index.refresh()
+
+    after = index.recommend("C1").set_index("SKU")["Score"]
+    assert after["0003"] == before["0003"] + 1
+    assert after["0001"] == before["0001"]
+    assert index.customer_vendors("C3") == {"Vendedor Teste"}
+    assert index.customer_vendors("C9") == frozenset()
+
+
+def test_customer_vendors_keeps_every_vendor_in_history():
+    db, index = build_index()
+    # Carteira trocou de vendedor: o anterior continua com acesso, como no /inactive
+    db.add(4, "C1", ["0003"], 0, vendor="Outro Vendedor")
+    index.refresh()
+    assert index.customer_vendors("C1") == {"Vendedor Teste", "Outro Vendedor"}
+    assert index.customer_vendors("C2") == {"Vendedor Teste"}
@@ -0,0 +1,46 @@
+import sys
+import os
+import asyncio
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.database.instrumentation import end_request, fingerprint, record_query, start_request
+
+
+def test_fingerprint_groups_literals_and_params():
+    a = fingerprint("SELECT * FROM T WHERE c = 'C001' AND d >= DATEADD(day, -30, GETDATE())  -- x")
+    b = fingerprint("SELECT *\n FROM T WHERE c = :card AND d >= DATEADD(day, -90, GETDATE())")
+    assert a == b
+    assert fingerprint("SELECT 1 FROM T WHERE x IN (1, 2, 3)") == fingerprint("SELECT 1 FROM T WHERE x IN (4)")
+
+
+def test_queries_in_worker_threads_are_attributed_to_request():
+    async def handler():
+        stats, token = start_request("/inactive")
+        try:
+            await asyncio.gather(*(
+                asyncio.to_thread(record_query, "SELECT Media FROM T WHERE c = :c", 2.0, 1, 10)
+                for _ in range(5)
+            ))
+        finally:
+            end_request(token)
+        return stats
+
+    stats = asyncio.run(handler())
+    assert stats.query_count == 5
+    assert stats.by_fingerprint()[0]["count"] == 5
+    assert 'db;dur=10.0;desc="5 queries, 5 rows"' in stats.server_timing()
+    # Fora de uma requisição nada é registrado
+    record_query("SELECT 1", 1.0)
+
+
+def test_nested_context_reuses_outer_stats():
+    outer, outer_token = start_request("/bench")
+    try:
+        inner, inner_token = start_request("/portfolio")
+        record_query("SELECT 1 FROM T", 1.0)
+        end_request(inner_token)
+    finally:
+        end_request(outer_token)
+    assert inner is outer and outer.query_count == 1
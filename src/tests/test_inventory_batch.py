@@ -0,0 +1,145 @@
+import sys
+import os
+import json
+
+import pytest
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.agents import inventory_agent
+from src.core.config import Settings
+from src.agents.inventory_agent import InventoryAgent
+from src.services.sku_analysis_cache import SkuAnalysisCache
+
+
+def _agent(monkeypatch, cache_db=""):
+    settings = Settings(API_KEY="x", LLM_BACKEND="fake", FAKE_LLM_LATENCY_MS=50)
+    monkeypatch.setattr(inventory_agent, "get_settings", lambda: settings)
+    monkeypatch.setattr(inventory_agent, "PROGRESS_SECONDS", 0.1)
+    return InventoryAgent(cache_db=cache_db)
+
+
+def _write_csv(path, skus):
+    path.write_text("sku,contexto\n" + "".join(f"{sku},Fardo 10kg\n" for sku in skus), encoding="utf-8")
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_batch_is_concurrent_and_deduplicated(tmp_path, monkeypatch):
+    agent = _agent(monkeypatch)
+    source, out = tmp_path / "skus.csv", tmp_path / "out.jsonl"
+    _write_csv(source, [f"SKU{i:03d}" for i in range(40)] + ["SKU001", "sku002"])
+
+    stats = agent.process_batch(str(source), str(out), concurrency=8, rate_per_second=0)
+
+    records = _records(out)
+    assert stats["processed"] == 40 and stats["duplicates"] == 2 and stats["errors"] == 0
+    assert len({r["sku"] for r in records}) == 40
+    assert records[0]["analysis"]["categoria"] == "Alimentos > Mercearia"
+    assert stats["elapsed_s"] < 40 * 0.05 / 2  # serial levaria 2s
+    assert json.loads((tmp_path / "out.jsonl.checkpoint.json").read_text())["finished"] is True
+
+
+def test_batch_resumes_after_interruption(tmp_path, monkeypatch):
+    agent = _agent(monkeypatch)
+    source, out = tmp_path / "skus.csv", tmp_path / "out.jsonl"
+    _write_csv(source, [f"SKU{i:03d}" for i in range(10)])
+
+    # Execução anterior caiu: 3 SKUs gravados (um com erro) e uma linha cortada no meio
+    previous = [
+        {"sku": "SKU000", "input_context": "Fardo 10kg", "status": "ok", "analysis": {}},
+        {"sku": "SKU001", "input_context": "Fardo 10kg", "status": "ok", "analysis": {}},
+        {"sku": "SKU002", "input_context": "Fardo 10kg", "status": "error", "analysis": {"erro": "quota"}},
+    ]
+    out.write_text("".join(json.dumps(r) + "\n" for r in previous) + '{"sku": "SKU00', encoding="utf-8")
+
+    stats = agent.process_batch(str(source), str(out), concurrency=4, rate_per_second=0)
+
+    assert stats["skipped"] == 2 and stats["processed"] == 8  # SKU002 (erro) é refeito
+    records = _records(out)  # linha cortada foi descartada
+    ok = {r["sku"] for r in records if r["status"] == "ok"}
+    assert ok == {f"SKU{i:03d}" for i in range(10)}
+
+
+def test_rerun_only_pays_for_changed_skus(tmp_path, monkeypatch):
+    agent = _agent(monkeypatch, cache_db=str(tmp_path / "cache.db"))
+    source = tmp_path / "skus.csv"
+    _write_csv(source, [f"SKU{i:03d}" for i in range(20)])
+    agent.process_batch(str(source), str(tmp_path / "run1.jsonl"), rate_per_second=0)
+
+    # Novo lote: 1 SKU novo e 1 com contexto alterado
+    source.write_text(source.read_text(encoding="utf-8").replace("SKU005,Fardo 10kg", "SKU005,Caixa 12un")
+                      + "SKU999,Fardo 10kg\n", encoding="utf-8")
+    rerun = _agent(monkeypatch, cache_db=str(tmp_path / "cache.db"))
+    stats = rerun.process_batch(str(source), str(tmp_path / "run2.jsonl"), rate_per_second=0)
+
+    assert stats["processed"] == 21 and stats["cache_hits"] == 19
+    assert rerun.cache.stats()["entries"] == 22
+
+    # Outro modelo/prompt não reaproveita a análise
+    assert rerun.cache.get("SKU000", "Fardo 10kg", "outro-modelo", rerun.prompt_version) is None
+
+
+def test_cache_hits_skip_the_rate_limiter(tmp_path, monkeypatch):
+    agent = _agent(monkeypatch, cache_db=str(tmp_path / "cache.db"))
+    source = tmp_path / "skus.csv"
+    _write_csv(source, [f"SKU{i:03d}" for i in range(20)])
+    agent.process_batch(str(source), str(tmp_path / "run1.jsonl"), rate_per_second=0)
+
+    # 2 chamadas/s com rajada de 4: 20 SKUs pagando cota levariam ~8s
+    stats = agent.process_batch(str(source), str(tmp_path / "run2.jsonl"), concurrency=4, rate_per_second=2)
+    assert stats["cache_hits"] == 20 and stats["errors"] == 0
+    assert stats["elapsed_s"] < 1.0
+
+
+def test_worker_errors_become_error_lines(tmp_path, monkeypatch):
+    agent = _agent(monkeypatch)
+    source, out = tmp_path / "skus.csv", tmp_path / "out.jsonl"
+    _write_csv(source, [f"SKU{i:03d}" for i in range(30)])
+
+    original = agent._analyze_with_retry
+
+    async def flaky(sku, context, limiter):
+        if sku in ("SKU003", "SKU017"):
+            raise OSError("database disk image is malformed")  # ex: erro no cache SQLite
+        return await original(sku, context, limiter)
+
+    monkeypatch.setattr(agent, "_analyze_with_retry", flaky)
+    stats = agent.process_batch(str(source), str(out), concurrency=2, rate_per_second=0)
+
+    records = _records(out)
+    assert stats["processed"] == 30 and stats["errors"] == 2
+    assert {r["sku"] for r in records if r["status"] == "error"} == {"SKU003", "SKU017"}
+    assert records[[r["sku"] for r in records].index("SKU003")]["analysis"]["erro"].startswith("database disk")
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = SkuAnalysisCache(str(tmp_path / "cache.db"), max_bytes=1000)
+    for i in range(10):
+        cache.put(f"SKU{i}", "", "m", "v1", "x" * 100)
+    cache.get("SKU0", "", "m", "v1")  # mais recente: sobrevive à poda
+    cache.put("SKU10", "", "m", "v1", "x" * 100)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 900 and stats["evictions"] >= 2
+    assert cache.get("SKU0", "", "m", "v1") is not None
+    assert cache.get("SKU1", "", "m", "v1") is None
+
+
+def test_parquet_summary_keeps_last_record_per_sku(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    agent = _agent(monkeypatch)
+    source, out, summary = tmp_path / "skus.csv", tmp_path / "out.jsonl", tmp_path / "summary.parquet"
+    _write_csv(source, [f"SKU{i:03d}" for i in range(12)])
+    out.write_text(json.dumps({"sku": "SKU003", "input_context": "Fardo 10kg", "status": "error",
+                               "analysis": {"erro": "quota"}}) + "\n", encoding="utf-8")
+
+    stats = agent.process_batch(str(source), str(out), rate_per_second=0, parquet_file=str(summary))
+
+    table = pq.read_table(summary).to_pylist()
+    assert stats["parquet_rows"] == 12 and len(table) == 12
+    assert {row["status"] for row in table} == {"ok"}  # erro anterior substituído pela nova análise
+    assert table[0]["categoria"] == "Alimentos > Mercearia" and table[0]["especificacoes"] == 2
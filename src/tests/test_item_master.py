@@ -0,0 +1,51 @@
+import sys
+import os
+
+import pandas as pd
+import pytest
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.item_master import ItemMaster
+
+
+class FakeDB:
+    """Simula o DatabaseConnector: só responde a consulta do OITM."""
+    def __init__(self, items):
+        self.items = items
+        self.queries = 0
+
+    def get_dataframe(self, query, params=None):
+        self.queries += 1
+        if not self.items:
+            return pd.DataFrame()  # Sem colunas, como o conector devolve em erro/consulta vazia
+        return pd.DataFrame(self.items, columns=["ItemCode", "ItemName", "NumInSale", "SalUnitMsr"])
+
+
+def test_bales_conversion_without_join():
+    db = FakeDB([("10.1", "Arroz C/10", 10, "FD"), ("20", "Feijão C/1", 1, "UN"), ("30", "Café", None, "FD")])
+    master = ItemMaster(db)
+
+    skus = pd.Series(["10.1", "20", "30", "99"])
+    bales = master.to_bales(pd.Series([50.0, 4.0, 3.0, 2.0]), skus)
+    assert bales.tolist() == [5.0, 4.0, 3.0, 2.0]  # NumInSale <= 1, nulo ou sem cadastro: quantidade
+    assert db.queries == 1  # carga única, consultas servidas da memória
+
+
+def test_empty_item_query_is_not_marked_built():
+    db = FakeDB([])
+    master = ItemMaster(db)
+    for _ in range(2):  # sem cadastro: falha e tenta de novo na próxima consulta
+        with pytest.raises(RuntimeError):
+            master.factors(pd.Series(["10.1"]))
+    assert db.queries == 2 and not master.is_built
+
+    db.items = [("10.1", "Arroz C/10", 10, "FD")]
+    assert master.factors(pd.Series(["10.1"])).tolist() == [10.0]
+
+    # Refresh que volta vazio mantém os fatores carregados
+    db.items = []
+    with pytest.raises(RuntimeError):
+        master.refresh()
+    assert master.factors(pd.Series(["10.1"])).tolist() == [10.0]
@@ -0,0 +1,54 @@
+import sys
+import os
+import gzip
+import json
+import multiprocessing
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.utils.log_sink import BufferedJSONLSink
+
+
+def _writer(path, worker, n):
+    sink = BufferedJSONLSink(path, flush_interval=0.05, max_batch=7, max_bytes=4096, rotate_daily=False)
+    for i in range(n):
+        sink.write({"worker": worker, "i": i, "payload": "x" * 50})
+    sink.close()
+
+
+def _read_all(sink):
+    lines = []
+    for path in sink.rotated_files() + [sink.path]:
+        if not os.path.exists(path):
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+    return [json.loads(line) for line in lines]
+
+
+def test_concurrent_processes_rotate_without_losing_or_interleaving_lines(tmp_path):
+    path = str(tmp_path / "pitch_usage.jsonl")
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_writer, args=(path, w, 200)) for w in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+        assert p.exitcode == 0
+
+    sink = BufferedJSONLSink(path)
+    entries = _read_all(sink)  # json.loads falha se alguma linha foi intercalada
+    assert len(entries) == 600
+    assert {(e["worker"], e["i"]) for e in entries} == {(w, i) for w in range(3) for i in range(200)}
+    assert sink.rotated_files() and all(f.endswith(".gz") for f in sink.rotated_files())
+
+
+def test_close_flushes_pending_events(tmp_path):
+    path = str(tmp_path / "pitch_usage.jsonl")
+    sink = BufferedJSONLSink(path, flush_interval=60)
+    sink.write({"event": "pitch_generated", "pitch_id": "p1"})
+    sink.close()
+    with open(path, encoding="utf-8") as f:
+        assert json.loads(f.readline())["pitch_id"] == "p1"
@@ -0,0 +1,159 @@
+import sys
+import os
+import sqlite3
+import time
+
+import pytest
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.config import Settings
+from src.services.order_queue import OrderConflictError, OrderQueue
+from src.services.sap_service import SapService
+from src.tests.sap_mock import MockServiceLayer
+
+ORDER = {"CardCode": "C000001", "DocumentLines": [{"ItemCode": "0005", "Quantity": 10}]}
+
+
+def _queue(tmp_path, mock, **overrides):
+    settings = Settings(API_KEY="test", SAP_SL_URL=mock.url, SAP_DB="SBO_TEST", SAP_USER="u", SAP_PASSWORD="p")
+    sap = SapService(settings)
+    options = dict(workers=2, backoff_seconds=0.05, poll_seconds=0.05, key_field="U_MariIA_Key")
+    options.update(overrides)
+    return OrderQueue(str(tmp_path / "orders.db"), lambda: sap, **options)
+
+
+def test_transient_errors_are_retried_without_duplicates(tmp_path):
+    mock = MockServiceLayer().start()
+    queue = _queue(tmp_path, mock)
+    try:
+        mock.fail_next = [503]
+        mock.fail_after_commit = [502]  # 2ª tentativa grava o pedido e responde erro
+        started = time.perf_counter()
+        job = queue.enqueue(ORDER, idempotency_key="pedido-1", vendor="Ana Souza")
+        assert time.perf_counter() - started < 0.5  # aceite imediato
+        assert job["status"] == "queued"
+
+        # Reenvio do app com a mesma chave devolve o mesmo pedido
+        assert queue.enqueue(ORDER, idempotency_key="pedido-1", vendor="Ana Souza")["order_id"] == job["order_id"]
+
+        assert queue.drain(10)
+        done = queue.get(job["order_id"])
+        assert done["status"] == "submitted" and done["attempts"] == 3
+        assert done["doc_entry"] == 1
+        assert len(mock.orders) == 1  # achado pela chave, não reenviado
+        assert mock.orders[0]["U_MariIA_Key"] == job["order_id"]
+    finally:
+        queue.stop()
+        mock.stop()
+
+
+def test_business_errors_fail_without_retry(tmp_path):
+    mock = MockServiceLayer().start()
+    queue = _queue(tmp_path, mock)
+    try:
+        mock.fail_next = [400]
+        job = queue.enqueue(ORDER, vendor="Ana Souza")
+        assert queue.drain(10)
+        failed = queue.get(job["order_id"])
+        assert failed["status"] == "failed" and failed["attempts"] == 1
+        assert "HTTP 400" in failed["last_error"]
+        assert mock.orders == []
+    finally:
+        queue.stop()
+        mock.stop()
+
+
+def test_pending_orders_survive_restart(tmp_path):
+    mock = MockServiceLayer().start()
+    try:
+        # Processo cai com o pedido em envio (lease expira) e outro processo retoma
+        crashed = _queue(tmp_path, mock, lease_seconds=0)
+        crashed.start = lambda: None  # sem workers: só grava e reserva
+        order_id = crashed.enqueue(ORDER, idempotency_key="pedido-2")["order_id"]
+        assert len(crashed._claim()) == 1
+
+        queue = _queue(tmp_path, mock)
+        queue.start()
+        assert queue.drain(10)
+        assert queue.get(order_id)["status"] == "submitted"
+        assert len(mock.orders) == 1
+        queue.stop()
+    finally:
+        mock.stop()
+
+
+def test_ready_orders_are_sent_in_batches(tmp_path):
+    mock = MockServiceLayer().start()
+    queue = _queue(tmp_path, mock, workers=1, batch_size=10)
+    try:
+        queue.start = lambda: None  # enfileira tudo antes de subir o worker
+        ids = [queue.enqueue(ORDER, idempotency_key=f"lote-{i}")["order_id"] for i in range(25)]
+        OrderQueue.start(queue)
+        assert queue.drain(10)
+        assert all(queue.get(order_id)["status"] == "submitted" for order_id in ids)
+        assert mock.batches == 3 and len(mock.orders) == 25
+        assert {o["U_MariIA_Key"] for o in mock.orders} == set(ids)
+    finally:
+        queue.stop()
+        mock.stop()
+
+
+def test_truncated_batch_response_is_retried_as_uncertain(tmp_path):
+    mock = MockServiceLayer().start()
+    queue = _queue(tmp_path, mock, workers=1, batch_size=10)
+    try:
+        queue.start = lambda: None
+        ids = [queue.enqueue(ORDER, idempotency_key=f"parcial-{i}")["order_id"] for i in range(3)]
+        mock.truncate_batches = [1]  # SAP grava os 3 pedidos, mas a resposta traz só 2 resultados
+        OrderQueue.start(queue)
+        assert queue.drain(10)
+        assert all(queue.get(order_id)["status"] == "submitted" for order_id in ids)
+        assert mock.batches == 1 and len(mock.orders) == 3  # achados pela chave, não reenviados
+    finally:
+        queue.stop()
+        mock.stop()
+
+
+def test_idempotency_key_is_scoped_to_vendor(tmp_path):
+    mock = MockServiceLayer().start()
+    queue = _queue(tmp_path, mock)
+    try:
+        queue.start = lambda: None  # só grava
+        ana = queue.enqueue(ORDER, idempotency_key="pedido-3", vendor="Ana Souza")
+        bia = queue.enqueue(ORDER, idempotency_key="pedido-3", vendor="Bia Lima")
+        assert ana["order_id"] != bia["order_id"]
+
+        # Mesma chave do mesmo vendedor com outro pedido: conflito, não devolve o anterior
+        other = dict(ORDER, CardCode="C000002")
+        with pytest.raises(OrderConflictError):
+            queue.enqueue(other, idempotency_key="pedido-3", vendor="Ana Souza")
+        assert queue.counts() == {"queued": 2}
+    finally:
+        mock.stop()
+
+
+def test_worker_survives_errors_saving_the_result(tmp_path):
+    mock = MockServiceLayer().start()
+    queue = _queue(tmp_path, mock, workers=1, lease_seconds=0.2)
+    try:
+        finish = queue._finish
+        # Falha ao gravar o "submitted" e de novo ao gravar o "retrying" do tratamento
+        failures = [sqlite3.OperationalError("database is locked")] * 2
+
+        def flaky_finish(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return finish(*args, **kwargs)
+
+        queue._finish = flaky_finish
+        order_id = queue.enqueue(ORDER, idempotency_key="pedido-4")["order_id"]
+        assert queue.drain(10)
+        # Mesmo worker retoma o pedido após o lease, acha pela chave e não reenvia
+        done = queue.get(order_id)
+        assert done["status"] == "submitted" and done["attempts"] == 2
+        assert len(mock.orders) == 1
+    finally:
+        queue.stop()
+        mock.stop()
@@ -0,0 +1,69 @@
+import sys
+import os
+import gzip
+import json
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.pitch_analytics import PitchAnalyticsStore
+
+
+def _pitch(pitch_id, sku, vendor, ts="2026-10-14T10:00:00"):
+    return {"timestamp": ts, "event": "pitch_generated", "pitch_id": pitch_id, "user_id": "vendedor_mobile",
+            "card_code": "C000001", "target_sku": sku, "pitch_generated": "...", "metadata": {"vendor": vendor}}
+
+
+def _feedback(pitch_id, kind, ts="2026-10-15T10:00:00"):
+    return {"timestamp": ts, "event": "pitch_feedback", "pitch_id": pitch_id, "user_id": "vendedor_mobile",
+            "feedback_type": kind}
+
+
+def _append(path, *entries, partial=""):
+    with open(path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+        f.write(partial)
+
+
+def test_incremental_ingest_survives_rotation_and_gzip(tmp_path):
+    log = str(tmp_path / "pitch_usage.jsonl")
+    store = PitchAnalyticsStore(str(tmp_path / "analytics.db"), log, refresh_seconds=0)
+
+    _append(log, _pitch("p1", "5", "ANA"), _pitch("p2", "5", "BIA"), partial='{"timestamp": "2026-10-1')
+    assert store.ingest()["pitches"] == 2
+
+    # Completa a linha parcial, recebe feedback e o arquivo é rotacionado + comprimido
+    _append(log, partial='4T11:00:00", "event": "pitch_generated", "pitch_id": "p3", "target_sku": "7", '
+                         '"metadata": {"vendor": "ANA"}}\n')
+    _append(log, _feedback("p1", "useful"), _feedback("p1", "sold"))
+    with open(log, "rb") as src, gzip.open(str(tmp_path / "pitch_usage-20261015-000000.jsonl.gz"), "wb") as dst:
+        dst.write(src.read())
+    os.remove(log)
+    _append(log, _pitch("p4", "7", "BIA", ts="2026-10-20T09:00:00"), _feedback("p4", "sold"))
+
+    totals = store.ingest()
+    assert totals == {"pitches": 2, "feedback": 3, "files": 2}  # nada relido do arquivo rotacionado
+    assert store.ingest()["files"] == 0
+
+    by_sku = {row["sku"]: row for row in store.conversion("sku")}
+    assert (by_sku["5"]["pitches"], by_sku["5"]["useful"], by_sku["5"]["sold"]) == (2, 1, 1)
+    assert (by_sku["7"]["pitches"], by_sku["7"]["sold"], by_sku["7"]["conversion_rate"]) == (2, 1, 0.5)
+    assert [row["week"] for row in store.conversion("week")] == ["2026-10-19", "2026-10-12"]
+    assert store.conversion("vendor", vendor="ANA")[0]["pitches"] == 2
+
+
+def test_ingest_in_small_chunks_and_vendor_summary(tmp_path, monkeypatch):
+    from src.services import pitch_analytics
+    monkeypatch.setattr(pitch_analytics, "INGEST_CHUNK_BYTES", 100)  # menor que uma linha
+    log = str(tmp_path / "pitch_usage.jsonl")
+    store = PitchAnalyticsStore(str(tmp_path / "analytics.db"), log, refresh_seconds=3600)
+
+    _append(log, *[_pitch(f"p{i}", "5", "ANA" if i % 3 else "BIA") for i in range(30)], _feedback("p1", "sold"),
+            partial='{"timestamp": "2026-10-1')
+    assert store.ingest() == {"pitches": 30, "feedback": 1, "files": 1}
+    _append(log, partial='4T11:00:00", "event": "pitch_generated", "pitch_id": "p30", "metadata": {"vendor": "BIA"}}\n')
+    assert store.ingest()["pitches"] == 1
+
+    assert (store.summary("ANA")["pitches"], store.summary("ANA")["sold"]) == (20, 1)
+    assert store.summary("BIA")["pitches"] == 11 and store.summary()["pitches"] == 31
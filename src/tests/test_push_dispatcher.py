@@ -0,0 +1,74 @@
+import sys
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.push_dispatcher import PushDispatcher, PushMessage
+
+
+class _ExpoStandIn(BaseHTTPRequestHandler):
+    """Stand-in da Expo Push API: 1º envio responde 429, tokens 'dead' não estão registrados."""
+    batches = []
+    throttled = False
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.endswith("/push/send"):
+            with self.lock:
+                if not _ExpoStandIn.throttled:
+                    _ExpoStandIn.throttled = True
+                    return self._reply(429, {"errors": [{"code": "TOO_MANY_REQUESTS"}]})
+                _ExpoStandIn.batches.append(len(body))
+            data = [
+                {"status": "error", "details": {"error": "DeviceNotRegistered"}} if "dead" in m["to"]
+                else {"status": "ok", "id": "ticket-" + m["to"]}
+                for m in body
+            ]
+        else:
+            data = {
+                ticket_id: {"status": "error", "details": {"error": "DeviceNotRegistered"}}
+                if ticket_id.endswith("[7]") else {"status": "ok"}
+                for ticket_id in body["ids"]
+            }
+        self._reply(200, {"data": data})
+
+    def _reply(self, status, payload):
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_batches_retries_and_invalidates_tokens():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ExpoStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    invalid = []
+    try:
+        dispatcher = PushDispatcher(
+            base_url=f"http://127.0.0.1:{server.server_port}",
+            concurrency=4, rate_per_second=0, on_invalid_tokens=invalid.extend,
+        )
+        messages = [PushMessage(f"ExponentPushToken[{i}]", "Risco de churn", "Ligue agora") for i in range(245)]
+        messages += [PushMessage("ExponentPushToken[dead]", "Risco de churn", "Ligue agora")]
+        result = dispatcher.send(messages)
+
+        assert sorted(_ExpoStandIn.batches) == [46, 100, 100]  # lote com 429 foi reenviado
+        assert (result.sent, result.failed) == (245, 1)
+        assert invalid == ["ExponentPushToken[dead]"]
+
+        receipts = dispatcher.fetch_receipts(result.tickets)
+        assert receipts.failed == 1
+        assert invalid[-1] == "ExponentPushToken[7]"
+        dispatcher.close()
+    finally:
+        server.shutdown()
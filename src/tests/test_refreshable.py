@@ -0,0 +1,31 @@
+import sys
+import os
+import threading
+import time
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.refreshable import RefreshableModel
+
+
+class SlowModel(RefreshableModel):
+    def __init__(self):
+        super().__init__(db=None, refresh_seconds=900)
+        self.builds = 0
+
+    def _build(self):
+        time.sleep(0.1)
+        self.builds += 1
+
+
+def test_concurrent_cold_requests_share_one_build():
+    model = SlowModel()
+    threads = [threading.Thread(target=model.ensure_fresh) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.builds == 1 and model.is_built
+    assert SlowModel.shared(lambda: model) is SlowModel.shared(SlowModel)
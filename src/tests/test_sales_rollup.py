@@ -0,0 +1,99 @@
+import sys
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.database.synthetic_data import generate
+from src.services.sales_rollup import SalesRollup, month_key
+
+
+def _connector(tmp_path, monkeypatch):
+    path = str(tmp_path / "vendas.db")
+    generate(path=path, rows=4_000, vendors=3, customers=60, skus=30, days=400, verbose=False)
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("DB_SQLITE_PATH", path)
+    from src.database.connector import DatabaseConnector
+    return DatabaseConnector(), path
+
+
+def test_rollup_matches_line_level_queries(tmp_path, monkeypatch):
+    db, _ = _connector(tmp_path, monkeypatch)
+    rollup = SalesRollup(db, history_months=12)
+    rollup.build()
+
+    since = (pd.Timestamp.now().to_period("M") - 5).start_time
+    card = db.get_dataframe(
+        "SELECT TOP 1 Codigo_Cliente FROM FAL_IA_Dados_Vendas_Televendas "
+        "GROUP BY Codigo_Cliente ORDER BY COUNT(*) DESC"
+    ).iloc[0, 0]
+
+    # Valor por mês/categoria igual ao das notas
+    expected = db.get_dataframe(
+        "SELECT Data_Emissao, Categoria_Produto, COALESCE(Valor_Liquido, Valor_Total_Linha, 0) as Total "
+        "FROM FAL_IA_Dados_Vendas_Televendas WHERE Codigo_Cliente = :c AND Data_Emissao >= :since",
+        params={"c": card, "since": since.strftime("%Y-%m-%d")},
+    )
+    expected = expected.groupby([pd.to_datetime(expected["Data_Emissao"]).dt.to_period("M"), "Categoria_Produto"])["Total"].sum()
+    frame = rollup.trend_frame(card, since)
+    actual = frame.groupby([frame["Data_Emissao"].dt.to_period("M"), "Categoria_Produto"])["Total"].sum()
+    pd.testing.assert_series_equal(actual.sort_index(), expected.sort_index(), check_names=False)
+
+    # Média de fardos por dia de compra (6 meses inteiros) igual à agregação por data
+    per_day = db.get_dataframe(
+        """
+        SELECT v.Data_Emissao, SUM(CASE WHEN ISNULL(o.NumInSale, 0) > 1 THEN v.Quantidade / o.NumInSale
+                                        ELSE v.Quantidade END) as Fardos
+        FROM FAL_IA_Dados_Vendas_Televendas v
+        LEFT JOIN OITM o ON o.ItemCode = v.SKU COLLATE DATABASE_DEFAULT
+        WHERE v.Codigo_Cliente = :c AND v.Data_Emissao >= :since AND v.Unidade_Medida NOT IN ('KG', 'TN')
+        GROUP BY v.Data_Emissao
+        """,
+        params={"c": card, "since": (pd.Timestamp.now() - pd.DateOffset(months=6)).replace(day=1).strftime("%Y-%m-%d")},
+    )
+    assert rollup.average_bales([card, "NAO_EXISTE"], months=6).tolist() == [round(per_day["Fardos"].mean(), 2), 0.0]
+
+    breakdown = rollup.bales_breakdown(card, days=90)
+    assert list(breakdown.columns) == ["SKU", "Produto", "Media_SKU", "Vezes_Comprado"]
+    assert breakdown["Media_SKU"].is_monotonic_decreasing
+
+    # Janela em dias exatos: mesma resposta da consulta direta nas notas
+    per_sku = db.get_dataframe(
+        """
+        SELECT v.SKU, AVG(CASE WHEN ISNULL(o.NumInSale, 0) > 1 THEN v.Quantidade / o.NumInSale
+                               ELSE v.Quantidade END) as Media_SKU, COUNT(*) as Vezes_Comprado
+        FROM FAL_IA_Dados_Vendas_Televendas v
+        LEFT JOIN OITM o ON o.ItemCode = v.SKU COLLATE DATABASE_DEFAULT
+        WHERE v.Codigo_Cliente = :c AND v.Data_Emissao >= DATEADD(day, -90, GETDATE())
+          AND v.Unidade_Medida NOT IN ('KG', 'TN')
+        GROUP BY v.SKU
+        """,
+        params={"c": card},
+    )
+    expected = {(sku, round(avg, 1), n) for sku, avg, n in per_sku.itertuples(index=False)}
+    assert {(sku, media, n) for sku, _, media, n in breakdown.itertuples(index=False)} == expected
+
+
+def test_refresh_only_reaggregates_current_month(tmp_path, monkeypatch):
+    db, path = _connector(tmp_path, monkeypatch)
+    rollup = SalesRollup(db, history_months=6)
+    rollup.build()
+    old_months = rollup._months[rollup._months["Mes"] < month_key(datetime.now())].copy()
+
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "INSERT INTO FAL_IA_Dados_Vendas_Televendas (Tipo_Documento, Numero_Documento, Data_Emissao, "
+            "Codigo_Cliente, Nome_Cliente, SKU, Nome_Produto, Categoria_Produto, Unidade_Medida, Quantidade, "
+            "Valor_Total_Linha, Valor_Liquido) VALUES ('Fatura', 999999, ?, 'NOVO', 'Novo', 'X1', 'Arroz', "
+            "'ARROZ', 'FD', 7, 70.0, 70.0)",
+            (datetime.now().strftime("%Y-%m-%d"),),
+        )
+
+    rollup.refresh()
+    assert rollup.customer_lines("NOVO")["Quantidade"].sum() == 7.0
+    assert rollup.customer_lines("NOVO")["Valor"].sum() == 70.0
+    pd.testing.assert_frame_equal(rollup._months[rollup._months["Mes"] < month_key(datetime.now())], old_months)
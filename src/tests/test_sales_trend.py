@@ -0,0 +1,47 @@
+import sys
+import os
+
+import pandas as pd
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.sales_trend import build_trend, parse_categories, window_start
+
+TODAY = pd.Timestamp("2025-06-18")
+
+
+def _daily(rows):
+    return pd.DataFrame(
+        [{"Data_Emissao": pd.Timestamp(day), "Categoria_Produto": c, "Total": t} for day, c, t in rows]
+    )
+
+
+def test_monthly_pivot_fills_empty_months_and_groups_categories():
+    df = _daily([
+        ("2025-01-10", "ARROZ BRANCO", 100.0),
+        ("2025-01-25", "Arroz Parboilizado", 50.0),
+        ("2025-03-02", "FEIJÃO CARIOCA", 80.0),
+        ("2025-06-01", "MASSAS", 30.0),
+        ("2025-06-02", "ÓLEO", 999.0),
+    ])
+    trend = build_trend(df, parse_categories("Arroz=ARROZ,Feijão=FEIJAO,Massas=MASSA"), "month", 6, TODAY)
+
+    assert trend["labels"] == ["01/25", "02/25", "03/25", "04/25", "05/25", "06/25"]
+    series = {d["name"]: d["data"] for d in trend["datasets"]}
+    assert series["Arroz"] == [150.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+    assert series["Feijão"] == [0.0, 0.0, 80.0, 0.0, 0.0, 0.0]  # acento ignorado no match
+    assert series["Massas"][-1] == 30.0
+    assert trend["datasets"][0]["color"] == "#1A2F5A"
+
+
+def test_weekly_and_quarterly_granularities():
+    df = _daily([("2025-06-09", "ARROZ", 10.0), ("2025-06-15", "ARROZ", 5.0), ("2025-06-16", "CAFE", 7.0)])
+
+    weekly = build_trend(df, parse_categories("Arroz,Café=CAFE"), "week", 3, TODAY, include_other=True)
+    assert weekly["labels"] == ["02/06", "09/06", "16/06"]  # semanas começando na segunda
+    assert [d["data"] for d in weekly["datasets"]] == [[0.0, 15.0, 0.0], [0.0, 0.0, 7.0], [0.0, 0.0, 0.0]]
+
+    quarterly = build_trend(df, parse_categories("Arroz"), "quarter", 2, TODAY)
+    assert quarterly["labels"] == ["T1/25", "T2/25"] and quarterly["datasets"][0]["data"] == [0.0, 15.0]
+    assert window_start("quarter", 2, TODAY) == pd.Timestamp("2025-01-01")
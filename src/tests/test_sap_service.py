@@ -0,0 +1,91 @@
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.config import Settings
+from src.services.sap_service import SapService
+from src.tests.sap_mock import MockServiceLayer
+
+
+def _service(mock, **overrides):
+    settings = Settings(API_KEY="test", SAP_SL_URL=mock.url, SAP_DB="SBO_TEST", SAP_USER="u", SAP_PASSWORD="p",
+                        SAP_MAX_CONCURRENCY=4, **overrides)
+    return SapService(settings)
+
+
+def test_concurrent_orders_share_pool_and_relogin_once():
+    mock = MockServiceLayer(latency=0.01).start()
+    try:
+        sap = _service(mock)
+        order = {"CardCode": "C000001", "DocumentLines": [{"ItemCode": "0005", "Quantity": 10}]}
+        sap.create_order(order)
+        assert mock.logins == 1
+
+        # Sessão expira no servidor: 32 pedidos concorrentes recebem 401 e só um re-login acontece
+        mock.expire_sessions()
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda _: sap.create_order(order), range(32)))
+
+        assert len(results) == 32 and len(mock.orders) == 33
+        assert mock.logins == 2
+        assert mock.max_in_flight <= 4  # SAP_MAX_CONCURRENCY
+        assert len(mock.connections) <= 5  # conexões keep-alive reaproveitadas (pool + login)
+        sap.close()
+    finally:
+        mock.stop()
+
+
+def test_session_is_refreshed_before_timeout():
+    mock = MockServiceLayer(session_timeout_minutes=1).start()
+    try:
+        # Margem maior que o timeout: toda chamada renova a sessão antes de usar
+        sap = _service(mock, SAP_SESSION_REFRESH_MARGIN_SECONDS=61)
+        sap.create_order({"CardCode": "C1"})
+        sap.create_order({"CardCode": "C1"})
+        assert mock.logins == 2 and len(mock.orders) == 2
+    finally:
+        mock.stop()
+
+
+def test_batch_orders_and_stock_in_one_round_trip():
+    mock = MockServiceLayer().start()
+    try:
+        sap = _service(mock, SAP_BATCH_MAX_OPERATIONS=4)
+        mock.items = {"0005": {"ItemCode": "0005", "ItemName": "Arroz 5kg", "QuantityOnStock": 120.0}}
+        orders = [{"CardCode": f"C{i}", "DocumentLines": [{"ItemCode": "0005", "Quantity": i + 1}]} for i in range(6)]
+        orders[2]["CardCode"] = "REJEITAR"
+
+        original = mock.resource
+        mock.resource = lambda method, path, query, body: (
+            (400, {"error": {"code": -10, "message": {"value": "Invalid BP"}}})
+            if b"REJEITAR" in body else original(method, path, query, body)
+        )
+        results = sap.create_orders(orders)
+
+        assert mock.batches == 2  # 6 pedidos, até 4 por $batch
+        assert [isinstance(r, dict) for r in results] == [True, True, False, True, True, True]
+        assert results[2].status_code == 400 and not results[2].retryable
+        assert results[5]["CardCode"] == "C5" and len(mock.orders) == 5
+
+        # Sessão expirada: o $batch inteiro recebe 401, re-login e repete
+        mock.expire_sessions()
+        stock = sap.get_items_stock(["0005", "9999"])
+        assert stock["0005"]["QuantityOnStock"] == 120.0 and stock["9999"] is None
+        assert mock.logins == 2 and mock.batches == 3
+    finally:
+        mock.stop()
+
+
+def test_find_order_by_key_encodes_the_key():
+    mock = MockServiceLayer().start()
+    try:
+        sap = _service(mock)
+        key = "pedido #1 & 'promo'?"
+        sap.create_order({"CardCode": "C1", "U_MariIA_Key": key})
+        assert sap.find_order_by_key("U_MariIA_Key", key)["DocEntry"] == 1
+        assert sap.find_order_by_key("U_MariIA_Key", "pedido #1") is None
+    finally:
+        mock.stop()
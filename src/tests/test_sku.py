@@ -0,0 +1,38 @@
+import sys
+import os
+
+import pandas as pd
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.utils import sku
+from src.utils.sku import format_sku, format_sku_column, format_skus
+
+
+def test_vectorized_format_matches_scalar_rule():
+    codes = pd.Series(["5", "201.1", " 12 ", None, "ABC", "1.2.3", "", 7, "5"], dtype=object)
+    assert format_skus(codes).tolist() == [format_sku(value) for value in codes]
+    assert format_skus(codes).tolist()[:3] == ["0005", "0201.1", "0012"]
+
+
+def test_equal_numbers_keep_their_own_text(monkeypatch):
+    monkeypatch.setattr(sku, "_cache", {})
+    assert format_skus(pd.Series([5], dtype=object)).tolist() == ["0005"]
+    # 5.0 == 5 (mesmo hash), mas a regra formata o texto: "5.0" -> "0005.0", em qualquer ordem
+    assert format_skus(pd.Series([5.0, 5, "5"], dtype=object)).tolist() == ["0005.0", "0005", "0005"]
+    assert format_skus(pd.Series([float("nan"), None, 7.0])).tolist() == ["", "", "0007.0"]
+
+
+def test_format_is_memoized_per_distinct_sku(monkeypatch):
+    calls = []
+    original = sku._format_codes
+    monkeypatch.setattr(sku, "_format_codes", lambda codes: calls.append(len(codes)) or original(codes))
+    monkeypatch.setattr(sku, "_cache", {})
+
+    df = pd.DataFrame({"SKU": ["10.1", "20", "10.1", "20"] * 1000, "Quantidade": 1})
+    format_sku_column(df)
+    format_sku_column(pd.DataFrame({"SKU": ["20", "30"]}))
+
+    assert calls == [2, 1]  # só os SKUs ainda não vistos são formatados
+    assert df["SKU"].iloc[:2].tolist() == ["0010.1", "0020"]
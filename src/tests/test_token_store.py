@@ -0,0 +1,35 @@
+import sys
+import os
+import json
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.services.token_store import TokenStore
+
+
+def test_devices_invalidation_and_cross_process_visibility(tmp_path):
+    legacy = tmp_path / "tokens.json"
+    legacy.write_text(json.dumps({"ANA": "ExponentPushToken[a1]"}))
+    db = str(tmp_path / "tokens.db")
+
+    api = TokenStore(db, legacy_file=str(legacy))
+    job = TokenStore(db, legacy_file=str(legacy))  # outro processo (ex: job de churn)
+    assert not legacy.exists() and (tmp_path / "tokens.json.migrated").exists()
+    assert job.tokens_for("ANA") == ["ExponentPushToken[a1]"]
+
+    api.register("ANA", "ExponentPushToken[a2]", platform="ios")
+    api.register("BIA", "ExponentPushToken[b1]")
+    # Escrita da "API" aparece no cache do "job" (PRAGMA data_version)
+    assert job.tokens_for("ANA") == ["ExponentPushToken[a2]", "ExponentPushToken[a1]"]
+
+    # Aparelho reatribuído troca de dono
+    job.register("BIA", "ExponentPushToken[a1]")
+    assert api.tokens_for_many(["ANA", "BIA", "CAU"]) == {
+        "ANA": ["ExponentPushToken[a2]"],
+        "BIA": ["ExponentPushToken[a1]", "ExponentPushToken[b1]"],
+    }
+
+    assert api.invalidate(["ExponentPushToken[a2]", "ExponentPushToken[zz]"]) == 1
+    assert job.tokens_for("ANA") == []
+    assert job.count() == 2
@@ -0,0 +1,48 @@
+import sys
+import os
+
+import pandas as pd
+
+# Adiciona root ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.database.tsql_sqlite import translate_tsql
+from src.database.synthetic_data import generate
+
+
+def test_translate_top_in_subquery_and_functions():
+    sql = translate_tsql(
+        "SELECT x FROM (SELECT TOP 5 SKU FROM T WHERE n = 'a)b' ORDER BY SKU) q "
+        "WHERE d >= DATEADD(day, -30, GETDATE()) AND ISNULL(o.NumInSale, 0) > 1 "
+        "AND o.ItemCode = q.SKU COLLATE DATABASE_DEFAULT"
+    )
+    assert "TOP" not in sql
+    assert "LIMIT 5\n) q" in sql
+    assert "DATEADD('day', -30, '" in sql
+    assert "IFNULL(" in sql and "COLLATE" not in sql
+
+
+def test_connector_runs_agent_queries_on_synthetic_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "vendas.db")
+    summary = generate(path=path, rows=5_000, vendors=3, customers=100, skus=40, days=365, verbose=False)
+    assert summary["rows"] > 3_000
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("DB_SQLITE_PATH", path)
+    from src.database.connector import DatabaseConnector
+    db = DatabaseConnector()
+
+    df = db.get_dataframe(
+        """
+        SELECT TOP (:limit) Codigo_Cliente, MAX(Data_Emissao) as Ultima_Compra,
+               DATEDIFF(day, MAX(Data_Emissao), GETDATE()) as Dias_Desde_Compra
+        FROM FAL_IA_Dados_Vendas_Televendas
+        WHERE Data_Emissao >= DATEADD(month, -6, GETDATE())
+        GROUP BY Codigo_Cliente
+        ORDER BY Ultima_Compra DESC
+        """,
+        params={"limit": 10},
+    )
+    assert len(df) == 10
+    assert pd.api.types.is_datetime64_any_dtype(df["Ultima_Compra"])
+    assert (df["Dias_Desde_Compra"] >= 0).all()
@@ -0,0 +1,213 @@
+"""
+Sink de JSON Lines em background: escrita em lote, fsync por intervalo,
+rotação por tamanho/data com compressão gzip e lock entre processos.
+
+`write()` só enfileira o evento (O(1), nunca bloqueia o handler async); uma
+thread dedicada serializa, agrupa e grava. Cada lote é gravado com o arquivo
+travado (flock/msvcrt), então vários workers do uvicorn (ou o job e a API)
+podem apontar para o mesmo arquivo sem intercalar linhas.
+
+Arquivos rotacionados: `<nome>-YYYYmmdd-HHMMSS.jsonl.gz` no mesmo diretório.
+"""
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import date, datetime
+from typing import List, Optional
+
+from src.core.structured_logging import get_logger
+
+logger = get_logger("log_sink")
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+_WAKE = object()
+
+
+class BufferedJSONLSink:
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 1.0,
+        fsync_interval: float = 5.0,
+        max_batch: int = 500,
+        max_bytes: int = 50 * 1024 * 1024,
+        rotate_daily: bool = True,
+        compress: bool = True,
+        queue_size: int = 10_000,
+    ):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._last_fsync = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+
+    # --- API ---
+
+    def write(self, entry: dict):
+        """Enfileira um evento. Fila cheia descarta (o log nunca segura a requisição)."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning("Fila do log %s cheia; %d eventos descartados", self.path, self.dropped)
+
+    def close(self, timeout: float = 10.0):
+        """Drena a fila, grava e faz fsync do que restou (shutdown da API / atexit)."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        try:
+            # Acorda o worker se ele estiver esperando completar um lote
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        self._stop.clear()
+
+    # --- Worker ---
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._thread = threading.Thread(target=self._run, name="jsonl-sink", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._collect()
+            if batch:
+                self._write_batch(batch, force_fsync=self._stop.is_set() and self._queue.empty())
+        # Garante durabilidade do último lote no shutdown
+        self._fsync_file()
+
+    def _collect(self) -> List[dict]:
+        """Agrupa eventos até `max_batch` ou até `flush_interval` após o primeiro."""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [] if first is _WAKE else [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stop.is_set():
+                    entry = self._queue.get_nowait()
+                else:
+                    entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is not _WAKE:
+                batch.append(entry)
+        return batch
+
+    def _write_batch(self, batch: List[dict], force_fsync: bool = False):
+        payload = "".join(json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in batch)
+        rotated = None
+        try:
+            with open(self.lock_path, "a+") as lock_file:
+                _lock(lock_file)
+                try:
+                    rotated = self._rotate_if_needed()
+                    # Um único write por lote: linhas de processos diferentes não se misturam
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(payload)
+                        f.flush()
+                        if force_fsync or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                            os.fsync(f.fileno())
+                            self._last_fsync = time.monotonic()
+                finally:
+                    _unlock(lock_file)
+            self.written += len(batch)
+        except Exception as e:
+            logger.error("Erro ao gravar log %s: %s", self.path, e)
+        # Compressão fora do lock (pode levar alguns segundos em arquivos grandes)
+        if rotated and self.compress:
+            self._compress(rotated)
+
+    def _fsync_file(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                os.fsync(f.fileno())
+        except OSError:
+            pass
+
+    # --- Rotação ---
+
+    def _rotate_if_needed(self) -> Optional[str]:
+        """Chamado com o lock do arquivo. Retorna o caminho rotacionado (ou None)."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        too_big = self.max_bytes and stat.st_size >= self.max_bytes
+        old_day = self.rotate_daily and date.fromtimestamp(stat.st_mtime) < date.today()
+        if not (too_big or old_day) or stat.st_size == 0:
+            return None
+
+        base, ext = os.path.splitext(self.path)
+        stamp = datetime.fromtimestamp(stat.st_mtime).strftime("%Y%m%d-%H%M%S")
+        target = f"{base}-{stamp}{ext}"
+        suffix = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = f"{base}-{stamp}-{suffix}{ext}"
+            suffix += 1
+        os.replace(self.path, target)
+        return target
+
+    @staticmethod
+    def _compress(path: str):
+        try:
+            with open(path, "rb") as src, gzip.open(path + ".gz.tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(path + ".gz.tmp", path + ".gz")
+            os.remove(path)
+        except Exception as e:
+            logger.error("Erro ao comprimir log rotacionado %s: %s", path, e)
+
+    def rotated_files(self) -> List[str]:
+        """Arquivos rotacionados (mais antigos primeiro)."""
+        base, ext = os.path.splitext(self.path)
+        return sorted(glob.glob(f"{base}-*{ext}") + glob.glob(f"{base}-*{ext}.gz"))
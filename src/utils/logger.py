@@ -1,20 +1,50 @@
-import json
+import atexit
 import os
+import threading
 from datetime import datetime
 
+from src.utils.log_sink import BufferedJSONLSink
+
 LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, "pitch_usage.jsonl")
 
-def ensure_log_dir():
-    if not os.path.exists(LOG_DIR):
-        os.makedirs(LOG_DIR)
+_sink = None
+_sink_lock = threading.Lock()
+
+def get_pitch_log_sink() -> BufferedJSONLSink:
+    """
+    Sink único do log de pitch. A gravação acontece numa thread em lote, então
+    log_pitch_usage/log_pitch_feedback não fazem I/O no handler do /pitch.
+    """
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                try:
+                    from src.core.config import get_settings
+                    settings = get_settings()
+                    _sink = BufferedJSONLSink(
+                        settings.PITCH_LOG_FILE,
+                        flush_interval=settings.PITCH_LOG_FLUSH_SECONDS,
+                        fsync_interval=settings.PITCH_LOG_FSYNC_SECONDS,
+                        max_bytes=settings.PITCH_LOG_MAX_BYTES,
+                        rotate_daily=settings.PITCH_LOG_ROTATE_DAILY,
+                    )
+                except Exception:
+                    _sink = BufferedJSONLSink(LOG_FILE)
+    return _sink
+
+def close_pitch_log():
+    """Grava o que estiver na fila (shutdown da API / atexit)."""
+    if _sink is not None:
+        _sink.close()
+
+atexit.register(close_pitch_log)
 
 def log_pitch_usage(card_code: str, target_sku: str, pitch_generated: str, pitch_id: str, user_id: str = None, metadata: dict = None):
     """
     Registra o uso do Pitch IA em um arquivo JSON Lines.
     """
-    ensure_log_dir()
-    
     entry = {
         "timestamp": datetime.now().isoformat(),
         "event": "pitch_generated",
@@ -25,19 +55,12 @@ def log_pitch_usage(card_code: str, target_sku: str, pitch_generated: str, pitch
         "pitch_generated": pitch_generated,
         "metadata": metadata or {}
     }
-    
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-    except Exception as e:
-        print(f"Erro ao gravar log: {e}")
+    get_pitch_log_sink().write(entry)
 
 def log_pitch_feedback(pitch_id: str, feedback_type: str, user_id: str = None):
     """
     Registra feedback do usuário sobre o pitch.
     """
-    ensure_log_dir()
-    
     entry = {
         "timestamp": datetime.now().isoformat(),
         "event": "pitch_feedback",
@@ -45,9 +68,4 @@ def log_pitch_feedback(pitch_id: str, feedback_type: str, user_id: str = None):
         "user_id": user_id,
         "feedback_type": feedback_type # 'useful' | 'sold'
     }
-    
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-    except Exception as e:
-        print(f"Erro ao gravar log de feedback: {e}")
+    get_pitch_log_sink().write(entry)
@@ -0,0 +1,76 @@
+"""
+Formatação de códigos de SKU para exibição (5 -> 0005, 201.1 -> 0201.1).
+
+Os frames de histórico/produtos repetem poucos SKUs em muitas linhas, então a
+formatação é feita sobre os valores distintos (`pd.factorize`) com operações
+de string do pandas, e o resultado fica memorizado pela forma textual do valor
+(`str(valor)`, a mesma que a regra formata): numa resposta típica todos os SKUs
+já estão no cache e o custo é só o `take`.
+
+Nulos (None e NaN) viram "". O `_format_sku` antigo devolvia "0nan" para NaN.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Limite do cache (o domínio de SKUs é da ordem de milhares)
+MAX_CACHED_SKUS = 100_000
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def format_sku(value) -> str:
+    """Padroniza SKU para ter pelo menos 4 dígitos inteiros (ex: 5 -> 0005, 201.1 -> 0201.1)."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    text = str(value).strip()
+    if "." in text:
+        parts = text.split(".")
+        return parts[0].zfill(4) + "." + parts[1]
+    return text.zfill(4)
+
+
+def _format_codes(codes: pd.Series) -> pd.Series:
+    """Mesma regra de `format_sku`, com operações de string vetorizadas."""
+    text = codes.astype("string").str.strip()
+    parts = text.str.split(".", expand=True)
+    formatted = parts[0].str.zfill(4)
+    if parts.shape[1] > 1:
+        formatted = formatted.where(parts[1].isna(), formatted + "." + parts[1])
+    return formatted.fillna("").astype(object)
+
+
+def format_skus(codes: pd.Series) -> pd.Series:
+    """Versão vetorizada e memorizada de `format_sku` para uma coluna inteira."""
+    if codes.empty:
+        return codes.astype(object)
+
+    # 5 e 5.0 têm o mesmo hash (e o factorize os junta): valores que não são texto
+    # entram pela forma textual, então 5.0 continua virando "0005.0"
+    if pd.api.types.infer_dtype(codes, skipna=True) != "string":
+        codes = codes.astype(object).where(codes.isna(), codes.astype(str))
+    indexer, uniques = pd.factorize(codes, use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object)
+    with _cache_lock:
+        known = [_cache.get(value) for value in uniques]
+    missing = [i for i, value in enumerate(known) if value is None]
+    if missing:
+        fresh = _format_codes(uniques.iloc[missing]).tolist()
+        with _cache_lock:
+            if len(_cache) + len(missing) > MAX_CACHED_SKUS:
+                _cache.clear()
+            for i, value in zip(missing, fresh):
+                _cache[uniques.iloc[i]] = known[i] = value
+
+    # Sentinela -1 (nulos) vira "" na última posição
+    lookup = np.array(known + [""], dtype=object)
+    return pd.Series(lookup[indexer], index=codes.index, dtype=object)
+
+
+def format_sku_column(df: pd.DataFrame, column: str = "SKU") -> pd.DataFrame:
+    """Formata a coluna de SKU do frame (in place) e devolve o próprio frame."""
+    if not df.empty and column in df.columns:
+        df[column] = format_skus(df[column])
+    return df